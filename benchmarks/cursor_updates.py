@@ -0,0 +1,121 @@
+'''
+Сколько раз контроллер узнает о курсоре и прокрутке при удержании стрелки и прокрутке:
+сразу на каждое событие (как раньше) и раз за кадр.
+
+Запуск: QT_QPA_PLATFORM=offscreen python -m benchmarks.cursor_updates [--lines 100000] [--events 2000]
+'''
+import argparse
+import sys
+import time
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtTest import QTest
+from PyQt5.QtWidgets import QApplication, QLabel
+
+from src.line_index import LineIndex
+from src.text_area import TextArea
+
+from .highlighter import generate_python
+
+
+class CountingController:
+    '''
+    Контроллер, считающий обращения поля. Строку и столбец курсора он, как настоящий,
+    берет из индекса строк и выводит в надпись
+    '''
+    def __init__(self, text):
+        self.line_index = LineIndex(text)
+        self.label = QLabel()
+        self.calls = 0
+
+    def update_text(self, position, removed, inserted):
+        self.line_index.apply_edit(position, removed, inserted)
+
+    def update_cursor_pos(self, position, row=None, column=None):
+        self.calls += 1
+        row, column = self.line_index.get_line_column(position)
+        self.label.setText(f"row: {row:<4} col: {column:<4}")
+
+    def update_slider_pos(self, slider_pos):
+        self.calls += 1
+
+    def update_match_highlights(self):
+        self.calls += 1
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+class ImmediateTextArea(TextArea):
+    '''
+    Поле, сообщающее контроллеру о каждом событии сразу, как до объединения обновлений по кадрам
+    '''
+    def schedule_update(self):
+        self.controller.update_cursor_pos(self.textCursor().position())
+
+    def schedule_viewport_update(self):
+        self.controller.update_slider_pos(self.get_vertical_slider_pos())
+        self.controller.update_match_highlights()
+
+    def flush_updates(self):
+        pass
+
+
+def press_down(text_area, index):
+    QTest.keyClick(text_area, Qt.Key_Down)
+
+
+def scroll(text_area, index):
+    scroll_bar = text_area.verticalScrollBar()
+    scroll_bar.setValue(3 * (index + 1) % (scroll_bar.maximum() + 1))
+
+
+def bench(app, text_area_class, text, action, events, per_frame):
+    '''
+    events событий по per_frame за кадр: время на событие (мс) и число обращений к контроллеру
+    '''
+    controller = CountingController(text)
+    text_area = text_area_class(controller)
+    text_area.resize(800, 600)
+    text_area.show()
+    text_area.set_document(text_area.create_document(text))
+    text_area.setFocus()
+    app.processEvents()
+    text_area.flush_updates()
+    controller.calls = 0
+
+    start = time.perf_counter()
+    for index in range(events):
+        action(text_area, index)
+        # Конец кадра: срабатывает таймер отложенных обновлений
+        if (index + 1) % per_frame == 0:
+            text_area.flush_updates()
+    text_area.flush_updates()
+    seconds = time.perf_counter() - start
+
+    text_area.deleteLater()
+    app.processEvents()
+    return seconds * 1000 / events, controller.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    text = generate_python(args.lines)
+
+    for name, action in (("cursor down", press_down), ("scroll", scroll)):
+        for per_frame in (1, 4, 16):
+            before, before_calls = bench(app, ImmediateTextArea, text, action, args.events, per_frame)
+            after, after_calls = bench(app, TextArea, text, action, args.events, per_frame)
+            print(f"{name:<12} {per_frame:>2} events/frame: immediate {before:.3f} ms/event, {before_calls} calls; "
+                  f"per frame {after:.3f} ms/event, {after_calls} calls", flush=True)
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
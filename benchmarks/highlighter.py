@@ -0,0 +1,135 @@
+'''
+Замер скорости подсветки синтаксиса на большом файле: нынешняя подсветка рядом с подсветкой
+исходной версии редактора (benchmarks.legacy_highlighter).
+
+Запуск: QT_QPA_PLATFORM=offscreen python -m benchmarks.highlighter [--lines 100000]
+'''
+import argparse
+import sys
+import time
+
+from PyQt5.QtGui import QTextDocument
+from PyQt5.QtWidgets import QApplication
+
+from src.highlighter import DefaultHighlighter, PythonHighlighter, LazyHighlighter, tokenize_python
+from src.text_area import TextArea
+
+from .legacy_highlighter import LegacyDefaultHighlighter, LegacyPythonHighlighter
+
+SAMPLE = '''class Sample(object):
+    """
+    Docstring, spanning several lines
+    with 'quotes' inside
+    """
+    def __init__(self, value=42):
+        self.value = value  # comment
+        self.items = [abs(x) for x in range(10) if x % 2]
+
+    def method(self, text="string", other='other'):
+        return len(text) + int(3.5e3) if text else None
+
+'''
+
+
+# Подсветка исходной версии и нынешняя на ее месте
+PAIRS = ((LegacyPythonHighlighter, PythonHighlighter), (LegacyDefaultHighlighter, DefaultHighlighter))
+
+
+def generate_python(lines):
+    '''
+    Генерация синтетического кода Python из данного числа строк
+    '''
+    sample_lines = SAMPLE.count('\n')
+    return SAMPLE * (lines // sample_lines + 1)
+
+
+def bench_tokenizer(text):
+    state = 0
+    start = time.perf_counter()
+    for line in text.split('\n'):
+        _, state = tokenize_python(line, state)
+    return time.perf_counter() - start
+
+
+def bench_highlighter(text, highlighter_class):
+    document = QTextDocument()
+    document.setPlainText(text)
+    start = time.perf_counter()
+    highlighter_class(document).rehighlight()
+    return time.perf_counter() - start
+
+
+class NullController:
+    '''
+    Контроллер-заглушка: TextArea сообщает ему о правках и перемещениях курсора
+    '''
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def bench_first_paint(app, text, highlighter_class):
+    '''
+    Время от подключения подсветки к документу до первой отрисовки
+    '''
+    text_area = TextArea(NullController())
+    text_area.resize(800, 600)
+    text_area.show()
+    document = text_area.create_document(text)
+
+    start = time.perf_counter()
+    if highlighter_class is LazyHighlighter:
+        highlighter = LazyHighlighter(document, tokenize_python, text_area)
+    else:
+        highlighter = highlighter_class(document)
+        highlighter.rehighlight()
+    text_area.set_document(document)
+    text_area.viewport().repaint()
+    app.processEvents()
+    seconds = time.perf_counter() - start
+
+    highlighter.detach()
+    text_area.deleteLater()
+    return seconds
+
+
+def print_header(title):
+    print(f"{title:<36} {'before':>12} {'after':>12} {'speedup':>8}", flush=True)
+
+
+def print_comparison(name, before, after):
+    '''
+    Строка сравнения: время подсветки исходной версии и нынешней в секундах и ускорение
+    '''
+    print(f"{name:<36} {before * 1000:9.1f} ms {after * 1000:9.1f} ms {before / after:7.1f}x", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100000)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    text = generate_python(args.lines)
+    lines = text.count('\n') + 1
+
+    seconds = bench_tokenizer(text)
+    print(f"{'tokenize_python':<20} {lines} lines: {seconds:.3f} s, {lines / seconds:,.0f} lines/s", flush=True)
+
+    print_header(f"highlighting {lines} lines")
+    for legacy_class, highlighter_class in PAIRS:
+        print_comparison(highlighter_class.__name__, bench_highlighter(text, legacy_class),
+                         bench_highlighter(text, highlighter_class))
+
+    print_header("first paint")
+    for size in (lines // 10, lines, lines * 2):
+        sized_text = generate_python(size)
+        before = bench_first_paint(app, sized_text, LegacyPythonHighlighter)
+        for highlighter_class in (PythonHighlighter, LazyHighlighter):
+            print_comparison(f"{highlighter_class.__name__}, {size} lines", before,
+                             bench_first_paint(app, sized_text, highlighter_class))
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main()
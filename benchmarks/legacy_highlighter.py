@@ -0,0 +1,132 @@
+'''
+Подсветка синтаксиса исходной версии редактора (src/text_area.py в e0ee3e3) для сравнения
+с нынешней в benchmarks.highlighter. Код классов перенесен без изменений, кроме имен
+и общего предка с detach
+'''
+from PyQt5.QtGui import QColor, QSyntaxHighlighter, QTextCharFormat
+
+from src.constants import PYTHON_KEYWORDS, PYTHON_FUNCTIONS
+
+
+class LegacyHighlighter(QSyntaxHighlighter):
+    def detach(self):
+        '''
+        Отключение подсветки от документа
+        '''
+        self.setDocument(None)
+
+
+class LegacyDefaultHighlighter(LegacyHighlighter):
+    '''
+    Дефолтная подсветка
+    '''
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+    def highlightBlock(self, text):
+        '''
+        Подсветка одной строки
+        '''
+        block_text = self.currentBlock().text() + ' '
+
+        fmt = QTextCharFormat()
+        fmt.setBackground(QColor("#222"))
+        fmt.setForeground(QColor("#FFF"))
+        self.setFormat(0, len(block_text), fmt)
+
+        start = 0
+        word = ""
+        open_quotes = False
+        last_quote = ""
+
+        for index, char in enumerate(block_text):
+            if char in ("'", '"'):
+                if not open_quotes:
+                    start = index
+                    last_quote = char
+                    open_quotes = True
+
+                elif char == last_quote:
+                    fmt.setForeground(QColor("green").lighter(120))
+                    self.setFormat(start, index - start + 1, fmt)
+                    open_quotes = False
+
+            elif char.isalpha() or char.isdigit() or char == '_':
+                word += char
+            else:
+                if word.isdigit():
+                    fmt.setForeground(QColor("cyan"))
+                else:
+                    word = ''
+                    continue
+
+                self.setFormat(index - len(word), len(word), fmt)
+                word = ''
+        else:
+            if open_quotes:
+                fmt.setForeground(QColor("green").lighter(120))
+                self.setFormat(start, len(block_text) - start, fmt)
+
+
+class LegacyPythonHighlighter(LegacyHighlighter):
+    '''
+    Подсветка синтаксиса Python
+    (попытка реализации)
+    '''
+    def __init__(self, parent=None):
+        super(LegacyPythonHighlighter, self).__init__(parent)
+
+        self.keywords = PYTHON_KEYWORDS
+        self.functions = PYTHON_FUNCTIONS
+
+    def highlightBlock(self, text):
+        '''
+        Подсветка одной строки
+        Замечение: по-другому фреймворк сделать не позволяет
+        '''
+        block_text = self.currentBlock().text() + ' '
+
+        fmt = QTextCharFormat()
+        fmt.setBackground(QColor("#222"))
+        fmt.setForeground(QColor("#FFF"))
+        self.setFormat(0, len(block_text), fmt)
+
+        start = 0
+        word = ""
+        last_word = ""
+        open_quotes = False
+        last_quote = ""
+
+        for index, char in enumerate(block_text):
+            if open_quotes and char not in ("'", '"'):
+                continue
+
+            if char == '#' and not open_quotes:
+                fmt.setForeground(QColor("red").lighter(120))
+                self.setFormat(index, len(block_text) - index, fmt)
+                break
+
+            elif char in ("'", '"'):
+                if not open_quotes:
+                    start = index
+                    last_quote = char
+                    open_quotes = True
+
+                elif char == last_quote:
+                    fmt.setForeground(QColor("green").lighter(120))
+                    self.setFormat(start, index - start + 1, fmt)
+                    open_quotes = False
+
+            elif char.isalpha() or char.isdigit() or char == '_':
+                word += char
+            else:
+                if last_word == "def":
+                    if word.startswith("__") and word.endswith("__"):
+                        fmt.setForeground(QColor("purple").lighter(300))
+                    else:
+                        fmt.setForeground(QColor("cyan"))
+                elif word in self.keywords:
+                    fmt.setForeground(QColor("orange"))
+                elif word in self.functions or word in ('self', 'cls') or\
+                        (word.endswith("__") and word.startswith("__")):
+                    fmt.setForeground(QColor("purple").lighter(300))
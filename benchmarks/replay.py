@@ -0,0 +1,274 @@
+'''
+Воспроизведение записанного ввода (main.py --record-session FILE) в редакторе без экрана и замер
+задержки от каждого события ввода до отрисовки окна. События воспроизводятся в записанном темпе
+(--speed 2 - вдвое быстрее, 0 - без пауз): за паузы успевают сработать таймеры редактора, а задержка
+отсчитывается от того момента, когда событие произошло бы у пользователя, поэтому в нее входит
+и ожидание, пока редактор занят предыдущими событиями. Выводятся перцентили по видам событий
+и самые медленные события.
+
+Запуск: python -m benchmarks.replay session.jsonl [--speed 1] [--files a.py b.py] [--output replay.json]
+'''
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Воспроизведение работает без экрана
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QEvent, QEventLoop, QObject, QPoint, QPointF, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QKeyEvent, QKeySequence, QWheelEvent
+from PyQt5.QtTest import QTest
+from PyQt5.QtWidgets import QApplication
+
+from src.session_recorder import KEY, MOVE, PRESS, RELEASE, WHEEL, find_widget, load_session
+from src.tab_bar import TabBar
+
+from .suite import Editor, percentile
+
+# Событие без отрисовки за столько миллисекунд считается не изменившим окно
+PAINT_TIMEOUT_MS = 1000
+# Пауза перед воспроизведением: открытые файлы успевают загрузиться и проиндексироваться
+SETTLE_MS = 500
+COMMAND_MODIFIERS = Qt.ControlModifier | Qt.AltModifier | Qt.MetaModifier
+
+
+def send_key(widget, key, modifiers, text, clipboard=None):
+    '''
+    Нажатие клавиши. Печатаемый текст (в том числе не ASCII) передается событием с этим текстом,
+    остальное - через QTest: он, как оконная система, сначала проверяет сочетания клавиш меню
+    '''
+    if clipboard is not None:
+        QApplication.clipboard().setText(clipboard)
+    modifiers = Qt.KeyboardModifiers(modifiers)
+    if text and text.isprintable() and not modifiers & COMMAND_MODIFIERS:
+        for kind in (QEvent.KeyPress, QEvent.KeyRelease):
+            QApplication.sendEvent(widget, QKeyEvent(kind, key, modifiers, text))
+    else:
+        QTest.keyClick(widget, Qt.Key(key), modifiers)
+
+
+def send_event(widget, record):
+    '''
+    Воспроизведение события записи в элементе widget
+    '''
+    kind, params = record[1], record[3:]
+    if kind == KEY:
+        send_key(widget, *params)
+    elif kind in (PRESS, RELEASE):
+        x, y, button, modifiers = params
+        send = QTest.mousePress if kind == PRESS else QTest.mouseRelease
+        send(widget, Qt.MouseButton(button), Qt.KeyboardModifiers(modifiers), QPoint(x, y))
+    elif kind == MOVE:
+        QTest.mouseMove(widget, QPoint(*params[:2]))
+    elif kind == WHEEL:
+        x, y, dx, dy, modifiers = params
+        pos = QPointF(x, y)
+        QApplication.sendEvent(widget, QWheelEvent(pos, QPointF(widget.mapToGlobal(QPoint(x, y))), QPoint(),
+                                                   QPoint(dx, dy), Qt.NoButton, Qt.KeyboardModifiers(modifiers),
+                                                   Qt.NoScrollPhase, False))
+
+
+def classify(record, widget):
+    '''
+    Вид события для отчета
+    '''
+    kind = record[1]
+    if kind == KEY:
+        if len(record) > 6:
+            return "paste"
+        return "shortcut" if Qt.KeyboardModifiers(record[4]) & COMMAND_MODIFIERS else "key"
+    if kind == PRESS and isinstance(widget, TabBar):
+        return "tab switch"
+    return "scroll" if kind == WHEEL else "mouse"
+
+
+def describe(record):
+    kind = record[1]
+    if kind == KEY:
+        key, modifiers, text = record[3:6]
+        return f"key {QKeySequence(key | modifiers).toString() or repr(text)}"
+    return f"{kind} at {record[3]},{record[4]} in {'/'.join(map(str, record[2]))}"
+
+
+class Replayer(QObject):
+    '''
+    Воспроизведение событий по одному: следующее событие отправляется в свое время, но не раньше
+    отрисовки после предыдущего (или PAINT_TIMEOUT_MS без отрисовки)
+    '''
+    # Все события воспроизведены
+    finished = pyqtSignal()
+
+    def __init__(self, window, records, speed):
+        super().__init__()
+
+        self.window = window
+        self.records = records
+        self.speed = speed
+        self.next = 0
+        # Номер события, отрисовки после которого ждем, время его ввода и была ли уже отрисовка
+        self.waiting = None
+        self.input_time = 0
+        self.is_painted = False
+        # Результаты: (номер события, вид, задержка в секундах или None без отрисовки)
+        self.results = []
+        self.skipped = 0
+
+        self.timeout = QTimer(self)
+        self.timeout.setSingleShot(True)
+        self.timeout.setInterval(PAINT_TIMEOUT_MS)
+        self.timeout.timeout.connect(lambda: self.finish_event(self.waiting, False))
+
+    def start(self):
+        QApplication.instance().installEventFilter(self)
+        self.start_time = time.perf_counter()
+        self.schedule_next()
+
+    def schedule_next(self):
+        if self.next == len(self.records):
+            QApplication.instance().removeEventFilter(self)
+            self.finished.emit()
+            return
+
+        delay = 0
+        if self.speed:
+            delay = max(self.start_time + self.records[self.next][0] / 1000 / self.speed - time.perf_counter(), 0)
+        QTimer.singleShot(round(delay * 1000), self.send_next)
+
+    def send_next(self):
+        number = self.next
+        self.next += 1
+        record = self.records[number]
+        widget = find_widget(record[2], self.window)
+        if widget is None:
+            # Элемента нет (например, выпадающее меню, открытое наведением, которое не записывается)
+            self.skipped += 1
+            self.schedule_next()
+            return
+
+        now = time.perf_counter()
+        self.waiting = number
+        self.input_time = min(self.start_time + record[0] / 1000 / self.speed, now) if self.speed else now
+        self.is_painted = False
+        self.results.append((number, classify(record, widget), None))
+        # Модальный диалог не дает отправке вернуться, пока он открыт: следующие события
+        # воспроизводятся внутри его цикла событий
+        send_event(widget, record)
+        if self.waiting == number and not self.is_painted:
+            self.timeout.start()
+
+    def eventFilter(self, source, event):
+        if event.type() == QEvent.Paint and self.waiting is not None and not self.is_painted:
+            self.is_painted = True
+            # Остальные элементы отрисовываются в том же проходе: конец - после него
+            QTimer.singleShot(0, lambda number=self.waiting: self.finish_event(number, True))
+        return False
+
+    def finish_event(self, number, is_painted):
+        if number is None or number != self.waiting:
+            return
+
+        self.timeout.stop()
+        self.waiting = None
+        # Ожидаемое событие - последнее отправленное
+        _, kind, _ = self.results[-1]
+        self.results[-1] = number, kind, time.perf_counter() - self.input_time if is_painted else None
+        self.schedule_next()
+
+
+def open_files(editor, files, active):
+    '''
+    Открытие файлов записи (None - новый файл) до окончания их загрузки
+    '''
+    for path in files:
+        if path is None:
+            editor.controller.create_file()
+        else:
+            editor.controller.open_path(path)
+            editor.wait(editor.is_loaded)
+    if active >= 0:
+        editor.controller.change_state(active)
+    editor.wait(editor.is_indexed)
+
+
+def summarize_kinds(results):
+    '''
+    Перцентили задержки по видам событий: {вид: сводка}
+    '''
+    kinds = {}
+    for _, kind, seconds in results:
+        kinds.setdefault(kind, []).append(seconds)
+    kinds["all"] = [seconds for _, _, seconds in results]
+
+    summary = {}
+    for kind, values in kinds.items():
+        painted = [seconds * 1000 for seconds in values if seconds is not None]
+        summary[kind] = {"events": len(values), "not painted": len(values) - len(painted)}
+        if painted:
+            summary[kind].update({"p50_ms": percentile(painted, 0.5), "p90_ms": percentile(painted, 0.9),
+                                  "p99_ms": percentile(painted, 0.99), "max_ms": max(painted)})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session", help="file written by main.py --record-session")
+    parser.add_argument("--speed", type=float, default=1, help="replay speed (0 - as fast as possible)")
+    parser.add_argument("--files", nargs="+", help="files to open instead of the recorded ones (same order)")
+    parser.add_argument("--worst", type=int, default=10, help="how many slowest events to list")
+    parser.add_argument("--output", help="write per-event latencies and the summary as JSON")
+    args = parser.parse_args()
+
+    header, records = load_session(args.session)
+    files = args.files or header["files"]
+    missing = [path for path in files if path is not None and not os.path.exists(path)]
+    if missing:
+        sys.exit(f"recorded files not found (use --files): {', '.join(missing)}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        editor = Editor(os.path.join(directory, "cache"))
+        window = editor.view._window
+        window.resize(*header["size"])
+        # Мигание курсора перерисовывало бы поле само по себе
+        QApplication.setCursorFlashTime(0)
+        open_files(editor, files, header["active"])
+        loop = QEventLoop()
+        QTimer.singleShot(SETTLE_MS, loop.quit)
+        loop.exec_()
+
+        replayer = Replayer(window, records, args.speed)
+        replayer.finished.connect(loop.quit)
+        QTimer.singleShot(0, replayer.start)
+        loop.exec_()
+        editor.close()
+
+    summary = summarize_kinds(replayer.results)
+    print(f"{'events':<12} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}  not painted")
+    for kind, result in summary.items():
+        latencies = "".join(f" {result[name]:9.1f}" for name in ("p50_ms", "p90_ms", "p99_ms", "max_ms")
+                            if name in result)
+        print(f"{kind:<12} {result['events']:>6}{latencies or ' ' * 40}  {result['not painted']}")
+    if replayer.skipped:
+        print(f"{replayer.skipped} events skipped: their widgets did not exist during replay")
+
+    slowest = sorted((result for result in replayer.results if result[2] is not None), key=lambda result: -result[2])
+    print("slowest events:")
+    for number, kind, seconds in slowest[:args.worst]:
+        record = records[number]
+        print(f"  #{number:<6} at {record[0] / 1000:8.2f} s {seconds * 1000:9.1f} ms  {describe(record)}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({"session": args.session, "speed": args.speed, "summary": summary, "skipped": replayer.skipped,
+                       "events": [{"index": number, "time_ms": records[number][0], "kind": kind,
+                                   "latency_ms": None if seconds is None else seconds * 1000}
+                                  for number, kind, seconds in replayer.results]}, file, indent=2)
+    # Окно и фоновые потоки редактора не закрываются (пул процессов уже остановлен): процесс просто завершается
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
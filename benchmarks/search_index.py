@@ -0,0 +1,93 @@
+'''
+Сравнение поиска с индексом троек и полного просмотра текста.
+
+Запуск: python -m benchmarks.search_index [--size 100] [--repeat 5]
+'''
+import argparse
+import random
+import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.finder import compile_pattern, find_all
+from src.trigram_index import TrigramIndex, build_blocks, get_query_bits
+
+
+def generate_text(size):
+    '''
+    Синтетический текст, похожий на код, размером около size символов
+    '''
+    generator = random.Random(0)
+    words = [''.join(generator.choices(string.ascii_lowercase + "_", k=generator.randint(3, 12)))
+             for _ in range(50000)]
+    words += ["def", "return", "self", "if", "for", "in", "import", "class", "None"] * 500
+    lines = []
+    length = 0
+    while length < size:
+        line = "    " * generator.randint(0, 3) + " ".join(generator.choices(words, k=generator.randint(3, 10)))
+        lines.append(line)
+        length += len(line) + 1
+
+    return "\n".join(lines)[:size]
+
+
+def bench(function, repeat):
+    '''
+    Лучшее время из repeat запусков и результат последнего
+    '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100, help="size of the text in MB")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = generate_text(args.size * 1024 * 1024)
+    print(f"text: {len(text) / 1024 / 1024:.0f} MB", flush=True)
+
+    with ProcessPoolExecutor() as process_pool:
+        start = time.perf_counter()
+        index = TrigramIndex(*build_blocks(text, process_pool))
+        seconds = time.perf_counter() - start
+    filters_size = sum(len(block_filter) for block_filter in index.filters)
+    print(f"index build: {seconds:.2f} s, {len(index.lengths)} blocks, {filters_size / 1024 / 1024:.1f} MB of filters",
+          flush=True)
+
+    words = text[len(text) // 2:].split(None, 200)
+    rare = max(words[1:-1], key=len)
+    queries = [("rare word", rare, True), ("rare word, ignore case", rare.upper(), False),
+               ("common word", "return", True), ("absent", "no_such_identifier", True)]
+    for name, query, is_case_sensitive in queries:
+        options = (False, is_case_sensitive, False)
+        pattern = compile_pattern(query, *options)
+        query_bits = get_query_bits(query, *options)
+
+        linear, matches = bench(lambda: find_all(text, pattern), args.repeat)
+        indexed, indexed_matches = bench(lambda: find_all(text, pattern, regions=index.get_regions(query_bits)),
+                                         args.repeat)
+        assert list(matches.starts) == list(indexed_matches.starts)
+        regions = index.get_regions(query_bits)
+        scanned = sum(end - start for start, end in regions) / len(text)
+        print(f"{name:<24} {matches.count():>8} matches: linear {linear * 1000:8.1f} ms, "
+              f"indexed {indexed * 1000:8.1f} ms ({scanned:.1%} of text scanned)", flush=True)
+
+    # Правка посреди текста и пересчет фильтра измененного блока
+    position = len(text) // 2
+    text = text[:position] + "inserted text" + text[position:]
+    start = time.perf_counter()
+    index.apply_edit(position, 0, "inserted text")
+    edited = time.perf_counter()
+    index.reindex(lambda start, end: text[start:end], 1)
+    print(f"edit: {(edited - start) * 1000:.2f} ms, reindex: {(time.perf_counter() - edited) * 1000:.2f} ms",
+          flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''
+Замер запуска редактора: каждый запуск - новый процесс (main.py --exit-after-startup)
+с отдельным каталогом данных. Выводятся медианы этапов запуска и всего процесса.
+
+Запуск: QT_QPA_PLATFORM=offscreen python -m benchmarks.startup [--repeat 10]
+'''
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASE = re.compile(r"^(.+?)\s+([\d.]+) ms$")
+
+
+def run(arguments, cache_dir):
+    '''
+    Запуск процесса в корне проекта: время процесса (мс) и его вывод в stderr
+    '''
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *arguments], cwd=ROOT, env={**os.environ, "XDG_CACHE_HOME": cache_dir},
+                            capture_output=True, text=True, check=True)
+    return (time.perf_counter() - start) * 1000, result.stderr
+
+
+def bench_startup(repeat, is_session_kept):
+    '''
+    Медианы этапов запуска и всего процесса: с пустым каталогом данных при каждом запуске
+    или с одним каталогом на все запуски (база сеанса уже есть)
+    '''
+    phases = {}
+    with tempfile.TemporaryDirectory() as kept_dir:
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                seconds, output = run(["main.py", "--exit-after-startup"], kept_dir if is_session_kept else cache_dir)
+            for line in output.splitlines():
+                match = PHASE.match(line)
+                if match:
+                    phases.setdefault(match.group(1), []).append(float(match.group(2)))
+            phases.setdefault("process", []).append(seconds)
+
+    return {name: statistics.median(values) for name, values in phases.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        import_times = [run(["-c", "import src"], cache_dir)[0] for _ in range(args.repeat)]
+        is_clean = not os.listdir(cache_dir)
+    print(f"{'import src':<24} {statistics.median(import_times):8.1f} ms (process, "
+          f"{'no files created' if is_clean else 'files created'})", flush=True)
+
+    for name, is_session_kept in (("new session", False), ("existing session", True)):
+        for phase, milliseconds in bench_startup(args.repeat, is_session_kept).items():
+            print(f"{name + ', ' + phase:<32} {milliseconds:8.1f} ms", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,476 @@
+'''
+Набор замеров горячих путей редактора на синтетических файлах: загрузка и сохранение, ввод
+(TextEditorController.update_text), поиск, замена (и в файлах - с проверкой, что она отменяется
+в каждом файле), смена вкладки и подсветка синтаксиса.
+Для каждого замера выводятся p50/p99 задержки и пропускная способность, результаты пишутся в JSON.
+Замер, повторы которого идут дольше --time-limit секунд, прекращается раньше (с меньшим числом повторов).
+С --baseline результаты сравниваются с прежними: если p50 какого-либо замера вырос больше чем
+на --max-regression процентов, набор завершается с ошибкой.
+
+Запуск: python -m benchmarks.suite [--sizes 1 10 100] [--repeat 3] [--ops 200] [--time-limit 30]
+        [--output benchmark-results.json] [--baseline old.json] [--max-regression 20]
+'''
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+# Набор работает без экрана
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import PYQT_VERSION_STR, QT_VERSION_STR, QEventLoop, QTimer, Qt
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtTest import QTest
+
+from src.constants import MAX_RESIDENT_DOCUMENTS
+from src.highlighter import DefaultHighlighter, LazyHighlighter, PythonHighlighter
+
+from .highlighter import SAMPLE, bench_first_paint, bench_highlighter
+from .search_index import generate_text
+
+MB = 1024 * 1024
+# Частое слово синтетического текста и слово, которого в нем нет
+FREQUENT_WORD = "return"
+# Частая буква: десятки тысяч вхождений на мегабайт, замена всех идет сотнями порций
+FREQUENT_LETTER = "e"
+MISSING_WORD = "no_such_identifier"
+# Ввод - в начале файла, у видимой части: переход курсора вглубь большого документа
+# сначала раскладывает весь текст до него, а это замер не ввода, а раскладки
+TYPING_SPAN = 64 * 1024
+# Замена в файлах: файлов больше лимита документов в памяти, но документы с правками
+# держатся и сверх него (MAX_EDITED_DOCUMENTS_OVER_LIMIT), поэтому замену можно отменить во всех
+REPLACE_FILES = MAX_RESIDENT_DOCUMENTS + 4
+REPLACE_FILE_SIZE = 64 * 1024
+
+
+def percentile(samples, fraction):
+    '''
+    Перцентиль выборки (ближайший ранг)
+    '''
+    ordered = sorted(samples)
+    return ordered[min(max(math.ceil(fraction * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+def summarize(samples, amount=None):
+    '''
+    Сводка замера по длительностям операций (с): задержки в мс и пропускная способность -
+    МБ/с, если каждая операция обрабатывает amount байт, иначе операций в секунду
+    '''
+    total = sum(samples)
+    result = {
+        "samples": len(samples),
+        "p50_ms": percentile(samples, 0.5) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+        "mean_ms": total / len(samples) * 1000,
+    }
+    if amount is None:
+        result["throughput"], result["unit"] = len(samples) / total, "ops/s"
+    else:
+        result["throughput"], result["unit"] = amount * len(samples) / total / MB, "MB/s"
+    return result
+
+
+def generate_python_size(size):
+    '''
+    Синтетический код Python размером около size символов (целые строки)
+    '''
+    text = SAMPLE * (size // len(SAMPLE) + 1)
+    return text[:text.rfind('\n', 0, size) + 1]
+
+
+class Editor:
+    '''
+    Редактор целиком (контроллер с моделью и окном) с пустым сеансом во временном каталоге
+    '''
+    def __init__(self, cache_dir):
+        os.environ["XDG_CACHE_HOME"] = cache_dir
+        # Импорт здесь: замер импорта не нужен, а до него должен быть задан каталог данных
+        from src.controller import TextEditorController
+
+        self.controller = TextEditorController()
+        self.model = self.controller._model
+        self.view = self.controller._view
+
+    def close(self):
+        '''
+        Остановка процессов редактора (пула процессов поиска и индексов)
+        '''
+        self.controller.shutdown_process_pool()
+
+    @staticmethod
+    def wait(predicate, timeout=600):
+        '''
+        Обработка событий, пока не выполнится условие
+        '''
+        if predicate():
+            return
+        loop = QEventLoop()
+        timer = QTimer()
+        deadline = time.perf_counter() + timeout
+        timer.timeout.connect(lambda: (predicate() or time.perf_counter() > deadline) and loop.quit())
+        timer.start(1)
+        loop.exec_()
+        timer.stop()
+        if not predicate():
+            raise TimeoutError("benchmark step did not finish in time")
+
+    def is_loaded(self):
+        '''
+        Активный файл загружен (большой - проиндексирован по строкам)
+        '''
+        if self.model.get_is_mapped():
+            return self.model.get_mapped_buffer().is_indexed()
+        return not self.model.get_is_loading()
+
+    def is_indexed(self):
+        index = self.model.get_trigram_index()
+        return index is None or index.get_is_built()
+
+    def get_text_area(self):
+        return self.view.get_active_text_area()
+
+    def finish_layout(self):
+        '''
+        Раскладка всего текста активного поля. После большой правки (например, отмены замены)
+        Qt раскладывает текст заново постепенно, и незаконченная раскладка досталась бы следующему замеру
+        '''
+        document = self.get_text_area().document()
+        document.documentLayout().blockBoundingRect(document.lastBlock())
+
+    def search(self, query):
+        '''
+        Поиск всех вхождений заново (без переиспользования прежнего результата) до его завершения.
+        Запрос вводится и в поле поиска: отложенный поиск после правок ищет то же самое
+        '''
+        self.view.get_search_entry().search_field.setText(query)
+        self.controller.clear_search()
+        self.controller.search(query)
+        self.wait(lambda: self.controller._matches is not None)
+
+
+def measure(step, count, time_limit):
+    '''
+    Длительности count выполнений step (step(номер) возвращает длительность одного выполнения).
+    Если выполнения заняли больше time_limit секунд, замер останавливается раньше
+    '''
+    samples = []
+    deadline = time.perf_counter() + time_limit
+    for index in range(count):
+        samples.append(step(index))
+        if time.perf_counter() > deadline:
+            break
+    return samples
+
+
+def bench_load(editor, path, size, args):
+    '''
+    Открытие файла до окончания загрузки. Файл остается открытым после замера
+    '''
+    def step(index):
+        if index:
+            editor.controller.close_file()
+        start = time.perf_counter()
+        editor.controller.open_path(path)
+        editor.wait(editor.is_loaded)
+        return time.perf_counter() - start
+
+    return summarize(measure(step, args.repeat, args.time_limit), size)
+
+
+def bench_typing(editor, args):
+    '''
+    Ввод символа в случайном месте начала файла: правка документа Qt и TextEditorController.update_text
+    '''
+    generator = random.Random(0)
+    text_area = editor.get_text_area()
+    span = min(text_area.document().characterCount(), TYPING_SPAN)
+
+    def step(index):
+        cursor = text_area.textCursor()
+        cursor.setPosition(generator.randrange(span))
+        text_area.setTextCursor(cursor)
+        start = time.perf_counter()
+        QTest.keyClick(text_area, Qt.Key_A)
+        return time.perf_counter() - start
+
+    return summarize(measure(step, args.ops, args.time_limit))
+
+
+def bench_search(editor, queries, size, args):
+    '''
+    Поиск всех вхождений запросов по очереди (в фоне, если файл большой)
+    '''
+    def step(index):
+        start = time.perf_counter()
+        editor.search(queries[index % len(queries)])
+        return time.perf_counter() - start
+
+    return summarize(measure(step, args.repeat * len(queries), args.time_limit), size)
+
+
+def bench_find_next(editor, query, args):
+    '''
+    Переход к следующему вхождению (вхождения уже найдены)
+    '''
+    editor.search(query)
+
+    def step(index):
+        start = time.perf_counter()
+        editor.controller.find(query)
+        return time.perf_counter() - start
+
+    return summarize(measure(step, args.ops, args.time_limit))
+
+
+def bench_replace(editor, query, size, args):
+    '''
+    Замена всех вхождений (порциями, до конца) и ее отмена вне замера. Замена, не закончившаяся
+    за --time-limit секунд, останавливается, и сводка отмечается как прерванная. После отмены
+    курсор возвращается в начало, а текст раскладывается заново до конца
+    '''
+    text_area = editor.get_text_area()
+    is_stopped = False
+
+    def step(index):
+        nonlocal is_stopped
+        editor.search(query)
+        start = time.perf_counter()
+        editor.controller.start_replace(query.upper(), is_confirmation_needed=False)
+        try:
+            editor.wait(lambda: editor.controller._replace_job is None, args.time_limit)
+        except TimeoutError:
+            editor.controller.stop_replace()
+            is_stopped = True
+        seconds = time.perf_counter() - start
+        text_area.undo()
+        text_area.moveCursor(QTextCursor.Start)
+        editor.finish_layout()
+        return seconds
+
+    result = summarize(measure(step, args.repeat, args.time_limit), size)
+    if is_stopped:
+        result["stopped"] = True
+    return result
+
+
+def bench_replace_in_files(editor, directory, args):
+    '''
+    Поиск частого слова в файлах каталога и замена во всех них. После каждой замены
+    проверяется, что она отменяется в каждом файле, хотя файлов больше, чем документов
+    в памяти. Затем файлы сохраняются с исходным текстом и закрываются
+    '''
+    directory = os.path.join(directory, "replace_in_files")
+    os.mkdir(directory)
+    texts = {}
+    for index in range(REPLACE_FILES):
+        path = os.path.join(directory, f"file_{index:02}.txt")
+        texts[path] = generate_text(REPLACE_FILE_SIZE)
+        with open(path, 'w') as file:
+            file.write(texts[path])
+
+    controller = editor.controller
+    first_tab = editor.model.get_number_of_states()
+
+    def step(index):
+        start = time.perf_counter()
+        controller.find_in_files(FREQUENT_WORD, directory)
+        editor.wait(lambda: controller._files_search is None)
+        controller.replace_in_files(FREQUENT_WORD.upper(), is_confirmation_needed=False)
+        editor.wait(lambda: controller._files_replace_queue is None and controller._replace_job is None)
+        seconds = time.perf_counter() - start
+
+        for tab in range(first_tab, editor.model.get_number_of_states()):
+            controller.change_state(tab)
+            editor.wait(editor.is_loaded)
+            editor.get_text_area().undo()
+            if editor.model.get_text() != texts[editor.model.get_filename()]:
+                raise RuntimeError(f"replace in files was not undone in {editor.model.get_filename()}")
+        return seconds
+
+    samples = measure(step, args.repeat, args.time_limit)
+    while editor.model.get_number_of_states() > first_tab:
+        controller.change_state(editor.model.get_number_of_states() - 1)
+        if editor.model.get_is_modified():
+            controller.save_file()
+            controller.wait_for_saves()
+        controller.close_file()
+    return summarize(samples, REPLACE_FILES * REPLACE_FILE_SIZE)
+
+
+def bench_save(editor, size, args):
+    '''
+    Сохранение измененного файла до окончания записи
+    '''
+    def step(index):
+        QTest.keyClick(editor.get_text_area(), Qt.Key_A)
+        start = time.perf_counter()
+        editor.controller.save_file()
+        editor.controller.wait_for_saves()
+        return time.perf_counter() - start
+
+    return summarize(measure(step, args.repeat, args.time_limit), size)
+
+
+def bench_switch_tab(editor, args):
+    '''
+    Переключение между файлом и новой пустой вкладкой с отрисовкой поля
+    '''
+    editor.controller.create_file()
+
+    def step(index):
+        start = time.perf_counter()
+        editor.controller.change_state(index % 2)
+        editor.get_text_area().viewport().repaint()
+        return time.perf_counter() - start
+
+    samples = measure(step, args.ops, args.time_limit)
+    editor.controller.change_state(1)
+    editor.controller.close_file()
+    return summarize(samples)
+
+
+def bench_highlighters(editor, size, args):
+    '''
+    Полная подсветка кода Python и первая отрисовка с ленивой подсветкой
+    '''
+    text = generate_python_size(size)
+    results = {}
+    for name, highlighter_class in (("highlight python", PythonHighlighter),
+                                    ("highlight default", DefaultHighlighter)):
+        samples = measure(lambda index: bench_highlighter(text, highlighter_class), args.repeat, args.time_limit)
+        results[name] = summarize(samples, len(text))
+    samples = measure(lambda index: bench_first_paint(editor.view.app, text, LazyHighlighter),
+                      args.repeat, args.time_limit)
+    results["first paint lazy"] = summarize(samples, len(text))
+    return results
+
+
+def run_size(editor, directory, size_mb, args):
+    '''
+    Все замеры для файла размером size_mb МБ: пары (название, сводка) по мере готовности.
+    Большой файл открывается только для чтения, поэтому замеры правок для него пропускаются
+    '''
+    size = size_mb * MB
+    path = os.path.join(directory, f"text_{size_mb}mb.txt")
+    text = generate_text(size)
+    with open(path, 'w') as file:
+        file.write(text)
+    words = text[len(text) // 2:].split(None, 200)
+    rare_word = max(words[1:-1], key=len)
+    del text
+
+    yield "load", bench_load(editor, path, size, args)
+    editor.wait(editor.is_indexed)
+    is_mapped = editor.model.get_is_mapped()
+    if not is_mapped:
+        # Сразу после открытия Qt еще раскладывает текст (в редакторе это занимает около секунды простоя),
+        # и каждая правка до конца раскладки стоит сотни миллисекунд; как и benchmarks/typing_latency.py,
+        # замеряется ввод в уже разложенном тексте
+        editor.finish_layout()
+        yield "typing", bench_typing(editor, args)
+    yield "search", bench_search(editor, (FREQUENT_WORD, rare_word, MISSING_WORD), size, args)
+    yield "find next", bench_find_next(editor, FREQUENT_WORD, args)
+    if not is_mapped:
+        yield "replace all", bench_replace(editor, rare_word, size, args)
+        if size_mb <= args.max_replace_size:
+            yield "replace all frequent", bench_replace(editor, FREQUENT_LETTER, size, args)
+        yield "save", bench_save(editor, size, args)
+    yield "switch tab", bench_switch_tab(editor, args)
+    editor.controller.close_file()
+    os.remove(path)
+
+    if size_mb <= args.max_highlight_size:
+        yield from bench_highlighters(editor, size, args).items()
+
+
+def print_result(key, result):
+    '''
+    Вывод сводки замера одной строкой
+    '''
+    print(f"{key:<28} p50 {result['p50_ms']:10.2f} ms  p99 {result['p99_ms']:10.2f} ms  "
+          f"{result['throughput']:10.1f} {result['unit']}"
+          f"{'  (stopped at --time-limit)' if result.get('stopped') else ''}", flush=True)
+
+
+def find_regressions(results, baseline, max_regression):
+    '''
+    Замеры, p50 которых вырос по сравнению с baseline больше чем на max_regression процентов:
+    (название, прежний p50, новый p50, рост в процентах)
+    '''
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous.get("p50_ms"):
+            continue
+        growth = (result["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"] * 100
+        if growth > max_regression:
+            regressions.append((name, previous["p50_ms"], result["p50_ms"], growth))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="file sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of whole-file operations")
+    parser.add_argument("--ops", type=int, default=200, help="repetitions of single-step operations")
+    parser.add_argument("--time-limit", type=float, default=30,
+                        help="seconds after which a benchmark stops repeating")
+    parser.add_argument("--max-highlight-size", type=int, default=10,
+                        help="largest size (MB) for the highlighter benchmarks")
+    parser.add_argument("--max-replace-size", type=int, default=1,
+                        help="largest size (MB) for replacing a frequent letter")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results of a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, default=20,
+                        help="allowed growth of p50 against the baseline, in percent")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        editor = Editor(os.path.join(directory, "cache"))
+        for size_mb in args.sizes:
+            for name, result in run_size(editor, directory, size_mb, args):
+                key = f"{name}@{size_mb}MB"
+                results[key] = result
+                print_result(key, result)
+        result = bench_replace_in_files(editor, directory, args)
+        results["replace in files"] = result
+        print_result("replace in files", result)
+        editor.close()
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "config": {"sizes": args.sizes, "repeat": args.repeat, "ops": args.ops, "time_limit": args.time_limit},
+        "results": results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"results written to {args.output}", flush=True)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        regressions = find_regressions(results, baseline, args.max_regression)
+        for name, previous, current, growth in regressions:
+            print(f"REGRESSION {name}: p50 {previous:.2f} ms -> {current:.2f} ms (+{growth:.0f}%, "
+                  f"allowed {args.max_regression:.0f}%)", file=sys.stderr, flush=True)
+        if regressions:
+            sys.exit(f"{len(regressions)} benchmark(s) regressed by more than {args.max_regression:.0f}%")
+    # Окно и фоновые потоки редактора не закрываются (пул процессов уже остановлен): процесс просто завершается
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
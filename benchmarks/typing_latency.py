@@ -0,0 +1,195 @@
+'''
+Замер задержки ввода: нажатия клавиш (QTest.keyClick) в начале файла Python размером --size МБ.
+Задержка нажатия - обработка клавиши и отрисовка поля. Замер начинается, когда файл загружен
+и фоновая работа после открытия (индекс поиска) закончена.
+По умолчанию между нажатиями события не обрабатываются, и замеряется только путь правки.
+С --interval и --settle между нажатиями и после открытия обрабатываются события, как при
+настоящем вводе (подсветка, отложенный поиск, запись сеанса). Прежняя подсветка (e0ee3e3)
+при первой же обработке событий раскрашивает весь документ, и на файле 1 МБ это минуты.
+С --baseline тот же замер выполняется и для другой ревизии репозитория (ее src выгружается
+через git archive), каждая версия - в своем процессе. Если p50 текущей версии больше p50 прежней
+больше чем на --max-regression процентов, замер завершается с ошибкой.
+
+Запуск: python -m benchmarks.typing_latency [--baseline e0ee3e3] [--size 1] [--keys 100] [--span 60000]
+        [--interval 0] [--settle 0] [--max-regression 0]
+'''
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Замер работает без экрана
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+# Кусок кода Python, из повторов которого состоит файл (как в benchmarks.highlighter)
+SAMPLE = '''class Sample(object):
+    """
+    Docstring, spanning several lines
+    with 'quotes' inside
+    """
+    def __init__(self, value=42):
+        self.value = value  # comment
+        self.items = [abs(x) for x in range(10) if x % 2]
+
+    def method(self, text="string", other='other'):
+        return len(text) + int(3.5e3) if text else None
+
+'''
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def process_events(app, milliseconds):
+    '''
+    Обработка событий в течение данного времени
+    '''
+    deadline = time.perf_counter() + milliseconds / 1000
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def open_file(controller, path):
+    '''
+    Открытие файла в редакторе любой версии: у прежних нет open_path, и текст
+    сразу передается во вкладку
+    '''
+    if hasattr(controller, "open_path"):
+        controller.open_path(path)
+        return
+    model, view = controller._model, controller._view
+    model.load(path)
+    view.add_tab(model.get_text(), os.path.basename(path), 0, 0)
+
+
+def measure_tree(tree, args):
+    '''
+    Замер в редакторе из каталога tree (в этом процессе): задержки нажатий в секундах
+    '''
+    # Прежние версии хранят данные в каталоге cache текущего каталога, новые - в XDG_CACHE_HOME
+    directory = tempfile.mkdtemp()
+    os.environ["XDG_CACHE_HOME"] = directory
+    os.chdir(directory)
+    sys.path.insert(0, tree)
+
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtTest import QTest
+    from src.controller import TextEditorController
+
+    path = os.path.join(directory, "typing.py")
+    text = SAMPLE * (int(args.size * MB) // len(SAMPLE) + 1)
+    with open(path, 'w') as file:
+        file.write(text[:text.rfind('\n', 0, int(args.size * MB)) + 1])
+
+    controller = TextEditorController()
+    view = controller._view
+    open_file(controller, path)
+    model = controller._model
+    while hasattr(model, "get_is_loading") and model.get_is_loading():
+        process_events(view.app, 10)
+    # Индекс поиска строится в других процессах и отнимал бы у замера процессор
+    while hasattr(model, "get_trigram_index") and model.get_trigram_index() is not None \
+            and not model.get_trigram_index().get_is_built():
+        process_events(view.app, 10)
+    process_events(view.app, args.settle * 1000)
+
+    text_area = view.get_active_text_area() if hasattr(view, "get_active_text_area") else view._text_area
+    # Раскладка всего текста: иначе Qt доделывает ее по частям, и в замер попало бы то,
+    # сколько ее успела сделать каждая версия, а не сама правка
+    document = text_area.document()
+    document.documentLayout().blockBoundingRect(document.lastBlock())
+    generator = random.Random(0)
+    samples = []
+    for _ in range(args.keys):
+        cursor = text_area.textCursor()
+        cursor.setPosition(generator.randrange(args.span))
+        text_area.setTextCursor(cursor)
+        process_events(view.app, args.interval)
+
+        start = time.perf_counter()
+        QTest.keyClick(text_area, Qt.Key_A)
+        text_area.viewport().repaint()
+        samples.append(time.perf_counter() - start)
+
+    if hasattr(controller, "shutdown_process_pool"):
+        controller.shutdown_process_pool()
+    return samples
+
+
+def run_tree(tree, args):
+    '''
+    Замер в отдельном процессе: у каждой версии свой пакет src
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "samples.json")
+        subprocess.run([sys.executable, "-m", "benchmarks.typing_latency", "--tree", tree, "--output", output,
+                        "--size", str(args.size), "--keys", str(args.keys), "--span", str(args.span),
+                        "--interval", str(args.interval), "--settle", str(args.settle)], cwd=ROOT, check=True)
+        with open(output) as file:
+            return json.load(file)
+
+
+def extract_revision(revision, directory):
+    '''
+    Выгрузка src данной ревизии в каталог
+    '''
+    archive = subprocess.run(["git", "archive", revision, "src"], cwd=ROOT, check=True,
+                             stdout=subprocess.PIPE).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+
+
+def print_summary(name, samples):
+    print(f"{name:<12} p50 {percentile(samples, 0.5) * 1000:8.2f} ms  p99 {percentile(samples, 0.99) * 1000:8.2f} ms"
+          f"  max {max(samples) * 1000:8.2f} ms", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="git revision to compare with")
+    parser.add_argument("--size", type=float, default=1, help="file size in MB")
+    parser.add_argument("--keys", type=int, default=100, help="number of key presses")
+    parser.add_argument("--span", type=int, default=60000, help="key presses go to the first SPAN characters")
+    parser.add_argument("--interval", type=int, default=0,
+                        help="pause between key presses with event processing, ms")
+    parser.add_argument("--settle", type=float, default=0, help="pause after opening the file with event processing, s")
+    parser.add_argument("--max-regression", type=float, default=0,
+                        help="allowed growth of p50 against the baseline, in percent")
+    # Замер одной версии в дочернем процессе: каталог с ее src и файл для результата
+    parser.add_argument("--tree", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.tree:
+        samples = measure_tree(args.tree, args)
+        with open(args.output, 'w') as file:
+            json.dump(samples, file)
+        # Окно и фоновые потоки редактора не закрываются (пул процессов уже остановлен): процесс просто завершается
+        os._exit(0)
+
+    current = run_tree(ROOT, args)
+    print_summary("current", current)
+    if not args.baseline:
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        extract_revision(args.baseline, directory)
+        baseline = run_tree(directory, args)
+    print_summary(args.baseline, baseline)
+
+    previous, now = percentile(baseline, 0.5), percentile(current, 0.5)
+    if now > previous * (1 + args.max_regression / 100):
+        sys.exit(f"typing p50 {previous * 1000:.2f} ms -> {now * 1000:.2f} ms "
+                 f"(allowed {args.max_regression:.0f}% growth)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,45 @@
+import time
+
+# Начало отсчета для --profile-startup
+START = time.perf_counter()
+
+import argparse
+
 import src
+from src.constants import WATCHDOG_STALL_MS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sigma Text Editor")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase takes (to stderr)")
+    parser.add_argument("--exit-after-startup", action="store_true",
+                        help="exit right after the window is first painted (implies --profile-startup)")
+    parser.add_argument("--record-session", metavar="FILE",
+                        help="record keyboard and mouse input to FILE for replay with benchmarks.replay")
+    parser.add_argument("--stall-threshold", metavar="MS", type=int, default=WATCHDOG_STALL_MS,
+                        help="log main-thread stacks when the GUI stalls longer than MS milliseconds "
+                             f"(0 disables, default {WATCHDOG_STALL_MS})")
+    # Остальные аргументы (например, -platform) разбирает Qt
+    args, _ = parser.parse_known_args()
+
+    profile = None
+    if args.profile_startup or args.exit_after_startup:
+        from src.startup_profile import StartupProfile
+
+        profile = StartupProfile(START)
+
+    controller_class = src.TextEditorController
+    if profile is not None:
+        profile.mark("imports")
+
+    app = controller_class(profile)
+    if args.exit_after_startup:
+        profile.finished.connect(app.exit)
+    if args.record_session:
+        app.record_session(args.record_session)
+    app.run(args.stall_threshold)
+
 
 if __name__ == '__main__':
-    app = src.TextEditorController()
-    app.run()
\ No newline at end of file
+    main()
@@ -1,12 +1,9 @@
-from .controller import *
-
-if not os.path.exists("cache"):
-    os.mkdir("cache")
-
-if not os.path.exists(PATH_TO_SAVE_OPENED_FILES):
-    with open(PATH_TO_SAVE_OPENED_FILES, 'w') as file:
-        file.write('{}')
-
-if not os.path.exists(PATH_TO_SAVE_APP_DATA):
-    with open(PATH_TO_SAVE_APP_DATA, 'w') as file:
-        file.write('{}')
+def __getattr__(name):
+    '''
+    Контроллер (а с ним Qt и все окно) импортируется при первом обращении: импорт пакета
+    ничего не создает и не тянет интерфейс в процессы пула и в замеры
+    '''
+    if name == "TextEditorController":
+        from .controller import TextEditorController
+        return TextEditorController
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,169 @@
+from .constants import ROPE_LEAF_SIZE
+
+
+class Rope:
+    '''
+    Неизменяемая строка в виде сбалансированного (AVL) дерева кусков текста.
+    Вставка и удаление возвращают новую верёвку за O(log n), переиспользуя
+    нетронутые поддеревья, поэтому старая версия остаётся корректным снимком
+    '''
+    __slots__ = ('left', 'right', 'leaf', 'length', 'height', '_text')
+
+    def __init__(self, left=None, right=None, leaf=""):
+        self.left = left
+        self.right = right
+        self.leaf = leaf
+        self._text = None
+
+        if left is None:
+            self.length = len(leaf)
+            self.height = 0
+        else:
+            self.length = left.length + right.length
+            self.height = max(left.height, right.height) + 1
+
+    @classmethod
+    def from_text(cls, text):
+        '''
+        Построение сбалансированной верёвки из строки
+        '''
+        if len(text) <= ROPE_LEAF_SIZE:
+            return cls(leaf=text)
+
+        nodes = [cls(leaf=text[i:i + ROPE_LEAF_SIZE]) for i in range(0, len(text), ROPE_LEAF_SIZE)]
+        while len(nodes) > 1:
+            paired = [cls(nodes[i], nodes[i + 1]) for i in range(0, len(nodes) - 1, 2)]
+            if len(nodes) % 2:
+                paired[-1] = _concat(paired[-1], nodes[-1])
+            nodes = paired
+
+        return nodes[0]
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return self.get_text()
+
+    def get_text(self):
+        '''
+        Весь текст одной строкой (результат запоминается)
+        '''
+        if self._text is None:
+            self._text = self.leaf if self.left is None else ''.join(self.chunks())
+        return self._text
+
+    def chunks(self, start=0, end=None):
+        '''
+        Последовательный обход кусков текста на отрезке [start, end) без склейки
+        '''
+        end = self.length if end is None else min(end, self.length)
+        start = max(start, 0)
+        if start >= end:
+            return
+
+        if self._text is not None:
+            yield self._text[start:end]
+            return
+
+        stack = [(self, 0)]
+        while stack:
+            node, offset = stack.pop()
+            if offset >= end or offset + node.length <= start:
+                continue
+
+            if node.left is None:
+                yield node.leaf[max(start - offset, 0):end - offset]
+            else:
+                stack.append((node.right, offset + node.left.length))
+                stack.append((node.left, offset))
+
+    def substring(self, start, end):
+        '''
+        Текст на отрезке [start, end)
+        '''
+        return ''.join(self.chunks(start, end))
+
+    def replace(self, position, removed, inserted):
+        '''
+        Новая верёвка, в которой с позиции position удалено removed символов и вставлен текст inserted
+        '''
+        left, rest = _split(self, position)
+        _, right = _split(rest, removed)
+        if inserted:
+            left = _concat(left, Rope.from_text(inserted))
+        return _concat(left, right)
+
+    def insert(self, position, text):
+        return self.replace(position, 0, text)
+
+    def delete(self, start, end):
+        return self.replace(start, end - start, "")
+
+
+EMPTY_ROPE = Rope()
+
+
+def _node(left, right):
+    '''
+    Внутренний узел с восстановлением AVL-баланса поворотами
+    '''
+    if left.height > right.height + 1:
+        left_left, left_right = left.left, left.right
+        if left_left.height < left_right.height:
+            return Rope(Rope(left_left, left_right.left), Rope(left_right.right, right))
+        return Rope(left_left, Rope(left_right, right))
+
+    if right.height > left.height + 1:
+        right_left, right_right = right.left, right.right
+        if right_right.height < right_left.height:
+            return Rope(Rope(left, right_left.left), Rope(right_left.right, right_right))
+        return Rope(Rope(left, right_left), right_right)
+
+    return Rope(left, right)
+
+
+def _concat(left, right):
+    '''
+    Склейка двух верёвок за O(|h1 - h2|); маленькие соседние листья сливаются
+    '''
+    if not left.length:
+        return right
+    if not right.length:
+        return left
+
+    if left.left is None and right.left is None:
+        if left.length + right.length <= ROPE_LEAF_SIZE:
+            return Rope(leaf=left.leaf + right.leaf)
+        return Rope(left, right)
+
+    if left.height > right.height + 1 or (right.left is None and right.length < ROPE_LEAF_SIZE):
+        return _node(left.left, _concat(left.right, right))
+
+    if right.height > left.height + 1 or (left.left is None and left.length < ROPE_LEAF_SIZE):
+        return _node(_concat(left, right.left), right.right)
+
+    return Rope(left, right)
+
+
+def _split(node, index):
+    '''
+    Разрезание верёвки на две части: [0, index) и [index, len)
+    '''
+    if index <= 0:
+        return EMPTY_ROPE, node
+    if index >= node.length:
+        return node, EMPTY_ROPE
+
+    if node.left is None:
+        return Rope(leaf=node.leaf[:index]), Rope(leaf=node.leaf[index:])
+
+    left_length = node.left.length
+    if index == left_length:
+        return node.left, node.right
+    if index < left_length:
+        left, right = _split(node.left, index)
+        return left, _concat(right, node.right)
+
+    left, right = _split(node.right, index - left_length)
+    return _concat(node.left, left), right
@@ -1,7 +1,110 @@
+# Данные сеанса хранятся в каталоге пользователя: $XDG_CACHE_HOME/APP_CACHE_DIR (по умолчанию ~/.cache)
+APP_CACHE_DIR = "sigma-text-editor"
+SESSION_FILENAME = "session.sqlite3"
+# Файлы сеанса прежних версий (относительно текущего каталога, переносятся в базу при первом запуске)
 PATH_TO_SAVE_OPENED_FILES = "cache/opened.json"
 PATH_TO_SAVE_APP_DATA = "cache/data.json"
 DOCUMENTATION_LINK = "https://github.com/jrxed/TextEditor/blob/main/README.md"
 
+# Потоков в пуле фоновых задач не меньше этого (их задачи в основном ждут диска или других процессов)
+THREAD_POOL_MIN_THREADS = 4
+
+ROPE_LEAF_SIZE = 2048
+# Индекс строк хранит длины строк блоками примерно по столько строк
+LINE_INDEX_BLOCK_SIZE = 512
+MAX_RESIDENT_DOCUMENTS = 8
+# Документы с историей правок выгружаются, только когда их сверх лимита больше этого (иначе правки не отменить)
+MAX_EDITED_DOCUMENTS_OVER_LIMIT = 8
+
+# Положение курсора и прокрутки передаются контроллеру не чаще раза за столько миллисекунд (кадр)
+VIEW_UPDATE_INTERVAL_MS = 16
+# Растягивание окна оконной системой считается законченным после такой паузы в изменениях размера
+WINDOW_RESIZE_SETTLE_MS = 200
+# Версия формата записи ввода (main.py --record-session, воспроизведение - benchmarks.replay)
+SESSION_RECORDING_VERSION = 1
+# Трассировка (src/tracing.py) включается при запуске, если задана эта переменная окружения:
+# ее значение - файл, в который трасса записывается при выходе
+TRACE_ENV_VAR = "SIGMA_EDITOR_TRACE"
+# Сколько событий хранит трасса (дальше обновляются только суммы по именам)
+TRACE_EVENT_LIMIT = 1000000
+# Как часто обновляется панель отладки
+DEBUG_PANEL_REFRESH_MS = 500
+# Цикл событий считается зависшим, если не отмечался дольше WATCHDOG_STALL_MS (main.py --stall-threshold).
+# Отметка ставится каждые HEARTBEAT_MS, стеки зависшего потока снимаются каждые SAMPLE_MS
+WATCHDOG_STALL_MS = 50
+WATCHDOG_HEARTBEAT_MS = 10
+WATCHDOG_SAMPLE_MS = 5
+# Журнал зависаний в каталоге данных: размер файла, число прежних файлов и сколько разных стеков пишется
+WATCHDOG_LOG_FILENAME = "stalls.log"
+WATCHDOG_LOG_SIZE = 1024 * 1024
+WATCHDOG_LOG_BACKUPS = 3
+WATCHDOG_MAX_STACKS = 5
+
+# Файлы с большим числом строк подсвечиваются лениво: сначала видимая часть, затем порциями
+LAZY_HIGHLIGHT_THRESHOLD = 5000
+LAZY_HIGHLIGHT_BUDGET_MS = 8
+LAZY_HIGHLIGHT_IDLE_MS = 50
+# Форматы видимых строк, заданные дальше этого (в символах) от прежних, перекладываются сразу
+LAZY_HIGHLIGHT_FLUSH_DISTANCE = 64 * 1024
+
+# Файлы больше этого размера (в байтах) открываются только для просмотра через mmap
+LARGE_FILE_THRESHOLD = 32 * 1024 * 1024
+# Индекс строк хранит число переводов строки на каждый кусок файла такого размера
+LARGE_FILE_INDEX_CHUNK = 16 * 1024
+# Сколько байт одной строки декодируется для показа
+LARGE_FILE_LINE_LIMIT = 16 * 1024
+LARGE_FILE_TAB_SIZE = 4
+LARGE_FILE_PROGRESS_MS = 100
+
+# Файлы читаются в фоне кусками такого размера (в символах)
+LOAD_CHUNK_SIZE = 64 * 1024
+# Сколько прочитанных кусков может ждать обработки в потоке интерфейса
+LOAD_QUEUE_LIMIT = 4
+# Пауза перед фоновой загрузкой следующего файла из прошлого сеанса
+SESSION_RESTORE_IDLE_MS = 200
+
+# Как часто изменения сеанса (правки несохраненных файлов, положения курсоров) записываются в базу
+SESSION_FLUSH_MS = 1000
+# После стольких правок журнал файла заменяется новым снимком текста
+JOURNAL_COMPACT_EDITS = 1000
+
+# Тексты длиннее этого (в символах или байтах) ищутся в фоне
+FIND_ASYNC_THRESHOLD = 1024 * 1024
+# Поиск идет блоками такого размера, между блоками его можно отменить
+FIND_BLOCK_SIZE = 1024 * 1024
+# Насколько вхождение может заходить за границу блока, не требуя повторного поиска
+FIND_BLOCK_OVERLAP = 4096
+# Сколько скомпилированных шаблонов поиска запоминается
+FIND_PATTERN_CACHE_SIZE = 32
+# Пауза после ввода в поле поиска перед поиском
+SEARCH_DEBOUNCE_MS = 150
+# Уточненный запрос проверяется по прежним вхождениям, если их не больше этого
+SEARCH_REFINE_LIMIT = 10000
+# Подсветка вхождений: сначала видимые, затем по SEARCH_HIGHLIGHT_STEP с каждой стороны
+# за раз, пока не наберется SEARCH_HIGHLIGHT_LIMIT
+SEARCH_HIGHLIGHT_STEP = 100
+SEARCH_HIGHLIGHT_LIMIT = 1000
+SEARCH_HIGHLIGHT_IDLE_MS = 50
+# Замена всех вхождений применяется порциями по столько вхождений
+REPLACE_CHUNK_SIZE = 500
+
+# Тексты от такого размера (в символах или байтах) индексируются для поиска по тройкам символов
+# (None - индекс не строится). Индекс хранит фильтр троек на каждый блок текста такой длины
+TRIGRAM_INDEX_THRESHOLD = 1024 * 1024
+TRIGRAM_INDEX_BLOCK_SIZE = 16 * 1024
+# Размер фильтра блока в битах (степень двойки)
+TRIGRAM_INDEX_FILTER_BITS = 32 * 1024
+# Фильтры считаются в пуле процессов пачками по столько блоков
+TRIGRAM_INDEX_BATCH = 64
+# Фильтры измененных блоков пересчитываются после паузы во вводе порциями не дольше BUDGET_MS
+TRIGRAM_INDEX_IDLE_MS = 300
+TRIGRAM_INDEX_BUDGET_MS = 8
+
+# Поиск в файлах: файлы на диске передаются в пул процессов пачками по столько файлов
+FIND_IN_FILES_BATCH = 32
+# Сколько символов строки с вхождением показывается в результатах
+FIND_IN_FILES_PREVIEW = 200
+
 PYTHON_KEYWORDS = ("False", "await", "else", "import", "pass", "None", "break", "except", "in", "raise", "True",
                    "class", "finally", "is", "return", "and", "continue", "for", "lambda", "try", "as", "def", "from",
                    "nonlocal", "while", "assert", "del", "global", "not", "with", "async", "elif", "if", "or", "yield")
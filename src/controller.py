@@ -1,89 +1,396 @@
-import json
-import webbrowser
+import os
+import re
 
-from PyQt5.QtWidgets import QFileDialog, QMessageBox
+from PyQt5.QtCore import QCoreApplication, QThreadPool, QTimer
+from PyQt5.QtWidgets import QFileDialog, QInputDialog, QMessageBox
 
-from .model import *
-from .view import *
-from .constants import PATH_TO_SAVE_APP_DATA, PATH_TO_SAVE_OPENED_FILES, DOCUMENTATION_LINK
+from .find_in_files import FilesSearch
+from .finder import Finder, compile_pattern, find_all, is_refinement, refine_matches
+from .journal import Journal
+from .paths import get_session_path
+from .loader import FileLoader
+from .saver import FileSaver
+from .session_store import SessionStore
+from .tracing import TRACER, trace_methods
+from .trigram_index import IndexBuilder, TrigramIndex, get_query_bits
+from .model import TextEditorModel
+from .view import TextEditorView
+from .constants import PATH_TO_SAVE_APP_DATA, PATH_TO_SAVE_OPENED_FILES, DOCUMENTATION_LINK, \
+    SESSION_RESTORE_IDLE_MS, SESSION_FLUSH_MS, FIND_ASYNC_THRESHOLD, SEARCH_DEBOUNCE_MS, SEARCH_REFINE_LIMIT, \
+    SEARCH_HIGHLIGHT_STEP, SEARCH_HIGHLIGHT_LIMIT, SEARCH_HIGHLIGHT_IDLE_MS, REPLACE_CHUNK_SIZE, \
+    TRIGRAM_INDEX_THRESHOLD, TRIGRAM_INDEX_IDLE_MS, TRIGRAM_INDEX_BUDGET_MS, THREAD_POOL_MIN_THREADS, TRACE_ENV_VAR, \
+    WATCHDOG_STALL_MS
 
 
+@trace_methods("controller")
 class TextEditorController:
     '''
     Объект данного класса обеспечивает взаимодействие между графическим интерфейсом и данными приложения
     '''
-    def __init__(self):
+    def __init__(self, profile=None):
         self._model = TextEditorModel()
         self._view = None
+        # Замер этапов запуска (StartupProfile) или None
+        self._profile = profile
 
         self.new_files_counter = 1
+        # Фоновые загрузки: doc_id -> (загрузчик, положение слайдера, положение курсора)
+        self._loaders = {}
+        # Поиск всех вхождений: (doc_id, версия текста, шаблон) и (строка, параметры) последнего запроса,
+        # его номер, найденные вхождения (None, пока идет фоновый поиск), фоновый поиск, действие,
+        # ожидающее его завершения, и номера подсвеченных вхождений (первый, последний + 1)
+        self._search_key = None
+        self._search_query = None
+        self._search_id = 0
+        self._matches = None
+        self._finder = None
+        self._pending_action = None
+        self._highlight_range = None
+        # Замена всех вхождений: (doc_id, исходный текст, шаблон, регулярное ли выражение, строка замены,
+        # вхождения)
+        # и число еще не замененных вхождений (замена идет с конца)
+        self._replace_job = None
+        self._replace_index = 0
+        # Поиск в файлах: номер и запрос (аргументы compile_pattern) последнего поиска, сам поиск,
+        # пул процессов для файлов на диске, очередь файлов для замены, строка замены, файл,
+        # загрузки которого ждет замена, и переход к вхождению, ждущий загрузки файла
+        self._files_search_id = 0
+        self._files_query = None
+        self._files_search = None
+        self._process_pool = None
+        self._files_replace_queue = None
+        self._files_replace_text = ""
+        self._files_replace_waiting = None
+        self._pending_jump = None
+        # Фоновое построение индексов троек: doc_id -> построение
+        self._indexers = {}
+        # Фоновые сохранения: doc_id -> сохранение; файлы, которые нужно сохранить еще раз после текущего
+        self._savers = {}
+        self._pending_saves = set()
+        # Собственный пул: глобальный Qt использует сам (например, для преобразования картинок)
+        # и ждет его в потоке интерфейса, а загрузчик может занять поток пула надолго.
+        # Задачи пула в основном ждут диска или пула процессов, поэтому потоков не меньше THREAD_POOL_MIN_THREADS
+        self._thread_pool = QThreadPool()
+        self._thread_pool.setMaxThreadCount(max(self._thread_pool.maxThreadCount(), THREAD_POOL_MIN_THREADS))
 
-        was_saved_opened, files = self.check_for_opened_files()
-        self._view = TextEditorView(self)
+        self._store = SessionStore(get_session_path())
+        self._store.import_legacy(PATH_TO_SAVE_OPENED_FILES, PATH_TO_SAVE_APP_DATA)
+        self._journal = Journal(self._store)
+        # Последние записанные в базу положения (doc_id -> (слайдер, курсор)) и настройки окна
+        self._stored_positions = {}
+        self._stored_settings = self._store.get_settings()
+        if profile is not None:
+            profile.mark("session open")
 
-        if was_saved_opened:
-            self.init_states(files)
+        self._view = TextEditorView(self, profile)
+        self._view.set_tracing(TRACER.get_enabled())
 
-        was_saved_app, settings = self.check_for_app_data()
-        if was_saved_app:
+        # Файлы прошлого сеанса, кроме активного, загружаются по одному в фоне
+        self._restore_timer = QTimer()
+        self._restore_timer.setSingleShot(True)
+        self._restore_timer.setInterval(SESSION_RESTORE_IDLE_MS)
+        self._restore_timer.timeout.connect(self.restore_next)
+
+        # Поиск по мере ввода запускается после паузы во вводе, подсветка вхождений расширяется в фоне
+        self._search_timer = QTimer()
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self.search_as_you_type)
+        self._highlight_timer = QTimer()
+        self._highlight_timer.setSingleShot(True)
+        self._highlight_timer.setInterval(SEARCH_HIGHLIGHT_IDLE_MS)
+        self._highlight_timer.timeout.connect(self.extend_match_highlights)
+        self._replace_timer = QTimer()
+        self._replace_timer.setSingleShot(True)
+        self._replace_timer.timeout.connect(self.replace_next)
+        # Индекс троек активного файла обновляется после паузы во вводе
+        self._index_timer = QTimer()
+        self._index_timer.setSingleShot(True)
+        self._index_timer.timeout.connect(self.reindex_current)
+
+        self.init_states(self._store.get_documents())
+
+        # Положения курсоров, настройки окна и правки записываются в базу по таймеру
+        self._session_timer = QTimer()
+        self._session_timer.timeout.connect(self.save_data)
+        self._session_timer.start(SESSION_FLUSH_MS)
+
+        index = self._model.get_number_of_states() - 1
+        settings = self._stored_settings
+        if "pos" in settings and "size" in settings:
             self._view.apply_settings(pos=settings["pos"], size=settings["size"])
-            self.change_state(settings["index"])
+        if 0 <= settings.get("index", -1) < self._model.get_number_of_states():
+            index = settings["index"]
+        self.change_state(index)
+        self._restore_timer.start()
+        if profile is not None:
+            profile.mark("session restore")
 
-    def run(self):
+    def run(self, stall_threshold_ms=WATCHDOG_STALL_MS):
         '''
-        Запуск приложения
+        Запуск приложения (stall_threshold_ms - порог зависания для журнала, 0 - без наблюдения)
         '''
-        self._view.run()
+        self._view.run(stall_threshold_ms)
 
-    def check_for_opened_files(self):
+    def init_states(self, documents):
         '''
-        Проверка, оставались ли открытые файлы после прошлого сеанса с целью их открытия
+        Инициализация данных о файлах из предыдущего сеанса. Файлы с диска не читаются:
+        для них создаются только вкладки, загрузка начинается при переключении на вкладку
+        или в фоне (restore_next). Несохраненный текст (журнал правок, в том числе после
+        аварийного завершения) восстанавливается сразу
         '''
-        if os.path.isfile(PATH_TO_SAVE_OPENED_FILES):
-            with open(PATH_TO_SAVE_OPENED_FILES, 'r') as file:
-                cont = json.loads(file.read())
+        recovered = 0
+        for key, filename, is_filename_actual, content_hash, slider_pos, cursor_pos, has_buffer in documents:
+            if has_buffer:
+                text, edits = self._store.read_buffer(key)
+                state = self._model.add_recovered(key, filename, is_filename_actual, text, edits,
+                                                  slider_pos, cursor_pos)
+                if state is None:
+                    continue
+                self._view.add_placeholder_tab(filename)
+                self._view.add_tab_star(self._model.get_state_index(state))
+                # Новый снимок заменит прочитанный вместе с правками
+                self._journal.start(state)
+                self.index_state(state)
+                recovered += 1
+            elif is_filename_actual:
+                if self._model.add_placeholder(filename, slider_pos, cursor_pos, key, content_hash):
+                    self._view.add_placeholder_tab(filename)
+            else:
+                # Новый файл без текста
+                self._model.create(filename, key)
+                self._view.add_placeholder_tab(filename)
 
-            if len(cont):
-                return True, cont
+            if not is_filename_actual and filename.startswith("New file "):
+                number = filename[len("New file "):]
+                if number.isdigit():
+                    self.new_files_counter = max(self.new_files_counter, int(number) + 1)
 
-        return False, None
+        # Пропущенные файлы (удаленные с диска, повторы) убираются из базы
+        self._store.put_documents([self.get_document_row(state) for state in self._model.get_states()])
+        if recovered:
+            self._view.show_message(f"Recovered unsaved changes: {recovered} file(s)")
 
-    def check_for_app_data(self):
+        return self._model.get_number_of_states()
+
+    def get_document_row(self, state):
         '''
-        Сохранение настроек от предыдущего сеанса
+        Данные о файле для базы сеанса
         '''
-        if os.path.isfile(PATH_TO_SAVE_APP_DATA):
-            with open(PATH_TO_SAVE_APP_DATA, 'r') as file:
-                cont = json.loads(file.read())
-
-            if len(cont):
-                return True, cont
-
-        return False, None
+        return (state.get_key(), state.get_filename(), state.get_is_filename_actual(), state.get_content_hash(),
+                state.get_slider_pos(), state.get_cursor_pos())
 
-    def init_states(self, data):
+    def store_current_document(self):
         '''
-        Инициализация данных о файлах из предыдущего сеанса
+        Запись в базу только что открытого или созданного (активного) файла
         '''
-        for filename in data:
-            slider_pos, cursor_pos = map(int, data[filename])
-            if self._model.load(filename, slider_pos, cursor_pos):
-                self._view.add_tab(self._model.get_text(), filename.split('/')[-1], slider_pos, cursor_pos)
-
-        return self._model.get_number_of_states()
+        state = self._model.get_current_state()
+        self._store.put_document(self._model.get_state_index(state), *self.get_document_row(state))
 
     def open_file(self):
         '''
         Открытие файла
         '''
         path = QFileDialog.getOpenFileName(None, 'Open file', os.path.curdir, "All files (*)")[0]
+        self.open_path(path)
+
+    def open_path(self, path):
+        '''
+        Открытие файла по пути (если он уже открыт - переход к нему)
+        '''
+        self._view.flush_position_updates()
+        self.stop_replace()
+        self.clear_search()
         if self._model.load(path):
-            self._view.add_tab(self._model.get_text(), self._model.get_filename().split('/')[-1], 0, 0)
+            self.add_current_tab(0, 0)
+            self.store_current_document()
+        else:
+            self.change_state(self._model.find(path))
+
+    def add_current_tab(self, slider_pos, cursor_pos):
+        '''
+        Добавление вкладки для только что открытого файла
+        '''
+        if self._model.get_is_mapped():
+            self._view.add_mapped_tab(self._model.get_mapped_buffer(), self._model.get_filename(),
+                                      slider_pos, cursor_pos)
+            self.index_state(self._model.get_current_state())
+        elif self._model.get_is_loading():
+            doc_id = self._model.get_doc_id()
+            self._view.start_loading(doc_id)
+            self._view.add_tab(doc_id, "", self._model.get_filename(), 0, 0)
+            self.start_loading(doc_id, self._model.get_filename(), slider_pos, cursor_pos)
         else:
-            index = self._model.find(path)
-            self._model.change_state(index)
-            self._view.switch_tab(index, self._model.get_text(),
-                                  self._model.get_slider_pos(), self._model.get_cursor_pos())
+            self._view.add_tab(self._model.get_doc_id(), self._model.get_text(), self._model.get_filename(),
+                               slider_pos, cursor_pos)
+
+    def restore_state(self, state):
+        '''
+        Начало загрузки файла из прошлого сеанса
+        '''
+        self._model.restore(state)
+        if state.get_is_loading():
+            doc_id = state.get_doc_id()
+            self._view.start_loading(doc_id)
+            self.start_loading(doc_id, state.get_filename(), state.get_slider_pos(), state.get_cursor_pos())
+        else:
+            self.index_state(state)
+
+    def restore_next(self):
+        '''
+        Фоновая загрузка следующего файла из прошлого сеанса. Файлы загружаются
+        по одному, чтобы не мешать загрузке и работе с активным файлом
+        '''
+        if self._loaders:
+            return
+
+        for state in self._model.get_states():
+            if state.get_is_placeholder():
+                self.restore_state(state)
+                # Большой файл только отображается в память, ждать окончания загрузки не нужно
+                if not state.get_is_loading():
+                    self._restore_timer.start()
+                return
+
+    def start_loading(self, doc_id, filename, slider_pos, cursor_pos):
+        '''
+        Запуск фоновой загрузки текста файла
+        '''
+        loader = FileLoader(doc_id, filename)
+        loader.signals.chunk_loaded.connect(self.on_chunk_loaded)
+        loader.signals.finished.connect(self.on_loading_finished)
+        loader.signals.failed.connect(self.on_loading_failed)
+        self._loaders[doc_id] = (loader, slider_pos, cursor_pos)
+        self._thread_pool.start(loader)
+
+    def on_chunk_loaded(self, doc_id, text, progress):
+        '''
+        Получение очередного куска текста загружаемого файла
+        '''
+        self._loaders[doc_id][0].chunk_processed()
+        state = self._model.get_state(doc_id)
+        if state is None or not state.get_is_loading():
+            return
+
+        state.append_text(text)
+        self._view.append_text(doc_id, text)
+        self._view.show_message(f"Loading {state.get_filename().split('/')[-1]}: {progress:.0%}")
+
+    def on_loading_finished(self, doc_id, content_hash):
+        '''
+        Завершение фоновой загрузки (в том числе отмененной)
+        '''
+        _, slider_pos, cursor_pos = self._loaders.pop(doc_id)
+        self._restore_timer.start()
+        state = self._model.get_state(doc_id)
+        if state is None:
+            return
+
+        if content_hash:
+            # Файл изменили вне редактора: сохраненные положения к нему уже не относятся
+            if state.get_content_hash() and state.get_content_hash() != content_hash:
+                slider_pos = cursor_pos = 0
+            state.set_content_hash(content_hash)
+            self._store.update_document(state.get_key(), content_hash=content_hash)
+
+        state.set_is_loading(False)
+        state.set_slider_pos(slider_pos)
+        state.set_cursor_pos(cursor_pos)
+        self.index_state(state)
+        self._view.finish_loading(doc_id, state.get_filename(), slider_pos, cursor_pos)
+        if not self._loaders:
+            self._view.show_message("")
+
+        if self._pending_jump is not None and self._pending_jump[0] == doc_id:
+            _, start, end = self._pending_jump
+            self._pending_jump = None
+            if self._model.get_doc_id() == doc_id:
+                self._view.scroll_to_index(start, end - start)
+        if self._files_replace_waiting == doc_id:
+            self._files_replace_waiting = None
+            QTimer.singleShot(0, self.replace_next_file)
+
+    def index_state(self, state):
+        '''
+        Запуск фонового построения индекса троек для большого текста (если его еще нет).
+        Правки во время построения индекс запоминает и учитывает после него
+        '''
+        if TRIGRAM_INDEX_THRESHOLD is None or state.get_trigram_index() is not None:
+            return
+
+        mapped_buffer = state.get_mapped_buffer()
+        length = mapped_buffer.get_size() if mapped_buffer is not None else state.get_length()
+        if length < TRIGRAM_INDEX_THRESHOLD:
+            return
+
+        doc_id = state.get_doc_id()
+        state.set_trigram_index(TrigramIndex())
+        indexer = IndexBuilder(doc_id, mapped_buffer.get_mapping() if mapped_buffer is not None
+                               else state.get_snapshot(), self.get_process_pool())
+        indexer.signals.built.connect(self.on_index_built)
+        indexer.signals.failed.connect(self.on_index_failed)
+        self._indexers[doc_id] = indexer
+        self._thread_pool.start(indexer)
+
+    def on_index_built(self, doc_id, blocks):
+        '''
+        Завершение фонового построения индекса троек
+        '''
+        self._indexers.pop(doc_id, None)
+        state = self._model.get_state(doc_id)
+        if state is None or state.get_trigram_index() is None:
+            return
+
+        state.get_trigram_index().set_blocks(*blocks)
+        if doc_id == self._model.get_doc_id():
+            self._index_timer.start(TRIGRAM_INDEX_IDLE_MS)
+
+    def on_index_failed(self, doc_id):
+        '''
+        Ошибка построения индекса троек: индекс отбрасывается, и поиск идет по всему тексту.
+        Следующие поиск или правка в файле попробуют построить индекс снова
+        '''
+        self._indexers.pop(doc_id, None)
+        state = self._model.get_state(doc_id)
+        if state is not None:
+            state.set_trigram_index(None)
+
+    def reindex_current(self):
+        '''
+        Пересчет измененных блоков индекса троек активного файла порциями между событиями ввода.
+        Если индекса нет (файл дорос до порога), начинается его построение
+        '''
+        if not self._model.get_number_of_states():
+            return
+
+        state = self._model.get_current_state()
+        if state.get_trigram_index() is None:
+            # Запуск пула процессов и склейка текста отняли бы время у нажатия клавиши
+            self.index_state(state)
+            return
+        if state.get_trigram_index().reindex(state.get_text_range, TRIGRAM_INDEX_BUDGET_MS / 1000):
+            self._index_timer.start(0)
+
+    def on_loading_failed(self, doc_id, message):
+        '''
+        Ошибка чтения файла: вкладка закрывается
+        '''
+        self._loaders.pop(doc_id)
+        self._restore_timer.start()
+        state = self._model.get_state(doc_id)
+        if state is None:
+            return
+
+        self.change_state(self._model.get_state_index(state))
+        self.close_file()
+        self._view.show_message(f"Cannot open file: {message}")
+
+    def cancel_loading(self):
+        '''
+        Отмена загрузки активного файла (вкладка закрывается)
+        '''
+        if self._model.get_number_of_states() and self._model.get_is_loading():
+            self.close_file()
 
     def change_state(self, index):
         '''
@@ -91,24 +398,89 @@ class TextEditorController:
         '''
         if self._model.get_number_of_states() <= index or index == -1:
             return
+        # Отложенные положения курсора и слайдера относятся к прежнему файлу
+        self._view.flush_position_updates()
+        self.stop_replace()
+        self.clear_search()
         self._model.change_state(index)
-        text = self._model.get_text()
+        self._index_timer.start(TRIGRAM_INDEX_IDLE_MS)
+        if self._model.get_is_placeholder():
+            self.restore_state(self._model.get_current_state())
+        if self._model.get_is_mapped():
+            self._view.switch_mapped_tab(index, self._model.get_mapped_buffer(),
+                                         self._model.get_slider_pos(), self._model.get_cursor_pos())
+            return
+        doc_id = self._model.get_doc_id()
+        text = None if self._view.has_document(doc_id) else self._model.get_text()
         slider_pos = self._model.get_slider_pos()
         cursor_pos = self._model.get_cursor_pos()
-        self._view.switch_tab(index, text, slider_pos, cursor_pos)
+        self._view.switch_tab(index, doc_id, text, self._model.get_filename(), slider_pos, cursor_pos)
 
     def save_file(self):
         '''
         Сохранение активного файла
         '''
         if self._model.current_state:
-            if not self._model.get_filename() or not self._model.get_is_filename_actual():
+            if self._model.get_is_loading():
+                self._view.show_message("The file is still loading")
+            elif not self._model.get_filename() or not self._model.get_is_filename_actual():
                 self.save_file_as()
             else:
-                with open(self._model.get_filename(), 'w') as file:
-                    file.write(self._model.get_text())
-                self._model.set_is_modified(False)
-                self._view.remove_tab_star()
+                self.save_state(self._model.get_current_state())
+
+    def save_state(self, state):
+        '''
+        Сохранение файла в фоне. Если файл уже сохраняется, он будет сохранен
+        еще раз после завершения текущей записи, чтобы старый снимок не оказался последним
+        '''
+        doc_id = state.get_doc_id()
+        if doc_id in self._savers:
+            self._pending_saves.add(doc_id)
+            return
+
+        mapped_buffer = state.get_mapped_buffer()
+        saver = FileSaver(doc_id, state.get_version(), state.get_filename(), state.get_snapshot(),
+                          mapped_buffer.get_filename() if mapped_buffer is not None else None)
+        saver.signals.saved.connect(self.on_file_saved)
+        saver.signals.failed.connect(self.on_save_failed)
+        self._savers[doc_id] = saver
+        self._thread_pool.start(saver)
+
+    def on_file_saved(self, doc_id, version, filename, content_hash):
+        '''
+        Завершение фонового сохранения: файл помечается сохраненным, только если
+        его текст и путь не менялись во время записи
+        '''
+        del self._savers[doc_id]
+        state = self._model.get_state(doc_id)
+        if state is None:
+            return
+
+        if doc_id in self._pending_saves:
+            self._pending_saves.discard(doc_id)
+            self.save_state(state)
+        elif state.get_version() == version and state.get_filename() == filename:
+            self._model.mark_saved(state)
+            self._journal.discard(state)
+            state.set_content_hash(content_hash)
+            self._store.update_document(state.get_key(), content_hash=content_hash)
+            self._view.remove_tab_star(self._model.get_state_index(state))
+
+    def on_save_failed(self, doc_id, message):
+        '''
+        Ошибка фонового сохранения: файл остается несохраненным
+        '''
+        del self._savers[doc_id]
+        self._pending_saves.discard(doc_id)
+        self._view.show_message(f"Cannot save file: {message}")
+
+    def wait_for_saves(self):
+        '''
+        Ожидание завершения всех фоновых сохранений (например, перед выходом)
+        '''
+        while self._savers:
+            self._thread_pool.waitForDone(10)
+            QCoreApplication.processEvents()
 
     def save_file_as(self):
         '''
@@ -128,31 +500,48 @@ class TextEditorController:
             if overwrite == QMessageBox.No:
                 return
             else:
-                self._model.set_not_actual_filename(filename)
+                for state in self._model.set_not_actual_filename(filename):
+                    self._store.update_document(state.get_key(), is_filename_actual=False)
 
         self._model.set_filename(filename)
         self._model.set_is_filename_actual(True)
+        self._store.update_document(self._model.get_current_state().get_key(), filename=filename,
+                                    is_filename_actual=True)
         self._view.edit_current_tab(filename.split('/')[-1])
+        self._view.set_highlighter(self._model.get_doc_id(), filename)
         self.save_file()
 
     def save_all(self):
         '''
-        Сохранение всех открытых файлов
+        Сохранение всех измененных файлов. Файлы с путем сохраняются параллельно прямо
+        из модели, вкладки переключаются только для файлов, которым нужно выбрать путь
         '''
-        count = self._model.get_number_of_states()
-        for i in range(count):
-            self.change_state(i)
-            self.save_file()
+        unnamed = []
+        for state in self._model.get_states():
+            if not state.get_is_modified() or state.get_is_loading():
+                continue
+            if state.get_filename() and state.get_is_filename_actual():
+                self.save_state(state)
+            else:
+                unnamed.append(state)
+
+        for state in unnamed:
+            if self._model.get_state(state.get_doc_id()) is not None:
+                self.change_state(self._model.get_state_index(state))
+                self.save_file_as()
 
     def create_file(self):
         '''
         Создание нового файла
         '''
+        self._view.flush_position_updates()
+        self.stop_replace()
+        self.clear_search()
         name = f"New file {self.new_files_counter}"
         self.new_files_counter += 1
-        self._model.create()
-        self._model.set_filename(name)
-        self._view.add_tab(self._model.get_text(), self._model.get_filename().split('/')[-1], 0, 0)
+        self._model.create(name)
+        self._view.add_tab(self._model.get_doc_id(), self._model.get_text(), self._model.get_filename(), 0, 0)
+        self.store_current_document()
 
     def close_file(self):
         '''
@@ -170,18 +559,31 @@ class TextEditorController:
 
         index = self._view.get_tab_index()
         index = max(index - 1, 0)
+        doc_id = self._model.get_doc_id()
+        if doc_id in self._loaders:
+            self._loaders[doc_id][0].cancel()
+        if doc_id in self._indexers:
+            self._indexers.pop(doc_id).cancel()
+        self.stop_replace()
+        self.clear_search()
+        self._journal.discard(self._model.get_current_state())
+        self._store.remove_document(self._model.get_current_state().get_key())
+        self._stored_positions.pop(doc_id, None)
         self._model.close_state()
-        self._view.close_tab()
+        self._view.close_tab(doc_id)
 
         if self._model.get_number_of_states():
             self.change_state(index)
         else:
             self._view.hide_find()
+            self.update_cursor_pos(0)
 
     def exit(self):
         '''
         Выход из приложения
         '''
+        self.wait_for_saves()
+
         if self._model.get_count_unsaved():
             save_before_exit = QMessageBox.question(None, 'Save files',
                                                     "Do you want to save files before exiting?",
@@ -191,29 +593,98 @@ class TextEditorController:
                 return
             elif save_before_exit == QMessageBox.Yes:
                 self.save_all()
+                self.wait_for_saves()
+
+        self._restore_timer.stop()
+        self._session_timer.stop()
+        for loader, _, _ in self._loaders.values():
+            loader.cancel()
+        for indexer in self._indexers.values():
+            indexer.cancel()
+        self.stop_files_search()
+        self.shutdown_process_pool()
 
+        self._view.flush_position_updates()
         self.save_data()
+        # Несохраненные правки файлов на диске при выходе отброшены пользователем
+        self._journal.clear()
+        self._store.close()
+        self._view.stop_recording()
+        # Трасса, включенная переменной окружения, записывается в указанный в ней файл
+        if TRACER.get_enabled() and os.environ.get(TRACE_ENV_VAR):
+            self.export_trace(os.environ[TRACE_ENV_VAR])
         self._view.exit()
 
+    def record_session(self, path):
+        '''
+        Запись ввода пользователя в файл (main.py --record-session) для воспроизведения в benchmarks.replay
+        '''
+        files = [state.get_filename() if state.get_is_filename_actual() else None
+                 for state in self._model.get_states()]
+        self._view.start_recording(path, files)
+
+    def toggle_tracing(self):
+        '''
+        Включение трассировки (с чистой трассы) или выключение с записью трассы в выбранный файл
+        '''
+        if not TRACER.get_enabled():
+            TRACER.clear()
+            TRACER.set_enabled(True)
+            self._view.set_tracing(True)
+            self._view.show_message("Tracing started")
+            return
+
+        TRACER.set_enabled(False)
+        self._view.set_tracing(False)
+        filename = QFileDialog.getSaveFileName(None, 'Save trace', os.path.join(os.path.curdir, "trace.json"),
+                                               "Chrome trace (*.json);;All files (*)")[0]
+        if filename:
+            self.export_trace(filename)
+
+    def export_trace(self, filename):
+        '''
+        Запись трассы в файл (формат Chrome trace event, открывается в Perfetto)
+        '''
+        try:
+            TRACER.export(filename)
+        except OSError as error:
+            self._view.show_message(f"Cannot save trace: {error}")
+            return
+        self._view.show_message(f"Trace saved: {filename}")
+
+    def show_debug_panel(self):
+        '''
+        Показ панели отладки с суммами трассировки
+        '''
+        self._view.show_debug_panel()
+
     def save_data(self):
         '''
-        Сохранение данных о сеансе
+        Запись в базу изменившихся данных о сеансе: правок несохраненных файлов,
+        положений слайдера и курсора и настроек окна (по таймеру и при выходе).
+        Первая ошибка записи базы показывается в строке состояния
         '''
-        data_opened = {}
-        for state in self._model.get_states():
-            data_opened.setdefault(state.get_filename(), [state.get_slider_pos(), state.get_cursor_pos()])
+        self._journal.flush()
 
-        with open(PATH_TO_SAVE_OPENED_FILES, 'w') as file:
-            file.write(json.dumps(data_opened, indent=4))
+        positions = []
+        for state in self._model.get_states():
+            position = state.get_slider_pos(), state.get_cursor_pos()
+            if self._stored_positions.get(state.get_doc_id()) != position:
+                self._stored_positions[state.get_doc_id()] = position
+                positions.append((*position, state.get_key()))
+        if positions:
+            self._store.update_positions(positions)
 
-        data_app = {}
         window_pos, window_size = self._view.get_window_settings()
-        data_app.setdefault("pos", window_pos)
-        data_app.setdefault("size", window_size)
-        data_app.setdefault("index", self._view.get_tab_index())
+        settings = {"pos": list(window_pos), "size": list(window_size), "index": self._view.get_tab_index()}
+        for name, value in settings.items():
+            if self._stored_settings.get(name) != value:
+                self._stored_settings[name] = value
+                self._store.put_setting(name, value)
 
-        with open(PATH_TO_SAVE_APP_DATA, 'w') as file:
-            file.write(json.dumps(data_app, indent=4))
+        error = self._store.take_error()
+        if error is not None:
+            self._view.show_message(f"Cannot save session: {error}")
 
     def toggle_find(self):
         '''
@@ -221,23 +692,60 @@ class TextEditorController:
         '''
         if self._model.get_number_of_states():
             self._view.toggle_find()
+            if self._view.get_is_find_hidden():
+                self._search_timer.stop()
+                self.clear_search()
+
+    def hide_find(self):
+        '''
+        Скрытие окна поиска
+        '''
+        self._search_timer.stop()
+        self.clear_search()
+        self._view.hide_find()
 
     def show_about(self):
         '''
         Открытие README проекта
         '''
+        # Модуль нужен редко, а импортируется долго: не при запуске
+        import webbrowser
+
         webbrowser.open(DOCUMENTATION_LINK)
 
-    def update_text(self, text):
+    def update_text(self, position, removed, inserted):
         '''
-        Обновление состояния после изменения текста
+        Обновление состояния после изменения текста: с позиции position удалено removed символов
+        и вставлена строка inserted
         '''
         if not self._model.get_number_of_states():
             return
-        if self._model.get_text() != text and not self._model.get_is_modified():
+        if not removed and not inserted:
+            return
+        self._model.apply_edit(position, removed, inserted)
+        self._journal.record(self._model.get_current_state(), position, removed, inserted)
+        self.mark_modified()
+        # Индекс троек обновляется (или, если файл дорос до порога, начинает строиться) в паузе ввода
+        self._index_timer.start(TRIGRAM_INDEX_IDLE_MS)
+        if self._search_key is not None:
+            # Вхождения устарели: поиск заново после паузы во вводе (после замены - когда она закончится)
+            self.clear_search()
+            if self._replace_job is None:
+                self._search_timer.start()
+
+    def mark_modified(self):
+        '''
+        Пометка активного файла как измененного
+        '''
+        if not self._model.get_is_modified():
             self._model.set_is_modified(True)
             self._view.add_tab_star()
-        self._model.set_text(text)
+
+    def update_index_progress(self, progress):
+        '''
+        Отображение хода построения индекса строк большого файла
+        '''
+        self._view.show_message(f"Indexing lines: {progress:.0%}" if progress < 1 else "")
 
     def update_slider_pos(self, slider_pos):
         '''
@@ -248,37 +756,498 @@ class TextEditorController:
 
         self._model.set_slider_pos(slider_pos)
 
-    def update_cursor_pos(self, position, row, column):
+    def update_cursor_pos(self, position, row=None, column=None):
         '''
-        Обновление состояния после изменения положения курсора в тексте
+        Обновление состояния после изменения положения курсора в тексте. Если строка и номер символа
+        не переданы, они берутся из индекса строк файла
         '''
+        if not self._model.get_number_of_states():
+            self._view.set_label_cursor_pos(0, 0)
+            return
+
+        if row is None:
+            row, column = self._model.get_line_column(position)
         self._view.set_label_cursor_pos(row, column)
+        self._model.set_cursor_pos(position)
 
+    def go_to_line(self):
+        '''
+        Переход к строке с данным номером (номера - как в статус баре): "строка" или "строка:символ"
+        '''
         if not self._model.get_number_of_states():
             return
 
-        self._model.set_cursor_pos(position)
+        answer, is_accepted = QInputDialog.getText(None, 'Go to line',
+                                                   f"Line (0 - {self._model.get_line_count() - 1}) or line:column")
+        if not is_accepted or not answer.strip():
+            return
+        try:
+            numbers = [int(number) for number in answer.split(':', 1)]
+        except ValueError:
+            self._view.show_message(f"Invalid line number: {answer}")
+            return
+
+        row, column = numbers if len(numbers) == 2 else (numbers[0], 0)
+        self._view.scroll_to_index(self._model.get_position(max(row, 0), max(column, 0)), 0)
 
-    def find(self, string):
+    def find(self, string, is_backward=False):
         '''
-        Поиск слова в тексте, начиная с текущего положения курсора
+        Переход к следующему (предыдущему) вхождению относительно курсора.
+        Пока идет фоновый поиск, переход откладывается до его завершения
         '''
-        pos = self._view.get_text_cursor_position()
-        text = self._model.get_text()
-        index = text[pos:].find(string)
-        if index == -1:
-            index = text.find(string)
-            if index == -1:
-                return
+        if self.search(string):
+            self.run_with_matches(lambda: self.go_to_match(is_backward))
+
+    def run_with_matches(self, action):
+        '''
+        Выполнение действия над найденными вхождениями сразу или после завершения фонового поиска
+        '''
+        if self._matches is None:
+            self._pending_action = action
         else:
-            index += pos
+            action()
+
+    def search(self, string, options=None):
+        '''
+        Поиск всех вхождений в активном файле с данными параметрами (по умолчанию - из фрейма поиска). Результат
+        переиспользуется, пока не изменились запрос и текст; прежний фоновый поиск отменяется.
+        Возвращает False, если искать нечего
+        '''
+        if not string or not self._model.get_number_of_states():
+            self.clear_search()
+            return False
+
+        is_mapped = self._model.get_is_mapped()
+        options = self._view.get_find_options() if options is None else tuple(options)
+        try:
+            pattern = compile_pattern(string, *options, is_bytes=is_mapped)
+        except re.error as error:
+            self.clear_search()
+            self._view.show_message(f"Invalid pattern: {error.msg}")
+            return False
+
+        key = self._model.get_doc_id(), self._model.get_version(), pattern
+        if key == self._search_key:
+            return True
+
+        # Уточненный запрос (дописанный в конец) проверяется только по прежним вхождениям
+        previous = self._matches
+        if previous is not None and (self._search_key[:2] != key[:2] or previous.count() > SEARCH_REFINE_LIMIT
+                                     or not is_refinement(string, options, *self._search_query)):
+            previous = None
+
+        self.clear_search()
+        self._search_key = key
+        self._search_query = string, options
+        self._search_id += 1
+
+        # Большие файлы ищутся прямо в отображенном в память файле (позиции - смещения в байтах)
+        text = self._model.get_mapped_buffer().get_mapping() if is_mapped else self._model.get_snapshot()
+        if len(text) < FIND_ASYNC_THRESHOLD:
+            text = text if is_mapped else text.get_text()
+            self.set_matches(find_all(text, pattern) if previous is None else refine_matches(text, pattern, previous))
+            return True
+
+        # Без прежних вхождений поиск сужается индексом троек (если он построен и подходит для запроса)
+        index = query_bits = None
+        if previous is None and self._model.get_trigram_index() is not None:
+            index = self._model.get_trigram_index().get_snapshot()
+            query_bits = get_query_bits(string, *options, is_bytes=is_mapped)
+            if query_bits is None:
+                index = None
+        finder = Finder(self._search_id, text, pattern, previous, index, query_bits)
+        finder.signals.finished.connect(self.on_search_finished)
+        self._finder = finder
+        self._view.show_searching()
+        self._thread_pool.start(finder)
+        return True
+
+    def on_search_finished(self, search_id, matches):
+        '''
+        Завершение фонового поиска (результаты отмененного или устаревшего поиска не нужны)
+        '''
+        if search_id != self._search_id:
+            return
+
+        self._finder = None
+        self.set_matches(matches)
+        if self._pending_action is not None:
+            action, self._pending_action = self._pending_action, None
+            action()
+
+    def search_as_you_type(self):
+        '''
+        Поиск по мере ввода (после паузы во вводе запроса или правки текста)
+        '''
+        self.search(self._view.get_find_input())
+
+    def schedule_search(self):
+        '''
+        Отложенный поиск: таймер перезапускается при каждом вводе
+        '''
+        self._search_timer.start()
+
+    def set_matches(self, matches):
+        self._matches = matches
+        self._view.show_match_count(-1, matches.count())
+        self._highlight_range = None
+        self.update_match_highlights()
+
+    def update_match_highlights(self):
+        '''
+        Подсветка вхождений в видимой части текста (при прокрутке, смене размера и новых вхождениях),
+        если она еще не подсвечена. Дальше подсветка расширяется в фоне (extend_match_highlights)
+        '''
+        if self._matches is None or not self._matches.count():
+            return
+
+        first, last = self._matches.get_range(*self._view.get_visible_range())
+        if self._highlight_range is not None and self._highlight_range[0] <= first and last <= self._highlight_range[1]:
+            return
+
+        self._highlight_range = first, last
+        self.show_match_highlights()
+        self._highlight_timer.start()
+
+    def extend_match_highlights(self):
+        '''
+        Расширение подсветки на SEARCH_HIGHLIGHT_STEP вхождений в обе стороны
+        '''
+        if self._matches is None or self._highlight_range is None:
+            return
 
-        self._view.scroll_to_index(index, len(string))
+        first, last = self._highlight_range
+        count = self._matches.count()
+        if last - first >= SEARCH_HIGHLIGHT_LIMIT or (first == 0 and last == count):
+            return
+
+        self._highlight_range = max(first - SEARCH_HIGHLIGHT_STEP, 0), min(last + SEARCH_HIGHLIGHT_STEP, count)
+        self.show_match_highlights()
+        self._highlight_timer.start()
+
+    def show_match_highlights(self):
+        first, last = self._highlight_range
+        self._view.set_match_highlights([self._matches.get_span(index) for index in range(first, last)])
+
+    def go_to_match(self, is_backward):
+        '''
+        Выделение ближайшего вхождения после курсора (до начала выделения при поиске назад)
+        '''
+        matches = self._matches
+        if not matches.count():
+            return
+
+        if is_backward:
+            index = matches.previous_index(self._view.get_text_selection_start())
+        else:
+            index = matches.next_index(self._view.get_text_cursor_position())
+        start, end = matches.get_span(index)
+        self._view.scroll_to_index(start, end - start)
+        self._view.show_match_count(index, matches.count())
+
+    def clear_search(self):
+        '''
+        Сброс результатов поиска и отмена фонового поиска
+        '''
+        if self._finder is not None:
+            self._finder.cancel()
+            self._finder = None
+        self._highlight_timer.stop()
+        self._search_key = None
+        self._search_query = None
+        self._matches = None
+        self._pending_action = None
+        self._highlight_range = None
+        self._view.clear_match_count()
+        self._view.clear_match_highlights()
+
+    def find_in_files(self, string, directory):
+        '''
+        Поиск во всех открытых файлах и, если задан каталог, в файлах каталога.
+        Результаты появляются на панели по мере готовности
+        '''
+        self.stop_files_search()
+        if not string:
+            return
+
+        query = (string, *self._view.get_find_options())
+        try:
+            compile_pattern(*query)
+        except re.error as error:
+            self._view.show_message(f"Invalid pattern: {error.msg}")
+            return
+        if directory and not os.path.isdir(directory):
+            self._view.show_message(f"No such directory: {directory}")
+            return
+
+        # Загруженные файлы ищутся в текущем тексте, еще не загруженные - на диске.
+        # Большие файлы открыты только для просмотра и не ищутся
+        documents, files, excluded = [], [], set()
+        for state in self._model.get_states():
+            if state.get_filename() and state.get_is_filename_actual():
+                excluded.add(os.path.realpath(state.get_filename()))
+            if state.get_is_mapped():
+                continue
+            if state.get_is_placeholder() or state.get_is_loading():
+                files.append((state.get_doc_id(), state.get_filename()))
+            else:
+                index = state.get_trigram_index()
+                documents.append((state.get_doc_id(), state.get_filename(), state.get_snapshot(),
+                                  index.get_snapshot() if index is not None else None))
+
+        self._files_search_id += 1
+        self._files_query = query
+        process_pool = self.get_process_pool() if files or directory else None
+        search = FilesSearch(self._files_search_id, query, documents, files, directory, excluded, process_pool)
+        search.signals.found.connect(self.on_files_found)
+        search.signals.finished.connect(self.on_files_search_finished)
+        self._files_search = search
+        self._view.show_find_results()
+        self._thread_pool.start(search)
+
+    def get_process_pool(self):
+        '''
+        Пул процессов для поиска в файлах на диске и построения индексов (создается при первом обращении).
+        Процессы запускаются заново (spawn), а не копируют процесс с потоками Qt
+        '''
+        if self._process_pool is None:
+            # multiprocessing и concurrent.futures импортируются только здесь: они заметно замедляют запуск
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._process_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        return self._process_pool
+
+    def shutdown_process_pool(self):
+        '''
+        Остановка пула процессов (при выходе и в замерах): задания, которые еще не начались,
+        отменяются, а запущенные дожидаются завершения, иначе процессы пула, их семафоры
+        и процесс учета ресурсов multiprocessing переживали бы редактор
+        '''
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True, cancel_futures=True)
+            self._process_pool = None
+
+    def on_files_found(self, search_id, doc_id, path, hits):
+        '''
+        Вхождения в очередном файле
+        '''
+        if search_id != self._files_search_id:
+            return
+
+        self._view.add_find_results(doc_id, path, hits)
+        self._view.set_find_results_summary(f"Searching... {self._view.get_find_result_count()} matches")
+
+    def on_files_search_finished(self, search_id, searched):
+        if search_id != self._files_search_id:
+            return
+
+        self._files_search = None
+        self._view.set_find_results_summary(f"{self._view.get_find_result_count()} matches in "
+                                            f"{len(self._view.get_find_result_files())} of {searched} files")
+
+    def stop_files_search(self):
+        if self._files_search is not None:
+            self._files_search.cancel()
+            self._files_search = None
+
+    def hide_find_results(self):
+        '''
+        Скрытие панели результатов поиска в файлах
+        '''
+        self.stop_files_search()
+        self._view.hide_find_results()
+
+    def show_document(self, doc_id, path):
+        '''
+        Переход к открытому файлу (doc_id) или открытие файла по пути. Возвращает False,
+        если файл открыть не удалось
+        '''
+        state = self._model.get_state(doc_id)
+        if state is not None:
+            self.change_state(self._model.get_state_index(state))
+            return True
+
+        index = self._model.find(path)
+        if index != -1:
+            self.change_state(index)
+            return True
+
+        self.open_path(path)
+        return self._model.find(path) != -1
+
+    def open_find_result(self, row):
+        '''
+        Переход к вхождению из результатов поиска в файлах (после загрузки файла, если он загружается)
+        '''
+        doc_id, path, start, end = self._view.get_find_result(row)
+        if not self.show_document(doc_id, path):
+            self._view.show_message(f"Cannot open file: {path}")
+            return
+
+        if self._model.get_is_loading():
+            self._pending_jump = self._model.get_doc_id(), start, end
+        else:
+            self._view.scroll_to_index(start, end - start)
+
+    def replace_in_files(self, new, is_confirmation_needed=True):
+        '''
+        Замена во всех файлах из результатов поиска в файлах. Файлы открываются
+        (если нужно) и обрабатываются по очереди, как Replace All: изменения
+        проходят через модель, и в каждом файле отменяются своим Ctrl+Z
+        '''
+        if self._files_search is not None:
+            self._view.show_message("Find in files is still running")
+            return
+        if self._replace_job is not None:
+            return
+
+        files = self._view.get_find_result_files()
+        if not files or self._files_query is None:
+            self._view.show_message("No matches")
+            return
+
+        if is_confirmation_needed:
+            answer = QMessageBox.question(None, 'Replace in files', f"Replace {self._view.get_find_result_count()} "
+                                          f"matches in {len(files)} files?", QMessageBox.Yes | QMessageBox.No)
+            if answer != QMessageBox.Yes:
+                return
+
+        self._files_replace_queue = [(doc_id, path) for doc_id, path, _ in files]
+        self._files_replace_text = new
+        self.hide_find_results()
+        self.replace_next_file()
+
+    def replace_next_file(self):
+        '''
+        Замена в следующем файле из очереди (файл, который еще загружается, ждет конца загрузки)
+        '''
+        queue = self._files_replace_queue
+        if queue is None:
+            return
+
+        while queue:
+            doc_id, path = queue.pop(0)
+            if not self.show_document(doc_id, path) or self._model.get_is_mapped():
+                continue
+            if self._model.get_is_loading():
+                queue.insert(0, (self._model.get_doc_id(), path))
+                self._files_replace_waiting = self._model.get_doc_id()
+                return
+
+            string, *options = self._files_query
+            if self.search(string, options):
+                self.run_with_matches(lambda: self.start_replace(self._files_replace_text, False))
+                return
+
+        self._files_replace_queue = None
+        self._view.show_message("Replace in files finished")
+
+    def continue_files_replace(self):
+        '''
+        Переход к следующему файлу после замены в текущем (если идет замена в файлах)
+        '''
+        if self._files_replace_queue is not None:
+            QTimer.singleShot(0, self.replace_next_file)
 
     def replace(self, old, new):
         '''
-        Замена всех вхождений слова old на new
+        Замена всех вхождений old на new (с параметрами из фрейма поиска) после подтверждения
         '''
+        if self._model.get_is_mapped():
+            self._view.show_message("Large files are opened read-only")
+            return
+        if self._model.get_is_loading():
+            self._view.show_message("The file is still loading")
+            return
+        if self._replace_job is not None:
+            return
+
+        if self.search(old):
+            self.run_with_matches(lambda: self.start_replace(new))
+
+    def start_replace(self, new, is_confirmation_needed=True):
+        '''
+        Подтверждение замены с числом вхождений и ее запуск. Замена идет порциями одним блоком
+        правок текстового поля, поэтому отменяется одним Ctrl+Z. В режиме регулярных выражений
+        new - шаблон замены с группами (\1, \g<name>)
+        '''
+        matches = self._matches
+        count = matches.count()
+        if not count:
+            self._view.show_message("No matches")
+            self.continue_files_replace()
+            return
+
+        if is_confirmation_needed:
+            answer = QMessageBox.question(None, 'Replace all', f"Replace {count} matches?",
+                                          QMessageBox.Yes | QMessageBox.No)
+            if answer != QMessageBox.Yes:
+                return
+
+        pattern = self._search_key[2]
+        is_regex = self._search_query[1][0]
         text = self._model.get_text()
-        text = text.replace(old, new)
-        self._view.set_text(text)
+        if is_regex:
+            try:
+                pattern.match(text, matches.get_span(0)[0]).expand(new)
+            except (re.error, IndexError) as error:
+                self._files_replace_queue = None
+                self._view.show_message(f"Invalid replacement: {error}")
+                return
+
+        self._replace_job = self._model.get_doc_id(), text, pattern, is_regex, new, matches
+        self._replace_index = count
+        self._view.set_replacing(True)
+        self.replace_next()
+
+    def replace_next(self):
+        '''
+        Замена следующей порции вхождений (с конца, чтобы позиции еще не замененных не сдвигались)
+        '''
+        _, text, pattern, is_regex, new, matches = self._replace_job
+        end = self._replace_index
+        start = max(end - REPLACE_CHUNK_SIZE, 0)
+
+        edits = []
+        for index in range(end - 1, start - 1, -1):
+            span_start, span_end = matches.get_span(index)
+            replacement = pattern.match(text, span_start).expand(new) if is_regex else new
+            edits.append((span_start, span_end, replacement))
+        self._view.replace_spans(edits, end == matches.count())
+
+        # Текстовое поле не сообщает о правках замены: модель получает порцию одной правкой.
+        # Текст между вхождениями порции еще не менялся (замена идет с конца) и берется из исходного
+        chunk_start, chunk_end = edits[-1][0], edits[0][1]
+        pieces = []
+        position = chunk_start
+        for span_start, span_end, replacement in reversed(edits):
+            pieces.append(text[position:span_start])
+            pieces.append(replacement)
+            position = span_end
+        self.update_text(chunk_start, chunk_end - chunk_start, "".join(pieces))
+
+        self._replace_index = start
+        if start:
+            self._replace_timer.start()
+            return
+
+        self._replace_job = None
+        self._view.set_replacing(False)
+        self._view.show_message(f"Replaced {matches.count()} matches")
+        self._search_timer.start()
+        self.continue_files_replace()
+
+    def stop_replace(self):
+        '''
+        Остановка замены (при смене файла): уже замененное остается и отменяется одним Ctrl+Z
+        '''
+        if self._replace_job is None:
+            return
+
+        self._replace_timer.stop()
+        count = self._replace_job[-1].count()
+        self._replace_job = None
+        self._files_replace_queue = None
+        self._view.set_replacing(False)
+        self._view.show_message(f"Replace stopped: {count - self._replace_index} of {count} matches replaced")
@@ -0,0 +1,73 @@
+from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QAbstractItemView, QHeaderView, QLabel, QTableWidget, QTableWidgetItem, QVBoxLayout, \
+    QWidget
+
+from .constants import DEBUG_PANEL_REFRESH_MS
+from .tracing import TRACER
+
+COLUMNS = ("Name", "Calls", "Total ms", "Mean ms", "Max ms")
+
+
+class DebugPanel(QWidget):
+    '''
+    Окно с суммами трассировки по именам (число вызовов, общее, среднее и наибольшее время)
+    и счетчиками. Пока окно открыто, суммы обновляются раз в DEBUG_PANEL_REFRESH_MS
+    '''
+    def __init__(self, parent):
+        super().__init__(parent, Qt.Tool)
+
+        self.setWindowTitle("Debug panel")
+        self.setStyleSheet("background-color: #222; color: white;")
+        self.resize(560, 400)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableWidget(0, len(COLUMNS), self)
+        self.table.setFont(QFont("Monospace", 9))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(DEBUG_PANEL_REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+
+    def refresh(self):
+        '''
+        Обновление сумм: самые долгие по общему времени - сверху, затем счетчики
+        '''
+        totals, counters = TRACER.get_totals()
+        self.summary_label.setText(f"Tracing is {'on' if TRACER.get_enabled() else 'off'}"
+                                   f" (Help > Start tracing / Stop tracing)")
+
+        rows = []
+        for (category, name), (calls, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            rows.append((f"{category}: {name}", str(calls), f"{total * 1000:.1f}",
+                         f"{total * 1000 / calls:.2f}", f"{longest * 1000:.2f}"))
+        for name, value in sorted(counters.items()):
+            rows.append((f"counter: {name}", str(value), "", "", ""))
+
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+
+
+class DocumentPool:
+    '''
+    LRU-кэш живых документов (QTextDocument вместе с подсветкой) для открытых вкладок.
+    Документ хранит раскладку, подсветку и историю правок, поэтому смена вкладки
+    не требует повторной загрузки текста. Сверх лимита самые давние документы
+    выгружаются: их текст остаётся только в модели.
+    Документы с историей правок сначала пропускаются, иначе их правки нельзя было бы
+    отменить, но и их сверх лимита держится не больше edited_over_limit
+    '''
+    def __init__(self, capacity, edited_over_limit=0):
+        self.capacity = capacity
+        self.edited_over_limit = edited_over_limit
+        self.documents = OrderedDict()
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    def __len__(self):
+        return len(self.documents)
+
+    def get(self, doc_id):
+        '''
+        Получение документа с отметкой об использовании
+        '''
+        entry = self.documents.get(doc_id)
+        if entry is None:
+            return None
+
+        self.documents.move_to_end(doc_id)
+        return entry[0]
+
+    def get_highlighter(self, doc_id):
+        '''
+        Получение подсветки документа (None, если документа нет или он без подсветки)
+        '''
+        entry = self.documents.get(doc_id)
+        return None if entry is None else entry[1]
+
+    def add(self, doc_id, document, highlighter):
+        '''
+        Добавление документа с выгрузкой лишних
+        '''
+        self.documents[doc_id] = (document, highlighter)
+        self.documents.move_to_end(doc_id)
+        self.evict(keep=doc_id)
+
+    def set_highlighter(self, doc_id, highlighter):
+        '''
+        Замена подсветки документа
+        '''
+        document, old_highlighter = self.documents[doc_id]
+        if old_highlighter is not None:
+            old_highlighter.detach()
+        self.documents[doc_id] = (document, highlighter)
+
+    def remove(self, doc_id):
+        '''
+        Удаление документа
+        '''
+        entry = self.documents.pop(doc_id, None)
+        if entry is not None:
+            self.release(*entry)
+
+    def evict(self, keep=None):
+        '''
+        Выгрузка давно не использовавшихся документов сверх лимита: сначала без истории правок,
+        затем любых, если и документов с историей сверх лимита слишком много
+        '''
+        self.evict_over(self.capacity, keep, is_edited_kept=True)
+        self.evict_over(self.capacity + self.edited_over_limit, keep, is_edited_kept=False)
+
+    def evict_over(self, limit, keep, is_edited_kept):
+        for doc_id, (document, _) in list(self.documents.items()):
+            if len(self.documents) <= limit:
+                break
+            if doc_id == keep:
+                continue
+            if is_edited_kept and (document.isUndoAvailable() or document.isRedoAvailable()):
+                continue
+            self.release(*self.documents.pop(doc_id))
+
+    @staticmethod
+    def release(document, highlighter):
+        if highlighter is not None:
+            highlighter.detach()
+        document.deleteLater()
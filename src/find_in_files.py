@@ -0,0 +1,183 @@
+import os
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from .buffer import Rope
+from .constants import FIND_IN_FILES_BATCH, FIND_IN_FILES_PREVIEW, LARGE_FILE_THRESHOLD
+from .finder import compile_pattern, find_all
+from .trigram_index import get_query_bits
+
+# Сколько первых байт файла проверяется на нулевые (двоичные файлы пропускаются)
+BINARY_CHECK_SIZE = 8192
+
+
+def find_hits(text, pattern, regions=None):
+    '''
+    Вхождения шаблона в тексте (только начинающиеся в отрезках regions, если они даны):
+    (начало, конец, номер строки, номер символа в строке, строка)
+    '''
+    matches = find_all(text, pattern, regions=regions)
+    hits = []
+    line = 0
+    line_start = 0
+    previous = 0
+    for index in range(matches.count()):
+        start, end = matches.get_span(index)
+        newline = text.rfind('\n', previous, start)
+        if newline != -1:
+            line += text.count('\n', previous, start)
+            line_start = newline + 1
+        previous = start
+
+        line_end = text.find('\n', start)
+        if line_end == -1:
+            line_end = len(text)
+        preview_start = max(line_start, start - FIND_IN_FILES_PREVIEW // 2)
+        hits.append((start, end, line, start - line_start,
+                     text[preview_start:min(line_end, preview_start + FIND_IN_FILES_PREVIEW)].strip()))
+
+    return hits
+
+
+def search_files(paths, query):
+    '''
+    Поиск в файлах на диске (выполняется в процессе пула). Файлы читаются так же,
+    как при открытии, поэтому позиции вхождений совпадают с позициями в редакторе.
+    Двоичные, большие и нечитаемые файлы пропускаются. Возвращает [(путь, вхождения)]
+    '''
+    pattern = compile_pattern(*query)
+    results = []
+    for path in paths:
+        try:
+            if os.path.getsize(path) >= LARGE_FILE_THRESHOLD:
+                continue
+            with open(path, 'rb') as file:
+                if b'\0' in file.read(BINARY_CHECK_SIZE):
+                    continue
+            with open(path, 'r') as file:
+                text = file.read()
+        except (OSError, UnicodeDecodeError):
+            continue
+
+        hits = find_hits(text, pattern)
+        if hits:
+            results.append((path, hits))
+
+    return results
+
+
+class FilesSearchSignals(QObject):
+    '''
+    Сигналы поиска в файлах (у QRunnable собственных сигналов нет)
+    '''
+    # номер поиска, doc_id открытого файла (-1 для файла на диске), путь, вхождения
+    found = pyqtSignal(int, int, str, object)
+    # номер поиска, число просмотренных файлов
+    finished = pyqtSignal(int, int)
+
+
+class FilesSearch(QRunnable):
+    '''
+    Поиск во всех открытых файлах и, если задан, в каталоге (в пуле потоков).
+    Открытые файлы ищутся в их текущем тексте, файлы на диске - пачками в пуле процессов,
+    результаты передаются по мере готовности. Поиск можно отменить между пачками
+    '''
+    def __init__(self, search_id, query, documents, files, directory, excluded, process_pool):
+        super().__init__()
+
+        self.search_id = search_id
+        # Аргументы compile_pattern: строка, регулярное выражение, учет регистра, целые слова
+        self.query = query
+        # Открытые файлы в памяти: (doc_id, имя, снимок текста, снимок индекса троек или None)
+        self.documents = documents
+        # Открытые, но еще не загруженные файлы: (doc_id, путь)
+        self.files = files
+        self.directory = directory
+        # Пути открытых файлов, которые в каталоге пропускаются
+        self.excluded = excluded
+        self.process_pool = process_pool
+        self.cancelled = False
+        self.signals = FilesSearchSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        '''
+        Поиск (выполняется в потоке пула)
+        '''
+        pattern = compile_pattern(*self.query)
+        query_bits = get_query_bits(*self.query)
+        searched = 0
+        for doc_id, filename, snapshot, index in self.documents:
+            if self.cancelled:
+                return
+            text = snapshot.get_text() if isinstance(snapshot, Rope) else snapshot
+            regions = index.get_regions(query_bits) if index is not None and query_bits is not None else None
+            hits = find_hits(text, pattern, regions)
+            searched += 1
+            if hits:
+                self.signals.found.emit(self.search_id, doc_id, filename, hits)
+
+        doc_ids = {path: doc_id for doc_id, path in self.files}
+        pending = set()
+        for batch in self.batches(list(doc_ids)):
+            if self.cancelled:
+                break
+            pending.add(self.process_pool.submit(search_files, batch, self.query))
+            searched += len(batch)
+            # Пока каталог обходится, готовые результаты уже передаются
+            if len(pending) > os.cpu_count() * 2:
+                pending = self.collect(pending, doc_ids)
+
+        while pending and not self.cancelled:
+            pending = self.collect(pending, doc_ids)
+
+        if self.cancelled:
+            for future in pending:
+                future.cancel()
+            return
+        self.signals.finished.emit(self.search_id, searched)
+
+    def collect(self, pending, doc_ids):
+        '''
+        Передача результатов первых завершившихся пачек. Возвращает незавершенные
+        '''
+        # Импорт здесь, а не при запуске приложения: к этому времени пул процессов его уже загрузил
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.cancelled() or future.exception() is not None:
+                continue
+            for path, hits in future.result():
+                if self.cancelled:
+                    return pending
+                self.signals.found.emit(self.search_id, doc_ids.get(path, -1), path, hits)
+        return pending
+
+    def batches(self, paths):
+        '''
+        Пачки по FIND_IN_FILES_BATCH путей: сначала открытые незагруженные файлы, затем файлы каталога
+        '''
+        for start in range(0, len(paths), FIND_IN_FILES_BATCH):
+            yield paths[start:start + FIND_IN_FILES_BATCH]
+        if not self.directory:
+            return
+
+        batch = []
+        for root, directories, names in os.walk(self.directory):
+            if self.cancelled:
+                return
+            # Скрытые каталоги (.git и т.п.) пропускаются
+            directories[:] = [name for name in directories if not name.startswith('.')]
+            for name in names:
+                path = os.path.join(root, name)
+                if os.path.realpath(path) in self.excluded or not os.path.isfile(path):
+                    continue
+                batch.append(path)
+                if len(batch) == FIND_IN_FILES_BATCH:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
@@ -0,0 +1,112 @@
+import os
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QFrame, QGridLayout, QLabel, QListView, QPushButton
+
+
+class FindResultsModel(QAbstractListModel):
+    '''
+    Результаты поиска в файлах для QListView: строки создаются только для видимых
+    элементов, поэтому число вхождений на скорость интерфейса не влияет
+    '''
+    def __init__(self):
+        super().__init__()
+
+        # Файлы с вхождениями: (doc_id или -1, путь, число вхождений)
+        self.files = []
+        # Вхождения: (номер файла, начало, конец, номер строки, номер символа, строка)
+        self.hits = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.hits)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        file_index, _, _, line, column, preview = self.hits[index.row()]
+        _, path, _ = self.files[file_index]
+        if role == Qt.DisplayRole:
+            return f"{os.path.basename(path)}:{line + 1}:{column + 1}  {preview}"
+        if role == Qt.ToolTipRole:
+            return path
+        return None
+
+    def add_hits(self, doc_id, path, hits):
+        '''
+        Добавление вхождений одного файла в конец списка
+        '''
+        file_index = len(self.files)
+        self.files.append((doc_id, path, len(hits)))
+
+        first = len(self.hits)
+        self.beginInsertRows(QModelIndex(), first, first + len(hits) - 1)
+        self.hits.extend((file_index, *hit) for hit in hits)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.files = []
+        self.hits = []
+        self.endResetModel()
+
+    def get_hit(self, row):
+        '''
+        Вхождение: (doc_id или -1, путь, начало, конец)
+        '''
+        file_index, start, end, _, _, _ = self.hits[row]
+        doc_id, path, _ = self.files[file_index]
+        return doc_id, path, start, end
+
+    def get_files(self):
+        return self.files
+
+    def get_hit_count(self):
+        return len(self.hits)
+
+
+class FindResultsPanel(QFrame):
+    '''
+    Панель результатов поиска в файлах (щелчок по вхождению открывает его)
+    '''
+    def __init__(self, parent, controller):
+        super().__init__(parent)
+
+        self.controller = controller
+        self.model = FindResultsModel()
+
+        self.setStyleSheet("background-color: #222; color: white; border-top: 1px solid #555;")
+        self.setFixedHeight(180)
+
+        self.initUI()
+
+    def initUI(self):
+        '''
+        Инициализация элементов управления
+        '''
+        layout = QGridLayout()
+        self.setLayout(layout)
+        layout.setContentsMargins(5, 2, 5, 2)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label, 0, 0)
+
+        self.close_button = QPushButton("X", self)
+        self.close_button.setFixedSize(20, 20)
+        self.close_button.clicked.connect(self.controller.hide_find_results)
+        layout.addWidget(self.close_button, 0, 1)
+
+        self.list_view = QListView(self)
+        self.list_view.setFont(QFont("Monospace", 10))
+        # Все строки одной высоты: список не измеряет каждую
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setModel(self.model)
+        self.list_view.activated.connect(lambda index: self.controller.open_find_result(index.row()))
+        self.list_view.clicked.connect(lambda index: self.controller.open_find_result(index.row()))
+        layout.addWidget(self.list_view, 1, 0, 1, 2)
+
+        self.hide()
+
+    def set_summary(self, text):
+        self.summary_label.setText(text)
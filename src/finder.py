@@ -0,0 +1,207 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from .buffer import Rope
+from .constants import FIND_BLOCK_SIZE, FIND_BLOCK_OVERLAP, FIND_PATTERN_CACHE_SIZE
+from .mapped_buffer import ENCODING
+
+# Сколько прежних вхождений проверяется между проверками отмены
+FIND_REFINE_BATCH = 1024
+
+
+@lru_cache(maxsize=FIND_PATTERN_CACHE_SIZE)
+def compile_pattern(string, is_regex=False, is_case_sensitive=True, is_whole_word=False, is_bytes=False):
+    '''
+    Скомпилированный шаблон поиска (результат запоминается). Для больших файлов
+    шаблон байтовый: поиск идет прямо по отображенному в память файлу.
+    При ошибке в регулярном выражении - re.error
+    '''
+    pattern = string if is_regex else re.escape(string)
+    if is_whole_word:
+        pattern = rf"(?<!\w)(?:{pattern})(?!\w)"
+
+    flags = re.MULTILINE if is_case_sensitive else re.MULTILINE | re.IGNORECASE
+    return re.compile(pattern.encode(ENCODING) if is_bytes else pattern, flags)
+
+
+class Matches:
+    '''
+    Все вхождения шаблона в тексте: начала и концы в двух массивах (по возрастанию)
+    '''
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def add(self, start, end):
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def count(self):
+        return len(self.starts)
+
+    def get_span(self, index):
+        return self.starts[index], self.ends[index]
+
+    def next_index(self, position):
+        '''
+        Номер первого вхождения, начинающегося не раньше position (по кругу)
+        '''
+        index = bisect_left(self.starts, position)
+        return index if index < len(self.starts) else 0
+
+    def previous_index(self, position):
+        '''
+        Номер последнего вхождения, начинающегося раньше position (по кругу)
+        '''
+        return (bisect_left(self.starts, position) - 1) % len(self.starts)
+
+    def get_range(self, start, end):
+        '''
+        Номера вхождений, пересекающих отрезок [start, end): (первый, последний + 1)
+        '''
+        return bisect_right(self.ends, start), bisect_left(self.starts, end)
+
+    def index_of(self, start, end):
+        '''
+        Номер вхождения с данными границами или -1
+        '''
+        index = bisect_left(self.starts, start)
+        if index < len(self.starts) and self.starts[index] == start and self.ends[index] == end:
+            return index
+        return -1
+
+
+def find_all(text, pattern, is_cancelled=lambda: False, regions=None):
+    '''
+    Поиск всех непустых вхождений шаблона в строке или отображенном файле без копирования текста.
+    Текст просматривается блоками по FIND_BLOCK_SIZE, между ними проверяется отмена.
+    Если даны отрезки regions (по индексу троек), ищутся только вхождения, начинающиеся в них.
+    Возвращает Matches или None, если поиск отменен
+    '''
+    matches = Matches()
+    add = matches.add
+    length = len(text)
+    position = 0
+    for region_start, region_end in regions if regions is not None else [(0, length)]:
+        position = max(position, region_start)
+        region_end = min(region_end, length)
+        while position < region_end:
+            if is_cancelled():
+                return None
+
+            block_end = min(position + FIND_BLOCK_SIZE, region_end)
+            # Вхождение может заходить за границу блока: ищем с запасом, а обрезанное концом запаса ищем заново
+            search_end = min(block_end + FIND_BLOCK_OVERLAP, length)
+            next_position = block_end
+            for match in pattern.finditer(text, position, search_end):
+                start, end = match.span()
+                if start >= block_end:
+                    break
+
+                is_cut = end == search_end < length
+                if is_cut:
+                    # Без ограничения вхождения в этом месте может и не быть (например, для "$")
+                    full_match = pattern.match(text, start)
+                    end = start if full_match is None else full_match.end()
+                if end > start:
+                    add(start, end)
+                next_position = max(block_end, end, start + 1)
+                if is_cut:
+                    break
+            position = next_position
+
+    return matches
+
+
+def is_refinement(string, options, previous_string, previous_options):
+    '''
+    Можно ли искать запрос string только среди вхождений прежнего запроса: строка дописана
+    в конец, параметры те же, и прежние вхождения - это все вхождения прежней строки
+    (у нее нет начала, совпадающего с концом, поэтому вхождения не перекрываются)
+    '''
+    is_regex, is_case_sensitive, is_whole_word = options
+    if options != previous_options or is_regex or is_whole_word:
+        return False
+    if not previous_string or not string.startswith(previous_string):
+        return False
+
+    folded = previous_string if is_case_sensitive else previous_string.casefold()
+    return not any(folded[:k] == folded[-k:] for k in range(1, len(folded)))
+
+
+def refine_matches(text, pattern, previous, is_cancelled=lambda: False):
+    '''
+    Вхождения уточненного запроса: проверка только мест прежних вхождений.
+    Возвращает Matches или None, если поиск отменен
+    '''
+    matches = Matches()
+    end = 0
+    for index, start in enumerate(previous.starts):
+        if not index % FIND_REFINE_BATCH and is_cancelled():
+            return None
+        if start < end:
+            continue
+
+        match = pattern.match(text, start)
+        if match is not None:
+            matches.add(start, match.end())
+            end = match.end()
+
+    return matches
+
+
+class FinderSignals(QObject):
+    '''
+    Сигналы поиска (у QRunnable собственных сигналов нет)
+    '''
+    # номер поиска, найденные вхождения (Matches)
+    finished = pyqtSignal(int, object)
+
+
+class Finder(QRunnable):
+    '''
+    Поиск всех вхождений в пуле потоков (для больших текстов). Текст - неизменяемый
+    снимок (Rope) или отображенный файл, поэтому правки во время поиска ему не мешают.
+    Поиск отменяется, когда запрос меняется; отмененный поиск ничего не сообщает.
+    Если даны вхождения прежнего запроса (previous), проверяются только они,
+    а если дан снимок индекса троек (index) и биты запроса - только отрезки, отобранные по индексу
+    '''
+    def __init__(self, search_id, text, pattern, previous=None, index=None, query_bits=None):
+        super().__init__()
+
+        self.search_id = search_id
+        self.text = text
+        self.pattern = pattern
+        self.previous = previous
+        self.index = index
+        self.query_bits = query_bits
+        self.cancelled = False
+        self.signals = FinderSignals()
+
+    def cancel(self):
+        '''
+        Отмена поиска (прерывается перед следующим блоком текста)
+        '''
+        self.cancelled = True
+
+    def run(self):
+        '''
+        Поиск (выполняется в потоке пула)
+        '''
+        # Склейка снимка в строку тоже выполняется здесь, а не в потоке интерфейса
+        text = self.text.get_text() if isinstance(self.text, Rope) else self.text
+        try:
+            if self.previous is not None:
+                matches = refine_matches(text, self.pattern, self.previous, lambda: self.cancelled)
+            else:
+                regions = self.index.get_regions(self.query_bits) if self.index is not None else None
+                matches = find_all(text, self.pattern, lambda: self.cancelled, regions)
+        except ValueError:
+            # Большой файл закрыли во время поиска
+            return
+        if matches is not None:
+            self.signals.finished.emit(self.search_id, matches)
@@ -1,8 +1,10 @@
 import abc
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import QFrame, QApplication
 
+from .constants import VIEW_UPDATE_INTERVAL_MS
+
 
 class CommonGrip(QFrame):
     '''
@@ -17,18 +19,33 @@ class CommonGrip(QFrame):
         self.old_pos = None
         self.old_size = None
         self.drag = None
+        # Стороны окна, которые двигает элемент
+        self.edges = Qt.Edges()
+
+        # Если растягивать окно приходится самим, его размер меняется не чаще раза за кадр
+        self.pending_pos = None
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(VIEW_UPDATE_INTERVAL_MS)
+        self.resize_timer.timeout.connect(self.apply_pending_size)
 
         self.setStyleSheet('background-color: #222;')
         self.cursor_style = Qt.ArrowCursor
 
     def mousePressEvent(self, event, mouse_event=None):
         '''
-        Обработка события нажатия кнопки мыши
+        Обработка события нажатия кнопки мыши: окно растягивает оконная система, если умеет
         '''
         if not self.window.isMaximized():
+            if self.window.windowHandle().startSystemResize(self.edges):
+                # Об отпускании кнопки оконная система не сообщает: окно ждет паузы в изменениях размера
+                self.window.begin_resize(is_system=True)
+                return
+
+            self.window.begin_resize()
             self.old_pos = self.window.pos()
             self.old_size = self.window.size()
-            self.drag = self.mapToGlobal(event.pos())
+            self.drag = event.globalPos()
             self.dragged = True
 
     def enterEvent(self, event):
@@ -49,19 +66,33 @@ class CommonGrip(QFrame):
         '''
         Обработка события отпускания кнопки мыши
         '''
-        self.dragged = False
+        if self.dragged:
+            self.apply_pending_size()
+            self.dragged = False
+            self.window.finish_resize()
 
     def mouseMoveEvent(self, event, mouse_event=None):
         '''
-        Обработка события движения мыши
+        Обработка события движения мыши (размер окна меняется в конце кадра)
         '''
-        if not self.window.isMaximized():
-            self.change_size(event)
+        if self.dragged and not self.window.isMaximized():
+            self.pending_pos = event.globalPos()
+            if not self.resize_timer.isActive():
+                self.resize_timer.start()
+
+    def apply_pending_size(self):
+        '''
+        Изменение размера окна по последнему положению мыши
+        '''
+        self.resize_timer.stop()
+        if self.pending_pos is not None:
+            self.change_size(self.pending_pos)
+            self.pending_pos = None
 
     @abc.abstractmethod
-    def change_size(self, event):
+    def change_size(self, pos):
         '''
-        Изменение размера окна
+        Изменение размера окна по положению мыши на экране
         '''
         pass
 
@@ -75,10 +106,11 @@ class RightGrip(CommonGrip):
 
         self.setFixedWidth(self.size)
         self.cursor_style = Qt.SizeHorCursor
+        self.edges = Qt.Edges(Qt.RightEdge)
 
-    def change_size(self, event):
+    def change_size(self, pos):
         self.window.setGeometry(self.old_pos.x(), self.old_pos.y(),
-                                max(self.old_size.width() + self.mapToGlobal(event.pos()).x() - self.drag.x(),
+                                max(self.old_size.width() + pos.x() - self.drag.x(),
                                     self.window.minimumWidth()),
                                 self.window.height())
 
@@ -92,12 +124,13 @@ class LeftGrip(CommonGrip):
 
         self.setFixedWidth(self.size)
         self.cursor_style = Qt.SizeHorCursor
+        self.edges = Qt.Edges(Qt.LeftEdge)
 
-    def change_size(self, event):
-        self.window.setGeometry(min(self.old_pos.x() + self.mapToGlobal(event.pos()).x() - self.drag.x(),
+    def change_size(self, pos):
+        self.window.setGeometry(min(self.old_pos.x() + pos.x() - self.drag.x(),
                                     self.old_pos.x() + self.old_size.width() - self.window.minimumWidth()),
                                 self.old_pos.y(),
-                                self.old_size.width() + self.drag.x() - self.mapToGlobal(event.pos()).x(),
+                                self.old_size.width() + self.drag.x() - pos.x(),
                                 self.window.height())
 
 
@@ -110,11 +143,12 @@ class BottomGrip(CommonGrip):
 
         self.setFixedHeight(self.size)
         self.cursor_style = Qt.SizeVerCursor
+        self.edges = Qt.Edges(Qt.BottomEdge)
 
-    def change_size(self, event):
+    def change_size(self, pos):
         self.window.setGeometry(self.old_pos.x(), self.old_pos.y(),
                                 self.old_size.width(),
-                                max(self.old_size.height() + self.mapToGlobal(event.pos()).y() - self.drag.y(),
+                                max(self.old_size.height() + pos.y() - self.drag.y(),
                                     self.window.minimumHeight()))
 
 
@@ -128,13 +162,14 @@ class BottomLeftGrip(CommonGrip):
         self.setFixedWidth(self.size)
         self.setFixedHeight(self.size)
         self.cursor_style = Qt.SizeBDiagCursor
+        self.edges = Qt.Edges(Qt.BottomEdge | Qt.LeftEdge)
 
-    def change_size(self, event):
-        self.window.setGeometry(min(self.old_pos.x() + self.mapToGlobal(event.pos()).x() - self.drag.x(),
+    def change_size(self, pos):
+        self.window.setGeometry(min(self.old_pos.x() + pos.x() - self.drag.x(),
                                     self.old_pos.x() + self.old_size.width() - self.window.minimumWidth()),
                                 self.old_pos.y(),
-                                self.old_size.width() + self.drag.x() - self.mapToGlobal(event.pos()).x(),
-                                max(self.old_size.height() + self.mapToGlobal(event.pos()).y() - self.drag.y(),
+                                self.old_size.width() + self.drag.x() - pos.x(),
+                                max(self.old_size.height() + pos.y() - self.drag.y(),
                                     self.window.minimumHeight()))
 
 
@@ -148,10 +183,11 @@ class BottomRightGrip(CommonGrip):
         self.setFixedWidth(self.size)
         self.setFixedHeight(self.size)
         self.cursor_style = Qt.SizeFDiagCursor
+        self.edges = Qt.Edges(Qt.BottomEdge | Qt.RightEdge)
 
-    def change_size(self, event):
+    def change_size(self, pos):
         self.window.setGeometry(self.old_pos.x(), self.old_pos.y(),
-                                max(self.old_size.width() + self.mapToGlobal(event.pos()).x() - self.drag.x(),
+                                max(self.old_size.width() + pos.x() - self.drag.x(),
                                     self.window.minimumWidth()),
-                                max(self.old_size.height() + self.mapToGlobal(event.pos()).y() - self.drag.y(),
+                                max(self.old_size.height() + pos.y() - self.drag.y(),
                                     self.window.minimumHeight()))
@@ -0,0 +1,409 @@
+import re
+import time
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QTextLayout
+
+from .constants import PYTHON_KEYWORDS, PYTHON_FUNCTIONS, LAZY_HIGHLIGHT_BUDGET_MS, LAZY_HIGHLIGHT_IDLE_MS, \
+    LAZY_HIGHLIGHT_FLUSH_DISTANCE
+from .tracing import TRACER, traced
+
+
+def create_format(foreground):
+    '''
+    Создание формата текста с данным цветом на общем фоне
+    '''
+    fmt = QTextCharFormat()
+    fmt.setBackground(QColor("#222"))
+    fmt.setForeground(foreground)
+    return fmt
+
+
+# Форматы создаются один раз и переиспользуются всеми подсветками
+FORMATS = {
+    "comment": create_format(QColor("red").lighter(120)),
+    "string": create_format(QColor("green").lighter(120)),
+    "number": create_format(QColor("cyan")),
+    "keyword": create_format(QColor("orange")),
+    "builtin": create_format(QColor("purple").lighter(300)),
+    "definition": create_format(QColor("cyan")),
+}
+
+KEYWORDS = frozenset(PYTHON_KEYWORDS)
+BUILTINS = frozenset(PYTHON_FUNCTIONS) | {"self", "cls"}
+
+# Состояния строки (блока) для многострочных литералов
+STATE_NORMAL = 0
+STATE_SINGLE_TRIPLE = 1
+STATE_DOUBLE_TRIPLE = 2
+
+TRIPLE_STATES = {"'''": STATE_SINGLE_TRIPLE, '"""': STATE_DOUBLE_TRIPLE}
+
+# Конец тройной кавычки с учетом экранирования; группа пуста, если строка не закрыта
+TRIPLE_END = {
+    STATE_SINGLE_TRIPLE: re.compile(r"(?:[^'\\]|\\.|'(?!''))*(''')?"),
+    STATE_DOUBLE_TRIPLE: re.compile(r'(?:[^"\\]|\\.|"(?!""))*(""")?'),
+}
+
+
+PYTHON_TOKENS = re.compile(r'''
+    (?P<comment>\#.*)
+  | (?P<triple>\'\'\'|""")
+  | (?P<string>'[^'\\]*(?:\\.[^'\\]*)*(?:'|\\?$)|"[^"\\]*(?:\\.[^"\\]*)*(?:"|\\?$))
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?[jJ]?)
+  | (?P<word>[^\W\d]\w*)
+''', re.X)
+
+DEFAULT_TOKENS = re.compile(r'''
+    (?P<string>'[^']*(?:'|$)|"[^"]*(?:"|$))
+  | (?P<number>(?<![\w])\d+(?![\w]))
+''', re.X)
+
+# Префиксы строк (r'', b'', f'' и т.д.) разбираются отдельно, чтобы не замедлять регулярное выражение
+STRING_PREFIXES = frozenset(("r", "u", "b", "f", "br", "rb", "fr", "rf"))
+
+# Таблица: слово -> формат
+WORD_FORMATS = dict.fromkeys(BUILTINS, FORMATS["builtin"])
+WORD_FORMATS.update(dict.fromkeys(KEYWORDS, FORMATS["keyword"]))
+
+
+def tokenize_python(text, state):
+    '''
+    Разбор строки кода Python. Возвращает список (начало, длина, формат)
+    и состояние, с которым строка заканчивается
+    '''
+    ranges = []
+    pos = 0
+
+    if state in TRIPLE_END:
+        match = TRIPLE_END[state].match(text)
+        pos = match.end()
+        ranges.append((0, pos, FORMATS["string"]))
+        if match.group(1) is None:
+            return ranges, state
+
+    word_formats = WORD_FORMATS
+    while True:
+        after_def = False
+        for match in PYTHON_TOKENS.finditer(text, pos):
+            kind = match.lastgroup
+            if kind == "string":
+                after_def = False
+                start, end = match.span()
+                start = _string_start(text, start)
+                ranges.append((start, end - start, FORMATS["string"]))
+                continue
+            if kind == "word":
+                word = match.group()
+                dunder = word[:2] == "__" == word[-2:] and len(word) > 4
+                if after_def:
+                    fmt = FORMATS["builtin" if dunder else "definition"]
+                else:
+                    fmt = word_formats.get(word)
+                    if fmt is None:
+                        if not dunder:
+                            continue
+                        fmt = FORMATS["builtin"]
+                after_def = word == "def"
+            elif kind == "triple":
+                break
+            else:
+                after_def = False
+                fmt = FORMATS[kind]
+
+            start, end = match.span()
+            ranges.append((start, end - start, fmt))
+        else:
+            return ranges, STATE_NORMAL
+
+        # Тройная кавычка: ищем ее конец на этой же строке
+        start = _string_start(text, match.start())
+        quote_state = TRIPLE_STATES[match.group()[-3:]]
+        match = TRIPLE_END[quote_state].match(text, match.end())
+        pos = match.end()
+        ranges.append((start, pos - start, FORMATS["string"]))
+        if match.group(1) is None:
+            return ranges, quote_state
+
+
+def tokenize_default(text, state):
+    '''
+    Разбор строки обычного текста: подсвечиваются только кавычки и числа
+    '''
+    return [(match.start(), match.end() - match.start(), FORMATS[match.lastgroup])
+            for match in DEFAULT_TOKENS.finditer(text)], STATE_NORMAL
+
+
+def _string_start(text, quote):
+    '''
+    Начало строкового литерала с учетом префикса перед кавычкой
+    '''
+    start = quote
+    while start > quote - 2 and start and text[start - 1] in "rRbBuUfF":
+        start -= 1
+    if start != quote and (not start or not (text[start - 1].isalnum() or text[start - 1] == '_')) and \
+            text[start:quote].lower() in STRING_PREFIXES:
+        return start
+    return quote
+
+
+class TableHighlighter(QSyntaxHighlighter):
+    '''
+    Подсветка на основе функции разбора строки (tokenize_*).
+    Состояние блока сохраняется, поэтому после правки Qt заново подсвечивает
+    только те строки, у которых это состояние изменилось
+    '''
+    tokenize = staticmethod(tokenize_default)
+
+    def highlightBlock(self, text):
+        '''
+        Подсветка одной строки
+        '''
+        if TRACER.enabled:
+            TRACER.count("highlighted lines")
+        state = self.previousBlockState()
+        ranges, state = self.tokenize(text, state)
+
+        for start, length, fmt in ranges:
+            self.setFormat(start, length, fmt)
+
+        self.setCurrentBlockState(state)
+
+    def detach(self):
+        '''
+        Отключение подсветки от документа
+        '''
+        self.setDocument(None)
+
+
+class DefaultHighlighter(TableHighlighter):
+    '''
+    Дефолтная подсветка
+    '''
+    tokenize = staticmethod(tokenize_default)
+
+
+class PythonHighlighter(TableHighlighter):
+    '''
+    Подсветка синтаксиса Python
+    '''
+    tokenize = staticmethod(tokenize_python)
+
+
+class LazyHighlighter(QObject):
+    '''
+    Подсветка для больших файлов. Форматы задаются только видимым строкам; остальные
+    строки разбираются небольшими порциями по таймеру, пока пользователь ничего не делает,
+    ради состояния на их концах. Прокрутка и правка откладывают фоновую работу и сначала
+    обновляют видимую часть.
+    Форматы, заданные раскладке строки, QTextDocument перекладывает при следующей правке
+    вместе со всем текстом между этой строкой и правкой. Поэтому форматы задаются, только
+    если они изменились, а во время правки они входят в ее собственную перекладку.
+    Непереложенные форматы вдали от новых перекладываются сразу (см. mark_pending)
+    '''
+    def __init__(self, document, tokenize, text_area):
+        super().__init__(document)
+
+        self.document = document
+        self.tokenize = tokenize
+        self.text_area = text_area
+
+        # Все строки с номерами меньше next подсвечены точно
+        self.next = 0
+        # Строки до dirty_until включительно пересчитываются в любом случае (их меняли)
+        self.dirty_until = -1
+        # Строки до provisional_until подсвечены "на глаз" (при показе, а не по порядку)
+        self.provisional_until = -1
+        # Строки от dirty_until до resume были точны до правки: при совпадении состояния их можно пропустить
+        self.resume = 0
+        self.block_count = document.blockCount()
+        # Текст с форматами, заданными после последней правки (начало, конец), или None
+        self.pending = None
+        # На время замены всех вхождений подсветка только сдвигает отметки (см. set_paused)
+        self.paused = False
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_batch)
+
+        document.contentsChange.connect(self.on_contents_change)
+        text_area.viewport_changed.connect(self.on_viewport_changed)
+
+    def detach(self):
+        '''
+        Отключение подсветки от документа
+        '''
+        if self.document is None:
+            return
+
+        self.timer.stop()
+        self.document.contentsChange.disconnect(self.on_contents_change)
+        self.text_area.viewport_changed.disconnect(self.on_viewport_changed)
+        self.document = None
+
+    def is_attached(self):
+        '''
+        Показан ли документ в текстовом поле
+        '''
+        return self.document is not None and self.text_area.document() is self.document
+
+    def set_paused(self, is_paused):
+        '''
+        Приостановка подсветки. Форматы, заданные раскладке строки, QTextDocument перекладывает
+        при следующей правке вместе со всем текстом между этой строкой и правкой, поэтому
+        подсветка видимого после каждой порции замены делала каждую следующую порцию
+        пропорциональной ее позиции в тексте. После снятия паузы подсвечивается видимое
+        '''
+        self.paused = is_paused
+        if is_paused:
+            self.timer.stop()
+        else:
+            self.on_viewport_changed()
+
+    def on_viewport_changed(self):
+        '''
+        Прокрутка или смена размера: отмена запланированной порции и подсветка видимого
+        '''
+        if not self.is_attached() or self.paused:
+            self.timer.stop()
+            return
+
+        self.highlight_visible()
+        self.timer.start(LAZY_HIGHLIGHT_IDLE_MS)
+
+    def on_contents_change(self, position, removed, added):
+        '''
+        Правка текста: сдвиг отметок и пересчет измененных строк
+        '''
+        block_count = self.document.blockCount()
+        delta = block_count - self.block_count
+        self.block_count = block_count
+
+        first = self.document.findBlock(position).blockNumber()
+        last = self.document.findBlock(position + added)
+        last = last.blockNumber() if last.isValid() else block_count - 1
+
+        if self.resume > first:
+            self.resume = max(self.resume + delta, 0)
+        if self.provisional_until > first:
+            self.provisional_until += delta
+        if self.dirty_until > first:
+            self.dirty_until += delta
+        self.dirty_until = max(self.dirty_until, last)
+
+        if first < self.next:
+            self.resume = max(self.resume, self.next + delta)
+            self.next = first
+
+        self.on_viewport_changed()
+        # Правка перекладывает и текст с уже заданными форматами, и заданные сейчас, во время нее
+        self.pending = None
+
+    @traced("LazyHighlighter.highlight_visible", "highlighter")
+    def highlight_visible(self):
+        '''
+        Подсветка видимых строк: строкам с точным состоянием (до next) форматы задаются
+        по нему, остальным - "на глаз", по состоянию предыдущей видимой строки
+        '''
+        first, last = self.text_area.get_visible_blocks()
+        last_number = last.blockNumber()
+
+        block = first
+        state = self.state_before(block)
+        changed = False
+        while block.isValid() and block.blockNumber() <= last_number:
+            number = block.blockNumber()
+            ranges, state = self.tokenize(block.text(), state)
+            if number >= self.next:
+                block.setUserState(state)
+                self.provisional_until = max(self.provisional_until, number)
+            changed |= self.apply_formats(block, ranges)
+            block = block.next()
+
+        if changed:
+            self.text_area.viewport().update()
+
+    @traced("LazyHighlighter.run_batch", "highlighter")
+    def run_batch(self):
+        '''
+        Разбор следующей порции строк в пределах бюджета времени (только состояния),
+        затем уточнение форматов видимых строк
+        '''
+        if not self.is_attached() or self.next >= self.document.blockCount():
+            return
+
+        deadline = time.perf_counter() + LAZY_HIGHLIGHT_BUDGET_MS / 1000
+        block = self.document.findBlockByNumber(self.next)
+        state = self.state_before(block)
+        tokenize = self.tokenize
+        parsed = 0
+
+        while block.isValid():
+            number = block.blockNumber()
+            old_state = block.userState()
+            state = tokenize(block.text(), state)[1]
+            block.setUserState(state)
+            block = block.next()
+            self.next = number + 1
+            parsed += 1
+
+            # Состояние сошлось с прежним: дальше до resume ничего не изменилось
+            if state == old_state and self.dirty_until < number < self.resume and \
+                    number > self.provisional_until:
+                self.next = self.resume
+                block = self.document.findBlockByNumber(self.next)
+                state = self.state_before(block)
+
+            if time.perf_counter() > deadline:
+                break
+
+        if TRACER.enabled:
+            TRACER.count("parsed lines", parsed)
+        # Видимые строки, подсвеченные "на глаз", могли получить другое состояние
+        self.highlight_visible()
+
+        if self.next < self.document.blockCount():
+            self.timer.start(0)
+
+    def state_before(self, block):
+        '''
+        Состояние, с которым начинается строка
+        '''
+        previous = block.previous()
+        if not previous.isValid() or previous.userState() < 0:
+            return STATE_NORMAL
+        return previous.userState()
+
+    def apply_formats(self, block, ranges):
+        '''
+        Задание форматов строке, если они отличаются от заданных; возвращает, изменились ли они
+        '''
+        layout = block.layout()
+        if [(item.start, item.length, item.format) for item in layout.formats()] == ranges:
+            return False
+
+        if TRACER.enabled:
+            TRACER.count("highlighted lines")
+        formats = []
+        for start, length, fmt in ranges:
+            format_range = QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = fmt
+            formats.append(format_range)
+
+        layout.setFormats(formats)
+        self.mark_pending(block.position(), block.position() + block.length())
+        return True
+
+    def mark_pending(self, start, end):
+        '''
+        Учет текста с новыми форматами. Если он далеко от прежнего, прежний перекладывается
+        сразу: иначе следующая правка переложила бы все между ними
+        '''
+        pending = self.pending
+        if pending is not None and (start > pending[1] + LAZY_HIGHLIGHT_FLUSH_DISTANCE or
+                                    end < pending[0] - LAZY_HIGHLIGHT_FLUSH_DISTANCE):
+            self.document.markContentsDirty(pending[0], pending[1] - pending[0])
+            pending = None
+        self.pending = (start, end) if pending is None else (min(start, pending[0]), max(end, pending[1]))
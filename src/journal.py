@@ -0,0 +1,88 @@
+from .constants import JOURNAL_COMPACT_EDITS
+
+
+class JournalEntry:
+    '''
+    Журнал одного файла: правки, еще не переданные на запись, и число уже записанных
+    после последнего снимка
+    '''
+    def __init__(self, state):
+        self.state = state
+        self.edits = 0
+        self.pending = []
+
+
+class Journal:
+    '''
+    Журнал правок несохраненных файлов для восстановления после аварийного завершения.
+    Для каждого файла в базе сеанса (SessionStore) хранится снимок текста и правки после него.
+    Правки копятся в памяти и по таймеру (flush) передаются потоку записи базы,
+    а после JOURNAL_COMPACT_EDITS правок вместо них пишется новый снимок
+    '''
+    def __init__(self, store):
+        self.store = store
+        # doc_id -> JournalEntry
+        self.entries = {}
+
+    def record(self, state, position, removed, inserted):
+        '''
+        Запись правки, уже примененной к тексту файла (вызывается на каждое нажатие клавиши,
+        поэтому только запоминает ее)
+        '''
+        entry = self.entries.get(state.get_doc_id())
+        if entry is None:
+            # Первая правка: снимок уже содержит ее
+            self.start(state)
+            return
+
+        entry.pending.append((position, removed, inserted))
+
+    def start(self, state):
+        '''
+        Начало журнала файла (в том числе восстановленного: новый снимок заменяет старый)
+        '''
+        entry = JournalEntry(state)
+        self.entries[state.get_doc_id()] = entry
+        self.write_snapshot(entry)
+
+    def write_snapshot(self, entry):
+        '''
+        Передача снимка текста на запись (снимок неизменяемый, копирования нет)
+        '''
+        entry.edits = 0
+        self.store.put_buffer(entry.state.get_key(), entry.state.get_snapshot())
+
+    def flush(self):
+        '''
+        Передача накопленных правок на запись (вызывается по таймеру)
+        '''
+        for entry in self.entries.values():
+            if not entry.pending:
+                continue
+
+            if entry.edits + len(entry.pending) > JOURNAL_COMPACT_EDITS:
+                entry.pending = []
+                self.write_snapshot(entry)
+                continue
+
+            self.store.add_edits(entry.state.get_key(), entry.pending)
+            entry.edits += len(entry.pending)
+            entry.pending = []
+
+    def discard(self, state):
+        '''
+        Удаление журнала файла (файл сохранен или закрыт)
+        '''
+        if self.entries.pop(state.get_doc_id(), None) is not None:
+            self.store.remove_buffer(state.get_key())
+
+    def clear(self):
+        '''
+        Удаление журналов файлов, у которых есть файл на диске (при выходе без сохранения).
+        Текст файлов без пути на диске больше нигде не хранится, поэтому он остается
+        и восстанавливается при следующем запуске
+        '''
+        self.flush()
+        for state in [entry.state for entry in self.entries.values()]:
+            if state.get_is_filename_actual():
+                self.discard(state)
@@ -0,0 +1,406 @@
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QColor, QFont, QPainter
+from PyQt5.QtWidgets import QAbstractScrollArea, QApplication, QFrame
+
+from .constants import LARGE_FILE_TAB_SIZE, LARGE_FILE_PROGRESS_MS, VIEW_UPDATE_INTERVAL_MS
+from .tracing import traced
+
+MARGIN = 4
+
+
+class LargeTextArea(QAbstractScrollArea):
+    '''
+    Поле для просмотра большого файла (MappedBuffer). Из файла читаются только
+    видимые строки, вертикальная прокрутка идет по строкам, а не по пикселям
+    '''
+    def __init__(self, controller):
+        super().__init__()
+
+        self.setStyleSheet("background-color: #222; color: #FFF;")
+        self.setFont(QFont("Monospace", 11))
+        self.setFrameShadow(QFrame.Shadow(1))
+        self.setMinimumHeight(300)
+        self.setFocusPolicy(Qt.StrongFocus)
+
+        self.controller = controller
+        self.buffer = None
+        self.cursor_line = 0
+        self.cursor_column = 0
+        # Выделение: ((строка, символ), (строка, символ))
+        self.selection = None
+        # Подсвеченные вхождения поиска в том же виде и их пересчет из смещений (начало, конец)
+        self.match_selections = []
+        self.match_points = {}
+        self.max_width = 0
+
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.update_progress)
+
+        # Положения курсора и прокрутки передаются контроллеру раз за кадр, как в TextArea
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(VIEW_UPDATE_INTERVAL_MS)
+        self._update_timer.timeout.connect(self.flush_updates)
+        self._reported_cursor = None
+        self._reported_slider_pos = None
+        self._is_viewport_changed = False
+
+        self.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def set_buffer(self, buffer):
+        '''
+        Показ данного файла
+        '''
+        self.buffer = buffer
+        self.cursor_line = self.cursor_column = 0
+        self._reported_cursor = None
+        self._reported_slider_pos = None
+        self.selection = None
+        self.match_selections = []
+        self.match_points = {}
+        self.max_width = 0
+
+        self.update_scrollbars()
+        if not buffer.is_indexed():
+            self.progress_timer.start(LARGE_FILE_PROGRESS_MS)
+        self.viewport().update()
+
+    def clear_buffer(self):
+        '''
+        Отключение файла
+        '''
+        self.buffer = None
+        self.progress_timer.stop()
+        self.viewport().update()
+
+    def get_buffer(self):
+        return self.buffer
+
+    def line_height(self):
+        return self.fontMetrics().height()
+
+    def visible_line_count(self):
+        return max(self.viewport().height() // self.line_height(), 1)
+
+    def update_scrollbars(self):
+        '''
+        Пересчет диапазонов прокрутки (число строк растет, пока строится индекс)
+        '''
+        if self.buffer is None:
+            return
+
+        visible = self.visible_line_count()
+        vertical = self.verticalScrollBar()
+        vertical.setPageStep(visible)
+        vertical.setRange(0, max(self.buffer.get_line_count() - visible, 0))
+
+        char_width = self.fontMetrics().horizontalAdvance(' ')
+        horizontal = self.horizontalScrollBar()
+        horizontal.setSingleStep(char_width)
+        horizontal.setPageStep(self.viewport().width())
+        horizontal.setRange(0, max(self.max_width + 2 * MARGIN + char_width - self.viewport().width(), 0))
+
+    def update_progress(self):
+        '''
+        Обновление прокрутки и статуса во время построения индекса строк
+        '''
+        if self.buffer is None:
+            self.progress_timer.stop()
+            return
+
+        self.update_scrollbars()
+        self.controller.update_index_progress(self.buffer.get_progress())
+        if self.buffer.is_indexed():
+            self.progress_timer.stop()
+
+    def on_scroll(self):
+        '''
+        Обработка прокрутки
+        '''
+        self._is_viewport_changed = True
+        self.schedule_update()
+        self.viewport().update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scrollbars()
+        self._is_viewport_changed = True
+        self.schedule_update()
+
+    def schedule_update(self):
+        '''
+        Курсор или прокрутка изменились: контроллер узнает об этом в конце кадра
+        '''
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+
+    def flush_updates(self):
+        '''
+        Передача контроллеру изменившихся положений курсора и слайдера и обновление подсветки вхождений
+        '''
+        self._update_timer.stop()
+        if self.buffer is not None:
+            cursor = (self.cursor_line, self.cursor_column)
+            if cursor != self._reported_cursor:
+                self._reported_cursor = cursor
+                self.controller.update_cursor_pos(self.get_cursor_pos(), *cursor)
+
+            slider_pos = self.get_vertical_slider_pos()
+            if slider_pos != self._reported_slider_pos:
+                self._reported_slider_pos = slider_pos
+                self.controller.update_slider_pos(slider_pos)
+
+        if self._is_viewport_changed:
+            self._is_viewport_changed = False
+            self.controller.update_match_highlights()
+
+    def get_visible_range(self):
+        '''
+        Смещения начала первой и конца последней видимых строк
+        '''
+        if self.buffer is None:
+            return 0, 0
+
+        top = self.verticalScrollBar().value()
+        return self.buffer.line_start(top), self.buffer.line_start(top + self.visible_line_count() + 1)
+
+    def set_match_highlights(self, spans):
+        '''
+        Подсветка найденных вхождений: (начало, конец) в байтах
+        '''
+        if self.buffer is None or not spans:
+            self.match_selections = []
+            self.match_points = {}
+        else:
+            points = self.match_points
+            for span in spans:
+                if span not in points:
+                    points[span] = tuple(self.buffer.get_line_column(position) for position in span)
+            self.match_selections = [points[span] for span in spans]
+        self.viewport().update()
+
+    @traced("LargeTextArea.paintEvent", "paint")
+    def paintEvent(self, event):
+        '''
+        Отрисовка видимых строк, выделения и курсора
+        '''
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), QColor("#222"))
+        if self.buffer is None:
+            return
+
+        painter.setFont(self.font())
+        painter.setPen(QColor("#FFF"))
+        metrics = self.fontMetrics()
+        line_height = self.line_height()
+        top = self.verticalScrollBar().value()
+        lines = self.buffer.get_lines(top, self.visible_line_count() + 1)
+        bottom = top + len(lines)
+        matches = [match for match in self.match_selections if match[1][0] >= top and match[0][0] < bottom]
+
+        max_width = self.max_width
+        for i, text in enumerate(lines):
+            line = top + i
+            y = i * line_height
+
+            for match in matches:
+                highlighted = self.get_selected_columns(line, len(text), match)
+                if highlighted is not None:
+                    left = self.get_x(text, highlighted[0])
+                    painter.fillRect(left, y, self.get_x(text, highlighted[1]) - left, line_height, QColor("#613214"))
+
+            selected = self.get_selected_columns(line, len(text), self.selection)
+            if selected is not None:
+                left = self.get_x(text, selected[0])
+                painter.fillRect(left, y, max(self.get_x(text, selected[1]) - left, 2), line_height, QColor("#264F78"))
+
+            display = text.expandtabs(LARGE_FILE_TAB_SIZE)
+            max_width = max(max_width, metrics.horizontalAdvance(display))
+            painter.drawText(MARGIN - self.horizontalScrollBar().value(), y + metrics.ascent(), display)
+
+            if line == self.cursor_line:
+                painter.fillRect(self.get_x(text, self.cursor_column), y, 1, line_height, QColor("#FFF"))
+
+        # Ширина строк известна только после их чтения
+        if max_width > self.max_width:
+            self.max_width = max_width
+            QTimer.singleShot(0, self.update_scrollbars)
+
+    def get_x(self, text, column):
+        '''
+        Координата символа с номером column на экране
+        '''
+        prefix = text[:column].expandtabs(LARGE_FILE_TAB_SIZE)
+        return MARGIN - self.horizontalScrollBar().value() + self.fontMetrics().horizontalAdvance(prefix)
+
+    def get_column(self, text, x):
+        '''
+        Номер символа в строке по координате на экране
+        '''
+        char_width = self.fontMetrics().horizontalAdvance(' ')
+        target = (x - MARGIN + self.horizontalScrollBar().value()) / char_width
+
+        display = 0
+        for column, char in enumerate(text):
+            step = LARGE_FILE_TAB_SIZE - display % LARGE_FILE_TAB_SIZE if char == '\t' else 1
+            if display + step / 2 > target:
+                return column
+            display += step
+        return len(text)
+
+    @staticmethod
+    def get_selected_columns(line, length, selection):
+        '''
+        Символы строки, попавшие в выделение (начало, конец), или None
+        '''
+        if selection is None:
+            return None
+
+        (start_line, start_column), (end_line, end_column) = selection
+        if not start_line <= line <= end_line:
+            return None
+        return (start_column if line == start_line else 0), (end_column if line == end_line else length)
+
+    def mousePressEvent(self, event):
+        '''
+        Установка курсора щелчком мыши
+        '''
+        if self.buffer is None:
+            return
+
+        self.setFocus()
+        line = self.verticalScrollBar().value() + event.pos().y() // self.line_height()
+        line = min(line, self.buffer.get_line_count() - 1)
+        self.selection = None
+        self.set_cursor(line, self.get_column(self.buffer.get_line(line), event.pos().x()))
+
+    def keyPressEvent(self, event):
+        '''
+        Перемещение курсора с клавиатуры
+        '''
+        if self.buffer is None:
+            return super().keyPressEvent(event)
+
+        key = event.key()
+        ctrl = event.modifiers() & Qt.ControlModifier
+        line, column = self.cursor_line, self.cursor_column
+        page = self.visible_line_count()
+
+        if ctrl and key == Qt.Key_C:
+            self.copy()
+            return
+        elif key == Qt.Key_Up:
+            line -= 1
+        elif key == Qt.Key_Down:
+            line += 1
+        elif key == Qt.Key_PageUp:
+            line -= page
+        elif key == Qt.Key_PageDown:
+            line += page
+        elif key == Qt.Key_Left:
+            column -= 1
+        elif key == Qt.Key_Right:
+            column += 1
+        elif key == Qt.Key_Home:
+            line, column = (0, 0) if ctrl else (line, 0)
+        elif key == Qt.Key_End:
+            if ctrl:
+                while self.buffer.index_next():
+                    pass
+                line = self.buffer.get_line_count() - 1
+            column = len(self.buffer.get_line(line))
+        else:
+            return super().keyPressEvent(event)
+
+        self.selection = None
+        self.set_cursor(line, column)
+
+    def set_cursor(self, line, column):
+        '''
+        Установка курсора с промоткой до него
+        '''
+        line = min(max(line, 0), self.buffer.get_line_count() - 1)
+        text = self.buffer.get_line(line)
+        column = min(max(column, 0), len(text))
+        self.cursor_line, self.cursor_column = line, column
+
+        x = self.get_x(text, column) + self.horizontalScrollBar().value()
+        self.max_width = max(self.max_width, x)
+        self.update_scrollbars()
+
+        vertical = self.verticalScrollBar()
+        if line < vertical.value():
+            vertical.setValue(line)
+        elif line >= vertical.value() + self.visible_line_count():
+            vertical.setValue(line - self.visible_line_count() + 1)
+
+        horizontal = self.horizontalScrollBar()
+        if x < horizontal.value() + MARGIN:
+            horizontal.setValue(x - MARGIN)
+        elif x > horizontal.value() + self.viewport().width() - MARGIN:
+            horizontal.setValue(x - self.viewport().width() + MARGIN)
+
+        self.viewport().update()
+        self.schedule_update()
+
+    def get_cursor_pos(self):
+        '''
+        Смещение курсора в файле
+        '''
+        if self.buffer is None:
+            return 0
+        return self.buffer.get_position(self.cursor_line, self.cursor_column)
+
+    def get_selection_start(self):
+        '''
+        Смещение начала выделения (или курсора, если выделения нет)
+        '''
+        if self.buffer is None or self.selection is None:
+            return self.get_cursor_pos()
+        return self.buffer.get_position(*min(self.selection))
+
+    def set_cursor_pos(self, cursor_pos):
+        '''
+        Установка курсора на данное смещение в файле
+        '''
+        self.set_cursor(*self.buffer.get_line_column(cursor_pos))
+
+    def select_text(self, start, end):
+        '''
+        Выбор текста между смещениями start и end
+        '''
+        self.setFocus()
+        self.selection = self.buffer.get_line_column(start), self.buffer.get_line_column(end)
+        self.set_cursor(*self.selection[1])
+
+    def scroll_to_index(self, index, length):
+        '''
+        Промотка окна до выделенного куска текста
+        '''
+        self.select_text(index, index + length)
+
+    def copy(self):
+        '''
+        Копирование выделенного текста
+        '''
+        if self.buffer is None or self.selection is None:
+            return
+
+        start, end = (self.buffer.get_position(*point) for point in self.selection)
+        QApplication.clipboard().setText(self.buffer.get_text_range(start, end))
+
+    def get_vertical_slider_pos(self):
+        '''
+        Номер первой видимой строки
+        '''
+        return self.verticalScrollBar().value()
+
+    def set_vertical_slider_pos(self, pos):
+        '''
+        Промотка до строки с данным номером
+        '''
+        # Строка могла быть еще не проиндексирована
+        self.buffer.line_start(pos + self.visible_line_count())
+        self.update_scrollbars()
+        self.verticalScrollBar().setValue(pos)
@@ -0,0 +1,169 @@
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+from .constants import LINE_INDEX_BLOCK_SIZE
+
+
+class FenwickTree:
+    '''
+    Дерево Фенвика над массивом неотрицательных чисел: сумма первых элементов,
+    изменение элемента и поиск элемента по сумме за O(log n)
+    '''
+    def __init__(self, values):
+        # tree[i] - сумма элементов (i - (i & -i), i]; нумерация с единицы
+        tree = array('q', [0])
+        tree.extend(values)
+        size = len(tree) - 1
+        for index in range(1, size + 1):
+            parent = index + (index & -index)
+            if parent <= size:
+                tree[parent] += tree[index]
+        self.tree = tree
+        self.size = size
+
+    def add(self, index, delta):
+        '''
+        Прибавление delta к элементу с номером index
+        '''
+        tree = self.tree
+        index += 1
+        while index <= self.size:
+            tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, count):
+        '''
+        Сумма первых count элементов
+        '''
+        tree = self.tree
+        total = 0
+        count = min(count, self.size)
+        while count > 0:
+            total += tree[count]
+            count -= count & -count
+        return total
+
+    def search(self, value):
+        '''
+        Наибольшее count, при котором сумма первых count элементов не больше value,
+        и остаток value за вычетом этой суммы
+        '''
+        tree = self.tree
+        count = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            if count + step <= self.size and tree[count + step] <= value:
+                count += step
+                value -= tree[count]
+            step >>= 1
+        return count, value
+
+
+class LineIndex:
+    '''
+    Индекс строк текста. Длины строк (с переводом строки) хранятся в массивах array('q') блоками
+    до 2 * LINE_INDEX_BLOCK_SIZE строк, число символов и строк в блоках - в деревьях Фенвика.
+    Перевод смещения в строку и столбец (и обратно) и учет правки стоят O(log n + размер блока)
+    без обхода блоков документа Qt
+    '''
+    def __init__(self, text=""):
+        self.blocks = []
+        # Накопленные длины строк каждого блока (None - еще не посчитаны)
+        self.block_ends = []
+        self.chars = None
+        self.lines = None
+        self.set_blocks(0, 0, self.get_line_lengths(text))
+
+    @staticmethod
+    def get_line_lengths(text):
+        '''
+        Длины строк текста вместе с переводом строки (у последней строки его нет)
+        '''
+        lengths = [len(line) + 1 for line in text.split('\n')]
+        lengths[-1] -= 1
+        return lengths
+
+    def set_blocks(self, first, end, lengths):
+        '''
+        Замена блоков [first, end) блоками с данными длинами строк и пересчет деревьев
+        '''
+        size = LINE_INDEX_BLOCK_SIZE
+        count = max((len(lengths) + size - 1) // size, 1)
+        blocks = [array('q', lengths[len(lengths) * i // count:len(lengths) * (i + 1) // count]) for i in range(count)]
+        self.blocks[first:end] = blocks
+        self.block_ends[first:end] = [None] * count
+        self.chars = FenwickTree(map(sum, self.blocks))
+        self.lines = FenwickTree(map(len, self.blocks))
+
+    def get_ends(self, block):
+        ends = self.block_ends[block]
+        if ends is None:
+            ends = self.block_ends[block] = array('q', accumulate(self.blocks[block]))
+        return ends
+
+    def get_line_count(self):
+        return self.lines.prefix_sum(self.lines.size)
+
+    def get_length(self):
+        return self.chars.prefix_sum(self.chars.size)
+
+    def locate_line(self, row):
+        '''
+        Блок строки с номером row и ее номер в блоке
+        '''
+        row = min(max(row, 0), self.get_line_count() - 1)
+        return self.lines.search(row)
+
+    def get_line_column(self, position):
+        '''
+        Номер строки и номер символа в ней для данного смещения
+        '''
+        position = min(max(position, 0), self.get_length())
+        block, offset = self.chars.search(position)
+        if block == len(self.blocks):
+            # Конец текста: последняя строка последнего блока
+            block -= 1
+            offset = position - self.chars.prefix_sum(block)
+
+        ends = self.get_ends(block)
+        line = min(bisect_right(ends, offset), len(ends) - 1)
+        return self.lines.prefix_sum(block) + line, offset - (ends[line - 1] if line else 0)
+
+    def get_position(self, row, column):
+        '''
+        Смещение символа с номером column в строке row (номера за пределами текста ограничиваются)
+        '''
+        block, line = self.locate_line(row)
+        ends = self.get_ends(block)
+        start = ends[line - 1] if line else 0
+        # Перевод строки к строке не относится
+        length = ends[line] - start - (line < len(ends) - 1 or block < len(self.blocks) - 1)
+        return self.chars.prefix_sum(block) + start + min(max(column, 0), length)
+
+    def apply_edit(self, position, removed, inserted):
+        '''
+        Учет правки: с позиции position удалено removed символов и вставлена строка inserted
+        '''
+        first_row, first_column = self.get_line_column(position)
+        last_row, last_column = self.get_line_column(position + removed)
+        first_block, first_line = self.locate_line(first_row)
+        last_block, last_line = self.locate_line(last_row)
+        # Начало первой затронутой строки и конец последней остаются, между ними - вставленный текст
+        suffix = self.blocks[last_block][last_line] - last_column
+        lengths = self.get_line_lengths(inserted)
+        lengths[0] += first_column
+        lengths[-1] += suffix
+
+        lines = self.blocks[first_block]
+        if first_block == last_block and len(lines) + len(lengths) <= 2 * LINE_INDEX_BLOCK_SIZE:
+            delta = len(lengths) - (last_line - first_line + 1)
+            lines[first_line:last_line + 1] = array('q', lengths)
+            self.block_ends[first_block] = None
+            self.chars.add(first_block, len(inserted) - removed)
+            if delta:
+                self.lines.add(first_block, delta)
+            return
+
+        lengths = [*self.blocks[first_block][:first_line], *lengths, *self.blocks[last_block][last_line + 1:]]
+        self.set_blocks(first_block, last_block + 1, lengths)
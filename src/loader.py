@@ -0,0 +1,81 @@
+import hashlib
+import os
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from .constants import LOAD_CHUNK_SIZE, LOAD_QUEUE_LIMIT
+from .tracing import TRACER
+
+
+class LoaderSignals(QObject):
+    '''
+    Сигналы загрузчика (у QRunnable собственных сигналов нет)
+    '''
+    # doc_id, кусок текста, доля прочитанного файла
+    chunk_loaded = pyqtSignal(int, str, float)
+    # doc_id, хеш содержимого (пустой после отмены); испускается и после отмены
+    finished = pyqtSignal(int, str)
+    # doc_id, описание ошибки
+    failed = pyqtSignal(int, str)
+
+
+class FileLoader(QRunnable):
+    '''
+    Чтение файла кусками в пуле потоков. Декодированные куски передаются
+    в поток интерфейса сигналами, загрузку можно отменить между кусками.
+    Чтение не уходит дальше LOAD_QUEUE_LIMIT необработанных кусков, чтобы очередь
+    сигналов не задерживала обработку ввода
+    '''
+    def __init__(self, doc_id, filename):
+        super().__init__()
+
+        self.doc_id = doc_id
+        self.filename = filename
+        self.cancelled = False
+        self.signals = LoaderSignals()
+        self.queue_slots = threading.Semaphore(LOAD_QUEUE_LIMIT)
+
+    def cancel(self):
+        '''
+        Отмена загрузки (прерывается перед чтением следующего куска)
+        '''
+        self.cancelled = True
+
+    def chunk_processed(self):
+        '''
+        Кусок обработан в потоке интерфейса: можно читать следующий
+        '''
+        self.queue_slots.release()
+
+    def wait_for_slot(self):
+        '''
+        Ожидание, пока поток интерфейса разберет очередь; False, если загрузку отменили
+        '''
+        while not self.queue_slots.acquire(timeout=0.05):
+            if self.cancelled:
+                return False
+        return not self.cancelled
+
+    def run(self):
+        '''
+        Чтение файла (выполняется в потоке пула)
+        '''
+        try:
+            with TRACER.span("FileLoader.run", "io", filename=self.filename):
+                size = os.path.getsize(self.filename) or 1
+                content_hash = hashlib.blake2b(digest_size=16)
+                with open(self.filename, 'r') as file:
+                    while not self.cancelled:
+                        chunk = file.read(LOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        content_hash.update(chunk.encode())
+                        if not self.wait_for_slot():
+                            break
+                        self.signals.chunk_loaded.emit(self.doc_id, chunk, min(file.buffer.tell() / size, 1.0))
+        except (OSError, UnicodeDecodeError) as error:
+            self.signals.failed.emit(self.doc_id, str(error))
+            return
+
+        self.signals.finished.emit(self.doc_id, "" if self.cancelled else content_hash.hexdigest())
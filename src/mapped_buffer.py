@@ -0,0 +1,186 @@
+import mmap
+import threading
+from array import array
+from bisect import bisect_left
+
+from .constants import LARGE_FILE_INDEX_CHUNK, LARGE_FILE_LINE_LIMIT
+
+ENCODING = "utf-8"
+
+# Сколько кусков индексируется за один захват блокировки
+INDEX_BATCH = 64
+
+
+class MappedBuffer:
+    '''
+    Текст большого файла, отображенного в память (только для чтения).
+    Индекс строк строится в фоновом потоке: для каждого куска файла хранится число
+    переводов строки до него, поэтому начало любой строки находится бинарным поиском
+    по индексу и просмотром одного куска. Все позиции - смещения в байтах
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self.mapping)
+
+        # chunk_lines[i] - число переводов строки в первых i кусках файла
+        self.chunk_lines = array('q', [0])
+        self.lock = threading.Lock()
+        self.closed = False
+
+        self.thread = threading.Thread(target=self.build_index, daemon=True)
+        self.thread.start()
+
+    def build_index(self):
+        '''
+        Построение индекса строк (выполняется в фоновом потоке)
+        '''
+        while self.index_next():
+            pass
+
+    def index_next(self):
+        '''
+        Индексация следующей порции кусков. Возвращает False, если индекс уже построен
+        или файл закрыт. Вызывается и из фонового потока, и при обращении к еще
+        не проиндексированной части файла
+        '''
+        with self.lock:
+            if self.closed:
+                return False
+
+            chunk_lines = self.chunk_lines
+            for _ in range(INDEX_BATCH):
+                start = (len(chunk_lines) - 1) * LARGE_FILE_INDEX_CHUNK
+                if start >= self.size:
+                    return False
+                count = self.mapping[start:start + LARGE_FILE_INDEX_CHUNK].count(b'\n')
+                chunk_lines.append(chunk_lines[-1] + count)
+
+            return True
+
+    def close(self):
+        '''
+        Остановка индексации и закрытие отображения
+        '''
+        with self.lock:
+            self.closed = True
+            self.mapping.close()
+
+    def is_indexed(self):
+        return self.get_indexed_size() >= self.size
+
+    def get_indexed_size(self):
+        return min((len(self.chunk_lines) - 1) * LARGE_FILE_INDEX_CHUNK, self.size)
+
+    def get_progress(self):
+        '''
+        Доля проиндексированной части файла
+        '''
+        return self.get_indexed_size() / self.size if self.size else 1.0
+
+    def get_line_count(self):
+        '''
+        Число строк (пока индекс строится - число уже известных строк)
+        '''
+        return self.chunk_lines[-1] + 1
+
+    def line_start(self, number):
+        '''
+        Смещение начала строки с данным номером
+        '''
+        if number <= 0:
+            return 0
+
+        chunk_lines = self.chunk_lines
+        while chunk_lines[-1] < number and self.index_next():
+            pass
+        if chunk_lines[-1] < number:
+            return self.size
+
+        # Нужный перевод строки лежит в куске chunk
+        chunk = bisect_left(chunk_lines, number) - 1
+        position = chunk * LARGE_FILE_INDEX_CHUNK
+        for _ in range(number - chunk_lines[chunk]):
+            position = self.mapping.find(b'\n', position) + 1
+        return position
+
+    def line_of(self, position):
+        '''
+        Номер строки, в которой находится данное смещение
+        '''
+        position = min(max(position, 0), self.size)
+        chunk = position // LARGE_FILE_INDEX_CHUNK
+        while len(self.chunk_lines) <= chunk and self.index_next():
+            pass
+        chunk = min(chunk, len(self.chunk_lines) - 1)
+
+        start = chunk * LARGE_FILE_INDEX_CHUNK
+        return self.chunk_lines[chunk] + self.mapping[start:position].count(b'\n')
+
+    def get_lines(self, first, count):
+        '''
+        Декодированный текст count строк, начиная с first
+        '''
+        lines = []
+        position = self.line_start(first)
+        if first >= self.get_line_count():
+            return lines
+
+        while len(lines) < count:
+            end = self.mapping.find(b'\n', position)
+            lines.append(self.decode(position, self.size if end == -1 else end))
+            if end == -1:
+                break
+            position = end + 1
+
+        return lines
+
+    def get_line(self, number):
+        lines = self.get_lines(number, 1)
+        return lines[0] if lines else ""
+
+    def decode(self, start, end):
+        '''
+        Текст строки между смещениями start и end (очень длинные строки обрезаются)
+        '''
+        text = self.mapping[start:min(end, start + LARGE_FILE_LINE_LIMIT)].decode(ENCODING, 'replace')
+        if text.endswith('\r'):
+            text = text[:-1]
+        return text
+
+    def get_position(self, line, column):
+        '''
+        Смещение символа с номером column в строке line
+        '''
+        return self.line_start(line) + self.encoded_length(self.get_line(line)[:column])
+
+    def get_line_column(self, position):
+        '''
+        Строка и номер символа в ней для данного смещения
+        '''
+        line = self.line_of(position)
+        start = self.line_start(line)
+        return line, len(self.decode(start, position))
+
+    def find(self, string, start=0):
+        '''
+        Смещение первого вхождения строки после start или -1
+        '''
+        return self.mapping.find(string.encode(ENCODING), start)
+
+    def get_text_range(self, start, end):
+        return self.mapping[start:end].decode(ENCODING, 'replace')
+
+    def get_mapping(self):
+        return self.mapping
+
+    @staticmethod
+    def encoded_length(string):
+        return len(string.encode(ENCODING))
+
+    def get_filename(self):
+        return self.filename
+
+    def get_size(self):
+        return self.size
@@ -53,10 +53,14 @@ class MenuBar(QMenuBar):
         close_action = MenuAction(None, "Close file", file_item, lambda:
             file_item.execute_action(lambda: self.controller.close_file()), self.parent(), "Ctrl+W")
 
+        cancel_loading_action = MenuAction(None, "Cancel loading", file_item, lambda:
+            file_item.execute_action(lambda: self.controller.cancel_loading()), self.parent())
+
         exit_action = MenuAction(None, "&Exit", file_item, lambda:
             file_item.execute_action(lambda: self.controller.exit()), self.parent(), "Alt+f4")
 
-        file_item.init_actions(save_action, save_as_action, open_action, new_action, close_action, None, exit_action)
+        file_item.init_actions(save_action, save_as_action, open_action, new_action, close_action,
+                               cancel_loading_action, None, exit_action)
         self.add_menu_item(file_item)
 
         edit_item = MenuItem("Edit", self)
@@ -76,6 +80,9 @@ class MenuBar(QMenuBar):
         find_action = MenuAction(None, "&Find", edit_item, lambda:
             edit_item.execute_action(lambda: self.controller.toggle_find()), self.parent(), "Ctrl+F")
 
+        go_to_line_action = MenuAction(None, "&Go to line", edit_item, lambda:
+            edit_item.execute_action(lambda: self.controller.go_to_line()), self.parent(), "Ctrl+G")
+
         undo_action = MenuAction(None, "&Undo", edit_item, lambda:
             edit_item.execute_action(lambda: self.text_area.undo()), self.parent(), "Ctrl+Z")
 
@@ -83,7 +90,7 @@ class MenuBar(QMenuBar):
             edit_item.execute_action(lambda: self.text_area.redo()), self.parent(), "Ctrl+Y")
 
         edit_item.init_actions(cut_action, copy_action, paste_action,
-                               all_action, find_action, None, undo_action, redo_action)
+                               all_action, find_action, go_to_line_action, None, undo_action, redo_action)
         self.add_menu_item(edit_item)
 
         help_item = MenuItem("Help", self)
@@ -91,9 +98,21 @@ class MenuBar(QMenuBar):
         about_action = MenuAction(None, "&About", help_item, lambda:
         help_item.execute_action(lambda: self.controller.show_about()), self.parent())
 
-        help_item.init_actions(about_action)
+        self.tracing_action = MenuAction(None, "Start tracing", help_item, lambda:
+        help_item.execute_action(lambda: self.controller.toggle_tracing()), self.parent())
+
+        debug_panel_action = MenuAction(None, "Debug panel", help_item, lambda:
+        help_item.execute_action(lambda: self.controller.show_debug_panel()), self.parent())
+
+        help_item.init_actions(about_action, None, self.tracing_action, debug_panel_action)
         self.add_menu_item(help_item)
 
+    def set_tracing(self, is_tracing):
+        '''
+        Подпись действия трассировки: включить или выключить
+        '''
+        self.tracing_action.setText("Stop tracing" if is_tracing else "Start tracing")
+
 
 class MenuItem(QMenu):
     '''
@@ -127,20 +146,31 @@ class MenuItem(QMenu):
 
         self.setFixedSize(40, 40)
 
-        self.menu = QMenu(self)
+        # Выпадающее меню создается при первом наведении (сочетания клавиш действий работают и без него)
+        self.menu = None
+        self.item_actions = []
 
         self.installEventFilter(self)
-        self.menu.installEventFilter(self)
 
     def init_actions(self, *actions):
         '''
-        Добавление действий в секцию меню
+        Добавление действий в секцию меню (None - разделитель)
+        '''
+        self.item_actions.extend(actions)
+
+    def get_menu(self):
+        '''
+        Выпадающее меню секции
         '''
-        for action in actions:
-            if action:
-                self.menu.addAction(action)
-            else:
-                self.menu.addSeparator()
+        if self.menu is None:
+            self.menu = QMenu(self)
+            for action in self.item_actions:
+                if action:
+                    self.menu.addAction(action)
+                else:
+                    self.menu.addSeparator()
+            self.menu.installEventFilter(self)
+        return self.menu
 
     def eventFilter(self, source, event):
         '''
@@ -149,12 +179,12 @@ class MenuItem(QMenu):
         if source == self:
             if event.type() == event.Enter:
                 self.setStyleSheet(self.hover_style)
-                self.menu.exec(self.mapToGlobal(QPoint(0, self.height())))
+                self.get_menu().exec(self.mapToGlobal(QPoint(0, self.height())))
 
             elif event.type() == event.HoverLeave:
                 self.setStyleSheet(self.normal_style)
 
-        elif source == self.menu:
+        elif source is self.menu:
             if event.type() == event.MouseMove:
                 cursor = QCursor()
                 pos = cursor.pos()
@@ -1,4 +1,81 @@
+import itertools
 import os
+import uuid
+
+from .buffer import Rope
+from .constants import LARGE_FILE_THRESHOLD
+from .line_index import FenwickTree, LineIndex
+from .mapped_buffer import MappedBuffer
+
+
+def get_path_keys(filename):
+    '''
+    Ключи файла в индексе путей: путь без символических ссылок и, если файл существует,
+    пара (устройство, inode), по которой совпадают и жесткие ссылки на один файл
+    '''
+    path = os.path.normcase(os.path.realpath(filename))
+    try:
+        info = os.stat(path)
+    except OSError:
+        return path, None
+
+    return path, (info.st_dev, info.st_ino)
+
+
+class TabOrder:
+    '''
+    Порядок вкладок: номер вкладки по файлу и файл по номеру за O(log n), закрытие вкладки
+    без сдвига последующих. Файлы занимают места по порядку открытия, дерево Фенвика хранит
+    единицы на занятых местах: номер вкладки - число занятых мест перед местом файла.
+    Когда места кончаются, открытые файлы пересаживаются подряд в дерево вдвое больше
+    '''
+    def __init__(self):
+        self.tree = FenwickTree([])
+        # Место -> данные файла (None - вкладка закрыта); doc_id -> место
+        self.slots = []
+        self.slot_by_id = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, state):
+        '''
+        Добавление файла в конец
+        '''
+        if len(self.slots) == self.tree.size:
+            self.compact()
+        self.slot_by_id[state.get_doc_id()] = len(self.slots)
+        self.tree.add(len(self.slots), 1)
+        self.slots.append(state)
+        self.count += 1
+
+    def remove(self, state):
+        '''
+        Удаление файла: его место остается пустым
+        '''
+        slot = self.slot_by_id.pop(state.get_doc_id())
+        self.tree.add(slot, -1)
+        self.slots[slot] = None
+        self.count -= 1
+
+    def get_index(self, state):
+        return self.tree.prefix_sum(self.slot_by_id[state.get_doc_id()])
+
+    def get_state(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError("tab index out of range")
+        slot, _ = self.tree.search(index)
+        return self.slots[slot]
+
+    def compact(self):
+        '''
+        Пересадка открытых файлов подряд в дерево вдвое больше их числа
+        '''
+        states = [state for state in self.slots if state is not None]
+        self.tree = FenwickTree([1] * len(states) + [0] * (len(states) + 1))
+        self.slots = states
+        self.slot_by_id = {state.get_doc_id(): slot for slot, state in enumerate(states)}
 
 
 class TextEditorModel:
@@ -6,15 +83,21 @@ class TextEditorModel:
     Данные об открытых файлах
     '''
     def __init__(self):
-        self.states = []
         self.count_unsaved = 0
         self.current_state = None
 
+        # doc_id -> данные файла (словарь хранит и порядок вкладок) и номера вкладок (TabOrder)
+        self._states_by_id = {}
+        self._order = TabOrder()
+        # Ключ пути -> {doc_id: данные файла}; doc_id -> ключи, под которыми файл записан
+        self._paths = {}
+        self._path_keys = {}
+
     def change_state(self, index):
         '''
         Смена активного файла
         '''
-        self.current_state = self.states[index]
+        self.current_state = self._order.get_state(index)
 
     def close_state(self):
         '''
@@ -22,27 +105,117 @@ class TextEditorModel:
         '''
         if self.current_state.get_is_modified():
             self.count_unsaved -= 1
-        self.states.remove(self.current_state)
+        self.current_state.close()
+
+        doc_id = self.current_state.get_doc_id()
+        self.unindex_path(self.current_state)
+        del self._states_by_id[doc_id]
+        self._order.remove(self.current_state)
+
+    def add_state(self, state):
+        '''
+        Добавление данных о файле в конец списка и в индексы
+        '''
+        self._states_by_id[state.get_doc_id()] = state
+        self._order.append(state)
+        self.index_path(state)
+        self.current_state = state
+
+    def index_path(self, state):
+        '''
+        Запись файла в индекс путей (после открытия, смены пути или сохранения)
+        '''
+        self.unindex_path(state)
+        # Имена новых файлов ("New file 1") и устаревшие пути в индекс не попадают
+        if not state.get_filename() or not state.get_is_filename_actual():
+            return
+
+        keys = [key for key in get_path_keys(state.get_filename()) if key is not None]
+        for key in keys:
+            self._paths.setdefault(key, {})[state.get_doc_id()] = state
+        self._path_keys[state.get_doc_id()] = keys
+
+    def unindex_path(self, state):
+        '''
+        Удаление файла из индекса путей
+        '''
+        for key in self._path_keys.pop(state.get_doc_id(), ()):
+            states = self._paths[key]
+            del states[state.get_doc_id()]
+            if not states:
+                del self._paths[key]
+
+    def find_state(self, filename):
+        '''
+        Данные об открытом файле с данным путем (или None)
+        '''
+        for key in get_path_keys(filename):
+            states = self._paths.get(key)
+            if states:
+                return next(iter(states.values()))
+
+        return None
 
     def load(self, filename, slider_pos=0, cursor_pos=0):
         '''
-        Загрузка нового файла
+        Открытие нового файла. Текст обычного файла читается потом в фоне
+        (FileLoader), до конца загрузки файл помечен как загружаемый
+        '''
+        if not self.add_placeholder(filename, slider_pos, cursor_pos):
+            return False
+
+        self.restore(self.current_state)
+        return True
+
+    def add_placeholder(self, filename, slider_pos=0, cursor_pos=0, key=None, content_hash=""):
+        '''
+        Добавление файла без обращения к его содержимому (например, из прошлого сеанса).
+        Файл готовится к загрузке при первом обращении к нему (restore)
         '''
         if not os.path.isfile(filename):
             return False
 
-        if any(True for state in self.states if os.path.abspath(state.filename) == filename):
+        if self.find_state(filename) is not None:
             return False
 
-        with open(filename, 'r') as file:
-            text = file.read()
+        new_state = State("", False, filename, True, slider_pos, cursor_pos)
+        new_state.set_is_placeholder(True)
+        new_state.set_content_hash(content_hash)
+        if key is not None:
+            new_state.set_key(key)
+        self.add_state(new_state)
 
-        new_state = State(text, False, filename, True, slider_pos, cursor_pos)
+        return True
 
-        self.states.append(new_state)
-        self.current_state = new_state
+    def restore(self, state):
+        '''
+        Подготовка файла-заглушки к загрузке
+        '''
+        state.set_is_placeholder(False)
 
-        return True
+        filename = state.get_filename()
+        # Большие файлы не читаются целиком, а отображаются в память только для просмотра
+        if os.path.isfile(filename) and os.path.getsize(filename) >= LARGE_FILE_THRESHOLD:
+            state.set_mapped_buffer(MappedBuffer(filename))
+        else:
+            state.set_is_loading(True)
+
+    def add_recovered(self, key, filename, is_filename_actual, text, edits, slider_pos=0, cursor_pos=0):
+        '''
+        Восстановление файла с несохраненным текстом: снимок текста и правки после него
+        '''
+        if is_filename_actual and self.find_state(filename) is not None:
+            return None
+
+        state = State(text, True, filename, is_filename_actual, slider_pos, cursor_pos)
+        state.set_key(key)
+        for position, removed, inserted in edits:
+            state.apply_edit(position, removed, inserted)
+
+        self.add_state(state)
+        self.count_unsaved += 1
+
+        return state
 
     def save(self, filename):
         '''
@@ -54,30 +227,51 @@ class TextEditorModel:
         self.current_state.set_is_modified(False)
         self.current_state.set_filename(filename)
         self.current_state.set_is_filename_actual(True)
+        self.index_path(self.current_state)
 
-    def create(self):
+    def create(self, filename="", key=None):
         '''
         Создание данных о новом файле
         '''
-        new_state = State("", False, "", False, 0, 0)
-        self.states.append(new_state)
-        self.current_state = new_state
+        new_state = State("", False, filename, False, 0, 0)
+        if key is not None:
+            new_state.set_key(key)
+        self.add_state(new_state)
 
     def find(self, filename):
         '''
         Поиск файла с данным путем
         '''
-        for i, state in enumerate(self.states):
-            if os.path.abspath(state.filename) == filename:
-                return i
+        state = self.find_state(filename)
+        return -1 if state is None else self.get_state_index(state)
+
+    def get_state(self, doc_id):
+        '''
+        Данные о файле с данным идентификатором документа (или None, если файл закрыт)
+        '''
+        return self._states_by_id.get(doc_id)
 
-        return -1
+    def get_state_index(self, state):
+        return self._order.get_index(state)
+
+    def get_current_state(self):
+        return self.current_state
+
+    def mark_saved(self, state):
+        '''
+        Пометка файла как сохраненного (файл не обязательно активный)
+        '''
+        if state.get_is_modified():
+            self.count_unsaved -= 1
+            state.set_is_modified(False)
+        # При атомарном сохранении у файла появляется новый inode
+        self.index_path(state)
 
     def get_number_of_states(self):
         '''
         Количество открытых файлов
         '''
-        return len(self.states)
+        return len(self._order)
 
     def get_count_unsaved(self):
         '''
@@ -87,18 +281,60 @@ class TextEditorModel:
 
     def set_not_actual_filename(self, filename):
         '''
-        Обновление всех файлов с данным путем
+        Обновление всех файлов с данным путем. Возвращает обновленные файлы
         '''
-        for state in self.states:
-            if os.path.abspath(state.get_filename()) == os.path.abspath(filename):
-                state.set_is_filename_actual(False)
-                state.set_is_modified(True)
-                self.count_unsaved += 1
+        states = {}
+        for key in get_path_keys(filename):
+            states.update(self._paths.get(key, {}))
+
+        for state in states.values():
+            self.unindex_path(state)
+            state.set_is_filename_actual(False)
+            state.set_is_modified(True)
+            self.count_unsaved += 1
+
+        return list(states.values())
 
     # Дальше куча геттеров и сеттеров, думаю, что для них и так понятно, что они делают
 
     def get_states(self):
-        return self.states
+        return list(self._states_by_id.values())
+
+    def get_doc_id(self):
+        return self.current_state.get_doc_id()
+
+    def get_is_mapped(self):
+        return self.current_state.get_is_mapped()
+
+    def get_mapped_buffer(self):
+        return self.current_state.get_mapped_buffer()
+
+    def get_is_loading(self):
+        return self.current_state.get_is_loading()
+
+    def get_is_placeholder(self):
+        return self.current_state.get_is_placeholder()
+
+    def apply_edit(self, position, removed, inserted):
+        self.current_state.apply_edit(position, removed, inserted)
+
+    def get_snapshot(self):
+        return self.current_state.get_snapshot()
+
+    def get_trigram_index(self):
+        return self.current_state.get_trigram_index()
+
+    def get_line_column(self, position):
+        return self.current_state.get_line_column(position)
+
+    def get_position(self, row, column):
+        return self.current_state.get_position(row, column)
+
+    def get_line_count(self):
+        return self.current_state.get_line_count()
+
+    def get_version(self):
+        return self.current_state.get_version()
 
     def set_text(self, text):
         self.current_state.set_text(text)
@@ -119,12 +355,14 @@ class TextEditorModel:
 
     def set_filename(self, filename):
         self.current_state.set_filename(filename)
+        self.index_path(self.current_state)
 
     def get_filename(self):
         return self.current_state.get_filename()
 
     def set_is_filename_actual(self, is_filename_actual):
         self.current_state.set_is_filename_actual(is_filename_actual)
+        self.index_path(self.current_state)
 
     def get_is_filename_actual(self):
         return self.current_state.get_is_filename_actual()
@@ -146,21 +384,152 @@ class State:
     '''
     Класс, хранящий данные об одном файле
     '''
-    def __init__(self, text, is_modified, filename, is_filename_actual, slider_pos, cursor_pos):
-        self.text = text
+    ids = itertools.count(1)
+
+    def __init__(self, text, is_modified, filename, is_filename_actual, slider_pos, cursor_pos, mapped_buffer=None):
+        self.doc_id = next(State.ids)
+        # Постоянный ключ файла в базе сеанса (doc_id действует только до выхода)
+        self.key = uuid.uuid4().hex
+        # Хеш содержимого файла на диске на момент загрузки или сохранения
+        self.content_hash = ""
+        self.buffer = Rope.from_text(text)
+        # Начала строк: перевод смещений в строку и столбец без обхода текста
+        self.line_index = LineIndex(text)
+        # Для больших файлов текст читается прямо из отображенного в память файла
+        self.mapped_buffer = mapped_buffer
+        # Индекс троек символов для поиска (только для больших текстов, иначе None)
+        self.trigram_index = None
+        self.is_loading = False
+        # Заглушка: файл из прошлого сеанса, содержимое которого еще не читалось
+        self.is_placeholder = False
+        # Растет при каждой правке: по ней видно, не изменился ли текст, пока файл сохранялся
+        self.version = 0
         self.is_modified = is_modified
         self.filename = filename
         self.is_filename_actual = is_filename_actual
         self.slider_pos = slider_pos
         self.cursor_pos = cursor_pos
 
+    def apply_edit(self, position, removed, inserted):
+        '''
+        Правка текста: удаление removed символов с позиции position и вставка inserted
+        '''
+        # Qt может сообщить об удалении завершающего разделителя абзаца, которого нет в тексте
+        removed = max(min(removed, len(self.buffer) - position), 0)
+        if not removed and not inserted:
+            return
+        self.buffer = self.buffer.replace(position, removed, inserted)
+        self.line_index.apply_edit(position, removed, inserted)
+        self.version += 1
+        if self.trigram_index is not None:
+            self.trigram_index.apply_edit(position, removed, inserted)
+
+    def close(self):
+        '''
+        Освобождение ресурсов файла
+        '''
+        if self.mapped_buffer is not None:
+            self.mapped_buffer.close()
+
+    def append_text(self, text):
+        '''
+        Добавление загруженного куска текста в конец
+        '''
+        self.line_index.apply_edit(len(self.buffer), 0, text)
+        self.buffer = self.buffer.insert(len(self.buffer), text)
+        self.version += 1
+
+    def get_snapshot(self):
+        '''
+        Неизменяемый снимок текста (копирования не происходит)
+        '''
+        return self.buffer
+
+    def get_text_range(self, start, end):
+        return self.buffer.substring(start, end)
+
+    def get_length(self):
+        return len(self.buffer)
+
+    def get_line_column(self, position):
+        '''
+        Номер строки и номер символа в ней для данного смещения (у больших файлов - в байтах)
+        '''
+        if self.mapped_buffer is not None:
+            return self.mapped_buffer.get_line_column(position)
+        return self.line_index.get_line_column(position)
+
+    def get_position(self, row, column):
+        '''
+        Смещение символа с номером column в строке row
+        '''
+        if self.mapped_buffer is not None:
+            return self.mapped_buffer.get_position(row, column)
+        return self.line_index.get_position(row, column)
+
+    def get_line_count(self):
+        '''
+        Число строк (у большого файла, пока строится его индекс, - число уже известных строк)
+        '''
+        if self.mapped_buffer is not None:
+            return self.mapped_buffer.get_line_count()
+        return self.line_index.get_line_count()
+
     # Аналогично куча геттеров и сеттеров
 
+    def get_doc_id(self):
+        return self.doc_id
+
+    def set_key(self, key):
+        self.key = key
+
+    def get_key(self):
+        return self.key
+
+    def set_content_hash(self, content_hash):
+        self.content_hash = content_hash
+
+    def get_content_hash(self):
+        return self.content_hash
+
+    def get_is_mapped(self):
+        return self.mapped_buffer is not None
+
+    def set_mapped_buffer(self, mapped_buffer):
+        self.mapped_buffer = mapped_buffer
+
+    def get_mapped_buffer(self):
+        return self.mapped_buffer
+
+    def set_trigram_index(self, trigram_index):
+        self.trigram_index = trigram_index
+
+    def get_trigram_index(self):
+        return self.trigram_index
+
+    def set_is_placeholder(self, is_placeholder):
+        self.is_placeholder = is_placeholder
+
+    def get_is_placeholder(self):
+        return self.is_placeholder
+
+    def set_is_loading(self, is_loading):
+        self.is_loading = is_loading
+
+    def get_is_loading(self):
+        return self.is_loading
+
+    def get_version(self):
+        return self.version
+
     def set_text(self, text):
-        self.text = text
+        self.buffer = Rope.from_text(text)
+        self.line_index = LineIndex(text)
+        self.version += 1
+        self.trigram_index = None
 
     def get_text(self):
-        return self.text
+        return self.buffer.get_text()
 
     def set_is_modified(self, is_modified):
         self.is_modified = is_modified
@@ -0,0 +1,25 @@
+import os
+
+from .constants import APP_CACHE_DIR, SESSION_FILENAME
+
+
+def get_cache_dir():
+    '''
+    Каталог данных приложения в каталоге пользователя: $XDG_CACHE_HOME/APP_CACHE_DIR
+    (по умолчанию ~/.cache, в Windows - %LOCALAPPDATA%). Создается при первом обращении
+    '''
+    base = os.environ.get("LOCALAPPDATA" if os.name == "nt" else "XDG_CACHE_HOME", "")
+    # Относительный путь в XDG_CACHE_HOME по спецификации не учитывается
+    if not os.path.isabs(base):
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+
+    path = os.path.join(base, APP_CACHE_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_session_path():
+    '''
+    Путь к базе сеанса
+    '''
+    return os.path.join(get_cache_dir(), SESSION_FILENAME)
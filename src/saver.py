@@ -0,0 +1,105 @@
+import hashlib
+import os
+import shutil
+import stat
+import uuid
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from .tracing import TRACER
+
+
+class SaverSignals(QObject):
+    '''
+    Сигналы сохранения (у QRunnable собственных сигналов нет)
+    '''
+    # doc_id, версия сохраненного текста, путь, хеш содержимого (пустой для больших файлов)
+    saved = pyqtSignal(int, int, str, str)
+    # doc_id, описание ошибки
+    failed = pyqtSignal(int, str)
+
+
+class FileSaver(QRunnable):
+    '''
+    Сохранение файла в пуле потоков. Текст берется из неизменяемого снимка (Rope),
+    поэтому правки во время записи ему не мешают. Запись идет во временный файл
+    рядом с исходным, который после fsync атомарно заменяет исходный: при сбое
+    на диске остается либо старая, либо новая версия файла целиком
+    '''
+    def __init__(self, doc_id, version, filename, snapshot=None, source=None):
+        super().__init__()
+
+        self.doc_id = doc_id
+        self.version = version
+        self.filename = filename
+        # Текст для записи, либо путь к файлу, который нужно скопировать (большие файлы)
+        self.snapshot = snapshot
+        self.source = source
+        self.content_hash = hashlib.blake2b(digest_size=16)
+        self.signals = SaverSignals()
+
+    def run(self):
+        '''
+        Запись файла (выполняется в потоке пула)
+        '''
+        target = os.path.realpath(self.filename)
+        try:
+            if self.source is None or os.path.realpath(self.source) != target:
+                with TRACER.span("FileSaver.write", "io", filename=self.filename):
+                    self.write(target)
+        except (OSError, UnicodeError) as error:
+            self.signals.failed.emit(self.doc_id, str(error))
+            return
+
+        self.signals.saved.emit(self.doc_id, self.version, self.filename,
+                                "" if self.source is not None else self.content_hash.hexdigest())
+
+    def write(self, target):
+        '''
+        Запись во временный файл и замена им файла target
+        '''
+        directory, name = os.path.split(target)
+        temp_name = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+
+        # Права нового файла такие же, как у обычного open(..., 'w'), а у существующего сохраняются
+        fd = os.open(temp_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, 'w' if self.source is None else 'wb') as file:
+                if self.source is None:
+                    for chunk in self.snapshot.chunks():
+                        file.write(chunk)
+                        self.content_hash.update(chunk.encode())
+                else:
+                    with open(self.source, 'rb') as source:
+                        shutil.copyfileobj(source, file)
+                file.flush()
+                os.fsync(file.fileno())
+
+            if os.path.exists(target):
+                os.chmod(temp_name, stat.S_IMODE(os.stat(target).st_mode))
+            os.replace(temp_name, target)
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+
+        self.sync_directory(directory)
+
+    @staticmethod
+    def sync_directory(directory):
+        '''
+        Сброс на диск записи о переименовании (где это поддерживается)
+        '''
+        if not hasattr(os, "O_DIRECTORY"):
+            return
+
+        try:
+            fd = os.open(directory or os.curdir, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
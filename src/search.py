@@ -1,4 +1,6 @@
-from PyQt5.QtWidgets import QFrame, QGridLayout, QLineEdit, QPushButton
+import os
+
+from PyQt5.QtWidgets import QFileDialog, QFrame, QGridLayout, QHBoxLayout, QLineEdit, QPushButton
 
 
 class SearchEntry(QFrame):
@@ -11,7 +13,7 @@ class SearchEntry(QFrame):
         self.controller = controller
 
         self.setStyleSheet("background-color: #222; border-bottom: 1px solid #555;")
-        self.setFixedHeight(70)
+        self.setFixedHeight(105)
 
         self.initUI()
 
@@ -23,17 +25,39 @@ class SearchEntry(QFrame):
         self.setLayout(layout)
 
         self.search_field = self.createTextField()
+        self.search_field.returnPressed.connect(lambda: self.controller.find(self.get_find_input()))
+        self.search_field.textChanged.connect(self.controller.schedule_search)
         layout.addWidget(self.search_field, 0, 0)
 
         self.replace_field = self.createTextField()
         layout.addWidget(self.replace_field, 1, 0)
 
+        find_layout = QHBoxLayout()
+        find_layout.setSpacing(2)
+        self.regex_button = self.createOptionButton(".*", "Regular expression")
+        # По умолчанию регистр учитывается, как и раньше
+        self.case_button = self.createOptionButton("Aa", "Match case", True)
+        self.word_button = self.createOptionButton("W", "Whole word")
+        self.previous_button = self.createPreviousButton()
         self.find_button = self.createFindButton()
-        layout.addWidget(self.find_button, 0, 1)
+        for widget in (self.regex_button, self.case_button, self.word_button, self.previous_button,
+                       self.find_button):
+            find_layout.addWidget(widget)
+        layout.addLayout(find_layout, 0, 1)
 
         self.replace_button = self.createReplaceButton()
         layout.addWidget(self.replace_button, 1, 1)
 
+        self.directory_field = self.createTextField()
+        self.directory_field.setPlaceholderText("Also search in directory (optional)")
+        layout.addWidget(self.directory_field, 2, 0)
+
+        files_layout = QHBoxLayout()
+        files_layout.setSpacing(2)
+        for widget in (self.createBrowseButton(), self.createFindInFilesButton(), self.createReplaceInFilesButton()):
+            files_layout.addWidget(widget)
+        layout.addLayout(files_layout, 2, 1)
+
         self.close_button = self.createCloseButton()
         layout.addWidget(self.close_button, 0, 2)
 
@@ -59,6 +83,37 @@ class SearchEntry(QFrame):
         '''
         return self.replace_field.text()
 
+    def get_options(self):
+        '''
+        Параметры поиска: регулярное выражение, учет регистра, только целые слова
+        '''
+        return self.regex_button.isChecked(), self.case_button.isChecked(), self.word_button.isChecked()
+
+    def createOptionButton(self, text, tooltip, is_checked=False):
+        '''
+        Создание кнопки-переключателя параметра поиска (смена параметра заново считает вхождения)
+        '''
+        button = QPushButton(text, self)
+        button.setCheckable(True)
+        button.setChecked(is_checked)
+        button.setToolTip(tooltip)
+        button.setFixedWidth(30)
+
+        button.toggled.connect(lambda: self.controller.search(self.get_find_input()))
+
+        return button
+
+    def createPreviousButton(self):
+        '''
+        Создание кнопки поиска назад
+        '''
+        button = QPushButton("<", self)
+        button.setFixedWidth(30)
+
+        button.clicked.connect(lambda: self.controller.find(self.get_find_input(), True))
+
+        return button
+
     def createFindButton(self):
         '''
         Создание кнопки поиска
@@ -79,6 +134,49 @@ class SearchEntry(QFrame):
 
         return button
 
+    def get_directory_input(self):
+        '''
+        Получение каталога для поиска в файлах
+        '''
+        return self.directory_field.text()
+
+    def createBrowseButton(self):
+        '''
+        Создание кнопки выбора каталога
+        '''
+        button = QPushButton("...", self)
+        button.setFixedWidth(30)
+
+        button.clicked.connect(self.browse_directory)
+
+        return button
+
+    def browse_directory(self):
+        directory = QFileDialog.getExistingDirectory(None, 'Search in directory', os.path.curdir)
+        if directory:
+            self.directory_field.setText(directory)
+
+    def createFindInFilesButton(self):
+        '''
+        Создание кнопки поиска во всех открытых файлах (и в каталоге)
+        '''
+        button = QPushButton("Find in files", self)
+
+        button.clicked.connect(lambda: self.controller.find_in_files(self.get_find_input(),
+                                                                     self.get_directory_input()))
+
+        return button
+
+    def createReplaceInFilesButton(self):
+        '''
+        Создание кнопки замены во всех найденных файлах
+        '''
+        button = QPushButton("Replace in files", self)
+
+        button.clicked.connect(lambda: self.controller.replace_in_files(self.get_replace_input()))
+
+        return button
+
     def createCloseButton(self):
         '''
         Создания кнопки закрытия фрейма
@@ -86,6 +184,6 @@ class SearchEntry(QFrame):
         button = QPushButton("X", self)
         button.setFixedSize(20, 20)
 
-        button.clicked.connect(self.hide)
+        button.clicked.connect(self.controller.hide_find)
 
         return button
@@ -0,0 +1,156 @@
+import json
+import time
+
+from PyQt5 import sip
+from PyQt5.QtCore import QEvent, QObject, Qt
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import QApplication, QWidget
+
+from .constants import SESSION_RECORDING_VERSION
+
+# Виды событий записи
+KEY = "key"
+PRESS = "press"
+RELEASE = "release"
+MOVE = "move"
+WHEEL = "wheel"
+# Отдельные нажатия модификаторов не записываются: они входят в сочетания с другими клавишами
+MODIFIER_KEYS = (Qt.Key_Shift, Qt.Key_Control, Qt.Key_Alt, Qt.Key_Meta, Qt.Key_AltGr)
+
+
+def get_widget_path(widget, window):
+    '''
+    Путь к элементу от его окна: корень (главное окно - "window", другие окна, например
+    диалоги и выпадающие меню, - имя класса) и номера элементов среди дочерних элементов родителя
+    '''
+    numbers = []
+    while not widget.isWindow():
+        parent = widget.parentWidget()
+        numbers.append([child for child in parent.children() if isinstance(child, QWidget)].index(widget))
+        widget = parent
+    return ["window" if widget is window else type(widget).__name__] + numbers[::-1]
+
+
+def find_widget(path, window):
+    '''
+    Элемент по пути (get_widget_path) или None, если такого элемента сейчас нет
+    '''
+    root, *numbers = path
+    if root == "window":
+        widget = window
+    else:
+        widget = next((top for top in QApplication.topLevelWidgets()
+                       if type(top).__name__ == root and top.isVisible()), None)
+
+    for number in numbers:
+        if widget is None:
+            return None
+        children = [child for child in widget.children() if isinstance(child, QWidget)]
+        widget = children[number] if number < len(children) else None
+    return widget
+
+
+def is_paste(key, modifiers):
+    return QKeySequence(key | modifiers) in QKeySequence.keyBindings(QKeySequence.Paste)
+
+
+def load_session(path):
+    '''
+    Чтение записи: заголовок (открытые файлы, активная вкладка, размер окна) и список событий
+    '''
+    with open(path) as file:
+        header = json.loads(file.readline())
+        if header.get("version") != SESSION_RECORDING_VERSION:
+            raise ValueError(f"unsupported session recording version: {header.get('version')}")
+        return header, [json.loads(line) for line in file if line.strip()]
+
+
+class SessionRecorder(QObject):
+    '''
+    Запись ввода пользователя (main.py --record-session) для воспроизведения (benchmarks.replay).
+    Файл - строки JSON: заголовок, затем события [время от начала записи в мс, вид, путь к элементу, параметры].
+    События перехватываются на уровне окон, до доставки элементам: каждое нажатие записывается один раз,
+    а сочетания клавиш меню (их обрабатывают QShortcut, а не элементы) - отдельно
+    '''
+    def __init__(self, path, window, files, active):
+        super().__init__()
+
+        self.window = window
+        self.start = time.perf_counter()
+        # Элемент, на котором нажата кнопка мыши: ему же достаются перемещения и отпускание
+        self.mouse_target = None
+        # Построчная буферизация: запись не теряется, если редактор завершится аварийно
+        self.file = open(path, 'w', buffering=1)
+        self.write({"version": SESSION_RECORDING_VERSION, "files": files, "active": active,
+                    "size": [window.width(), window.height()]})
+
+        QApplication.instance().installEventFilter(self)
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def write_event(self, kind, widget, *params):
+        self.write([round((time.perf_counter() - self.start) * 1000), kind, get_widget_path(widget, self.window),
+                    *params])
+
+    def write_key(self, key, modifiers, text):
+        '''
+        Нажатие клавиши в элементе с фокусом. Для вставки записывается и текст буфера обмена
+        '''
+        widget = QApplication.focusWidget() or self.window
+        if is_paste(key, modifiers):
+            self.write_event(KEY, widget, key, modifiers, text, QApplication.clipboard().text())
+        else:
+            self.write_event(KEY, widget, key, modifiers, text)
+
+    def get_top_level(self, window_handle):
+        return next((top for top in QApplication.topLevelWidgets() if top.windowHandle() is window_handle), None)
+
+    def eventFilter(self, source, event):
+        kind = event.type()
+        if kind == QEvent.Shortcut:
+            combined = event.key()[0]
+            self.write_key(combined & ~int(Qt.KeyboardModifierMask), combined & int(Qt.KeyboardModifierMask), "")
+            return False
+
+        # События окон (QWindow) от оконной системы
+        if not event.spontaneous() or not source.isWindowType():
+            return False
+
+        if kind == QEvent.KeyPress:
+            if event.key() in MODIFIER_KEYS:
+                return False
+            self.write_key(event.key(), int(event.modifiers()), event.text())
+
+        elif kind in (QEvent.MouseButtonPress, QEvent.MouseButtonRelease, QEvent.MouseMove, QEvent.Wheel):
+            top = self.get_top_level(source)
+            if top is None:
+                return False
+            pos = event.position().toPoint() if kind == QEvent.Wheel else event.pos()
+            # Элемент, на котором нажата кнопка, мог быть удален (например, кнопка закрытия вкладки)
+            if self.mouse_target is not None and sip.isdeleted(self.mouse_target):
+                self.mouse_target = None
+            if kind == QEvent.MouseButtonPress or kind == QEvent.Wheel or self.mouse_target is None:
+                widget = top.childAt(pos) or top
+            else:
+                widget = self.mouse_target
+            local = widget.mapFromGlobal(top.mapToGlobal(pos))
+
+            if kind == QEvent.MouseButtonPress:
+                self.mouse_target = widget
+                self.write_event(PRESS, widget, local.x(), local.y(), int(event.button()), int(event.modifiers()))
+            elif kind == QEvent.MouseButtonRelease:
+                self.mouse_target = None
+                self.write_event(RELEASE, widget, local.x(), local.y(), int(event.button()), int(event.modifiers()))
+            elif kind == QEvent.MouseMove:
+                # Перемещения без нажатой кнопки (наведение) не записываются
+                if event.buttons() != Qt.NoButton and self.mouse_target is not None:
+                    self.write_event(MOVE, widget, local.x(), local.y(), int(event.buttons()), int(event.modifiers()))
+            else:
+                delta = event.angleDelta()
+                self.write_event(WHEEL, widget, local.x(), local.y(), delta.x(), delta.y(), int(event.modifiers()))
+        return False
+
+    def close(self):
+        QApplication.instance().removeEventFilter(self)
+        self.file.close()
@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+
+from .tracing import TRACER
+
+LOGGER = logging.getLogger("sigma-text-editor.session")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    doc_key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    is_filename_actual INTEGER NOT NULL,
+    content_hash TEXT NOT NULL DEFAULT '',
+    slider_pos INTEGER NOT NULL DEFAULT 0,
+    cursor_pos INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buffers (
+    doc_key TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS edits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    inserted TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS edits_doc_key ON edits (doc_key);
+'''
+
+# Поля документа, которые можно обновлять по отдельности (update_document)
+DOCUMENT_FIELDS = ("filename", "is_filename_actual", "content_hash", "slider_pos", "cursor_pos")
+
+
+class SessionStore:
+    '''
+    Данные о сеансе в базе SQLite (режим WAL): открытые файлы в порядке вкладок,
+    настройки окна и несохраненный текст (журнал правок). Изменения записываются
+    по мере появления в отдельном потоке, каждое - своей транзакцией, поэтому
+    поток интерфейса не ждет диска, а после сбоя база остается целой.
+    Поток интерфейса только читает базу при запуске
+    '''
+    def __init__(self, path):
+        self.path = path
+
+        connection = self.connect()
+        with connection:
+            connection.executescript(SCHEMA)
+        self.connection = connection
+
+        # Первая ошибка записи и показана ли она пользователю (см. take_error)
+        self.error = None
+        self.is_error_taken = False
+
+        self.tasks = queue.Queue()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # В режиме WAL этого достаточно для целостности базы при сбое приложения
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def import_legacy(self, opened_path, app_data_path):
+        '''
+        Перенос данных из JSON-файлов прежних версий (если база еще пуста)
+        '''
+        if not os.path.isfile(opened_path) and not os.path.isfile(app_data_path):
+            return
+
+        is_empty = self.connection.execute(
+            "SELECT NOT EXISTS (SELECT 1 FROM documents) AND NOT EXISTS (SELECT 1 FROM settings)").fetchone()[0]
+        if is_empty:
+            opened = self.read_json(opened_path)
+            settings = self.read_json(app_data_path)
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT INTO documents (doc_key, position, filename, is_filename_actual, slider_pos, cursor_pos) "
+                    "VALUES (?, ?, ?, 1, ?, ?)",
+                    [(uuid.uuid4().hex, position, filename, int(slider_pos), int(cursor_pos))
+                     for position, (filename, (slider_pos, cursor_pos)) in enumerate(opened.items())])
+                self.connection.executemany(
+                    "INSERT INTO settings (name, value) VALUES (?, ?)",
+                    [(name, json.dumps(value)) for name, value in settings.items()])
+
+        for path in (opened_path, app_data_path):
+            if os.path.isfile(path):
+                os.remove(path)
+
+    @staticmethod
+    def read_json(path):
+        if not os.path.isfile(path):
+            return {}
+
+        try:
+            with open(path, 'r') as file:
+                return json.loads(file.read())
+        except ValueError:
+            return {}
+
+    # Чтение (в потоке интерфейса, при запуске)
+
+    def get_documents(self):
+        '''
+        Открытые файлы в порядке вкладок: (ключ, путь, актуален ли путь, хеш содержимого,
+        положение слайдера, положение курсора, есть ли несохраненный текст)
+        '''
+        return self.connection.execute(
+            "SELECT d.doc_key, d.filename, d.is_filename_actual, d.content_hash, d.slider_pos, d.cursor_pos, "
+            "b.doc_key IS NOT NULL FROM documents d LEFT JOIN buffers b ON b.doc_key = d.doc_key "
+            "ORDER BY d.position").fetchall()
+
+    def get_settings(self):
+        return {name: json.loads(value) for name, value in self.connection.execute("SELECT name, value FROM settings")}
+
+    def read_buffer(self, key):
+        '''
+        Несохраненный текст документа: снимок и правки после него
+        '''
+        row = self.connection.execute("SELECT text FROM buffers WHERE doc_key = ?", (key,)).fetchone()
+        edits = self.connection.execute(
+            "SELECT position, removed, inserted FROM edits WHERE doc_key = ? ORDER BY id", (key,)).fetchall()
+        return ("" if row is None else row[0]), edits
+
+    # Запись (задания выполняются в потоке записи по очереди)
+
+    def put_documents(self, rows):
+        '''
+        Замена списка открытых файлов: (ключ, путь, актуален ли путь, хеш, слайдер, курсор)
+        '''
+        self.tasks.put((self.write_documents, (rows,)))
+
+    def put_document(self, position, key, filename, is_filename_actual, content_hash, slider_pos, cursor_pos):
+        '''
+        Добавление файла на вкладку с данным номером
+        '''
+        self.tasks.put((self.execute, (
+            "INSERT OR REPLACE INTO documents "
+            "(doc_key, position, filename, is_filename_actual, content_hash, slider_pos, cursor_pos) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, position, filename, int(is_filename_actual), content_hash, slider_pos, cursor_pos))))
+
+    def update_document(self, key, **fields):
+        '''
+        Обновление отдельных полей файла (имена полей - из DOCUMENT_FIELDS)
+        '''
+        names = [name for name in fields if name in DOCUMENT_FIELDS]
+        assignments = ", ".join(f"{name} = ?" for name in names)
+        self.tasks.put((self.execute, (f"UPDATE documents SET {assignments} WHERE doc_key = ?",
+                                       (*(fields[name] for name in names), key))))
+
+    def update_positions(self, rows):
+        '''
+        Обновление положений слайдера и курсора: (слайдер, курсор, ключ)
+        '''
+        self.tasks.put((self.execute_many, ("UPDATE documents SET slider_pos = ?, cursor_pos = ? WHERE doc_key = ?",
+                                            rows)))
+
+    def remove_document(self, key):
+        '''
+        Удаление закрытого файла (вкладки после него сдвигаются) вместе с его несохраненным текстом
+        '''
+        self.tasks.put((self.delete_document, (key,)))
+
+    def put_setting(self, name, value):
+        self.tasks.put((self.execute, ("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+                                       (name, json.dumps(value)))))
+
+    def put_buffer(self, key, snapshot):
+        '''
+        Запись снимка несохраненного текста (снимок неизменяемый) вместо прежнего снимка и правок
+        '''
+        self.tasks.put((self.write_buffer, (key, snapshot)))
+
+    def add_edits(self, key, edits):
+        '''
+        Дозапись правок после снимка: (позиция, удалено символов, вставленная строка)
+        '''
+        self.tasks.put((self.execute_many, ("INSERT INTO edits (doc_key, position, removed, inserted) "
+                                            "VALUES (?, ?, ?, ?)", [(key, *edit) for edit in edits])))
+
+    def remove_buffer(self, key):
+        self.tasks.put((self.delete_buffer, (key,)))
+
+    def take_error(self):
+        '''
+        Первая ошибка записи, если она была и еще не возвращалась: показывается один раз
+        '''
+        if self.error is None or self.is_error_taken:
+            return None
+
+        self.is_error_taken = True
+        return self.error
+
+    def close(self):
+        '''
+        Остановка потока записи после выполнения всех заданий
+        '''
+        self.tasks.put(None)
+        self.thread.join()
+        self.connection.close()
+
+    # Дальше идет то, что выполняется в потоке записи
+
+    def write_loop(self):
+        '''
+        Выполнение заданий записи по очереди
+        '''
+        connection = self.connect()
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                connection.close()
+                return
+
+            function, args = task
+            try:
+                with TRACER.span(f"SessionStore.{function.__name__}", "io"), connection:
+                    function(connection, *args)
+            except sqlite3.Error as error:
+                # Ошибка записи сеанса не должна мешать работе с файлами: она пишется в журнал,
+                # а первую контроллер показывает пользователю
+                LOGGER.error("Cannot write session (%s): %s", function.__name__, error)
+                if self.error is None:
+                    self.error = error
+
+    @staticmethod
+    def execute(connection, statement, parameters):
+        connection.execute(statement, parameters)
+
+    @staticmethod
+    def execute_many(connection, statement, rows):
+        connection.executemany(statement, rows)
+
+    @staticmethod
+    def write_documents(connection, rows):
+        connection.execute("DELETE FROM documents")
+        connection.executemany(
+            "INSERT INTO documents (position, doc_key, filename, is_filename_actual, content_hash, slider_pos, cursor_pos) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(position, key, filename, int(is_filename_actual), *rest)
+             for position, (key, filename, is_filename_actual, *rest) in enumerate(rows)])
+        # Несохраненный текст файлов, которых больше нет среди открытых
+        connection.execute("DELETE FROM buffers WHERE doc_key NOT IN (SELECT doc_key FROM documents)")
+        connection.execute("DELETE FROM edits WHERE doc_key NOT IN (SELECT doc_key FROM documents)")
+
+    @staticmethod
+    def delete_document(connection, key):
+        row = connection.execute("SELECT position FROM documents WHERE doc_key = ?", (key,)).fetchone()
+        if row is not None:
+            connection.execute("DELETE FROM documents WHERE doc_key = ?", (key,))
+            connection.execute("UPDATE documents SET position = position - 1 WHERE position > ?", row)
+        SessionStore.delete_buffer(connection, key)
+
+    @staticmethod
+    def write_buffer(connection, key, snapshot):
+        connection.execute("INSERT OR REPLACE INTO buffers (doc_key, text) VALUES (?, ?)",
+                           (key, "".join(snapshot.chunks())))
+        connection.execute("DELETE FROM edits WHERE doc_key = ?", (key,))
+
+    @staticmethod
+    def delete_buffer(connection, key):
+        connection.execute("DELETE FROM buffers WHERE doc_key = ?", (key,))
+        connection.execute("DELETE FROM edits WHERE doc_key = ?", (key,))
@@ -0,0 +1,55 @@
+import sys
+import time
+
+from PyQt5.QtCore import QEvent, QObject, QTimer, pyqtSignal
+
+
+class StartupProfile(QObject):
+    '''
+    Замер этапов запуска приложения (main.py --profile-startup): длительность каждого этапа
+    от конца предыдущего. Последний этап заканчивается первой отрисовкой окна
+    '''
+    # Окно отрисовано, этапы выведены
+    finished = pyqtSignal()
+
+    def __init__(self, start=None):
+        super().__init__()
+
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        # Этапы: (название, секунды)
+        self.phases = []
+
+    def mark(self, name):
+        '''
+        Конец этапа name
+        '''
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def get_phases(self):
+        return self.phases
+
+    def watch_first_paint(self, window):
+        '''
+        Ожидание первой отрисовки окна (вместе с дочерними элементами)
+        '''
+        window.installEventFilter(self)
+
+    def eventFilter(self, source, event):
+        if event.type() == QEvent.Paint:
+            source.removeEventFilter(self)
+            # Дочерние элементы отрисовываются сразу после окна, в том же проходе
+            QTimer.singleShot(0, self.finish)
+        return False
+
+    def finish(self):
+        self.mark("first paint")
+        self.report()
+        self.finished.emit()
+
+    def report(self, file=sys.stderr):
+        for name, seconds in self.phases:
+            print(f"{name:<16} {seconds * 1000:8.1f} ms", file=file)
+        print(f"{'total':<16} {(self.last - self.start) * 1000:8.1f} ms", file=file, flush=True)
@@ -39,7 +39,12 @@ class StatusBar(QFrame):
         self.pos_label.setStyleSheet("font-size: 14px; color: white; margin-right: 5px;")
         self.pos_label.setAlignment(Qt.AlignRight)
 
+        self.match_label = QLabel()
+        self.match_label.setStyleSheet("font-size: 14px; color: white; margin-right: 15px;")
+        self.match_label.setAlignment(Qt.AlignRight)
+
         layout.addWidget(self.status_label)
+        layout.addWidget(self.match_label)
         layout.addWidget(self.pos_label)
 
     def show_pos(self, row, col):
@@ -47,3 +52,26 @@ class StatusBar(QFrame):
         Отображения координат курсора в тексте
         '''
         self.pos_label.setText(f"row: {row:<4} col: {col:<4}")
+
+    def show_match_count(self, index, count):
+        '''
+        Отображение числа вхождений и номера выделенного (index = -1, если ни одно не выделено)
+        '''
+        if not count:
+            self.match_label.setText("No matches")
+        elif index == -1:
+            self.match_label.setText(f"{count} matches")
+        else:
+            self.match_label.setText(f"{index + 1} of {count}")
+
+    def show_searching(self):
+        self.match_label.setText("Searching...")
+
+    def clear_match_count(self):
+        self.match_label.setText("")
+
+    def show_message(self, text):
+        '''
+        Вывод сообщения (пустая строка убирает сообщение)
+        '''
+        self.fake_status_bar.showMessage(text)
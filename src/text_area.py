@@ -1,37 +1,252 @@
-from PyQt5.QtGui import QFont, QTextCursor, QSyntaxHighlighter, QTextCharFormat, QColor
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QResizeEvent, QTextCursor, QTextDocument
 from PyQt5.QtWidgets import QFrame, QTextEdit
 
-from .constants import PYTHON_KEYWORDS, PYTHON_FUNCTIONS
+from .constants import LAZY_HIGHLIGHT_THRESHOLD, VIEW_UPDATE_INTERVAL_MS
+from .highlighter import DefaultHighlighter, PythonHighlighter, LazyHighlighter, tokenize_default, tokenize_python
+from .tracing import TRACER, traced
 
 class TextArea(QTextEdit):
     '''
     Поле для редактирования содержимого файла
     '''
+    # Изменилась видимая часть документа (прокрутка, размер, смена документа)
+    viewport_changed = pyqtSignal()
+
     def __init__(self, controller):
         super().__init__()
 
-        self.setStyleSheet("background-color: #222;")
+        self.setStyleSheet("background-color: #222; color: #FFF;")
         self.setFont(QFont("Monospace", 11))
         self.setFrameShadow(QFrame.Shadow(1))
         self.setMinimumHeight(300)
 
         self._text = ""
+        self._silent = False
+        self._document = None
+        self._blank_document = QTextDocument(self)
+        # Размер поля до начала растягивания окна (None - окно не растягивается)
+        self._frozen_size = None
         self.controller = controller
 
-        self.cursorPositionChanged.connect(
-            lambda: self.controller.update_cursor_pos(self.textCursor().position(),
-                                                      self.textCursor().blockNumber(),
-                                                      self.textCursor().columnNumber()))
-        self.textChanged.connect(lambda: self.controller.update_text(self.get_text()))
-        self.verticalScrollBar().valueChanged.connect(
-            lambda: self.controller.update_slider_pos(self.get_vertical_slider_pos()))
-
-    def set_highlighter(self, filename):
-        extension = filename.split('.')[-1]
-        if extension == "py":
-            self.highlighter = PythonHighlighter(self.document())
-        else:
-            self.highlighter = DefaultHighlighter(self.document())
+        # Курсор и прокрутка при быстром вводе и прокрутке меняются много раз за кадр:
+        # контроллер узнает о них один раз за кадр (flush_updates) и только если они изменились
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(VIEW_UPDATE_INTERVAL_MS)
+        self._update_timer.timeout.connect(self.flush_updates)
+        self._reported_cursor_pos = None
+        self._reported_slider_pos = None
+        self._is_viewport_changed = False
+
+        self.clear_document()
+
+        self.cursorPositionChanged.connect(self.schedule_update)
+        self.verticalScrollBar().valueChanged.connect(self.viewport_changed)
+        # Ленивая подсветка синтаксиса обновляется сразу, до отрисовки, а подсветка вхождений - раз за кадр
+        self.viewport_changed.connect(self.schedule_viewport_update)
+
+    def create_document(self, text):
+        '''
+        Создание нового документа с данным текстом
+        '''
+        document = QTextDocument(self)
+        document.setDefaultFont(self.font())
+        document.setPlainText(text)
+        return document
+
+    def append_text(self, document, text):
+        '''
+        Добавление текста в конец документа (без оповещения контроллера)
+        '''
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.End)
+        self._silent = True
+        try:
+            cursor.insertText(text)
+        finally:
+            self._silent = False
+
+    def set_loading(self, is_loading):
+        '''
+        Режим загрузки файла: только чтение и заглушка вместо текста
+        '''
+        self.setReadOnly(is_loading)
+        self.setPlaceholderText("Loading..." if is_loading else "")
+
+    def set_document(self, document):
+        '''
+        Показ данного документа (без оповещения контроллера)
+        '''
+        if self._document is document:
+            return
+
+        if self._document is not None:
+            self._document.contentsChange.disconnect(self.on_contents_change)
+
+        self._document = document
+        self._reported_cursor_pos = None
+        self._reported_slider_pos = None
+        self._silent = True
+        try:
+            self.setDocument(document)
+        finally:
+            self._silent = False
+
+        document.contentsChange.connect(self.on_contents_change)
+        self.viewport_changed.emit()
+
+    def resizeEvent(self, event):
+        '''
+        Обработка изменения размера поля. Пока окно растягивается, текст не переносится
+        под новую ширину: это делается один раз в конце (set_layout_frozen)
+        '''
+        if self._frozen_size is None:
+            super().resizeEvent(event)
+        # Во время смены документа у него еще нет раскладки: обращение к видимым строкам
+        # разложило бы весь текст сразу. set_document сам сообщит об изменении после смены
+        if not self._silent:
+            self.viewport_changed.emit()
+
+    def set_layout_frozen(self, is_frozen):
+        '''
+        Начало и конец растягивания окна: в конце документ один раз раскладывается под итоговый размер
+        '''
+        if is_frozen:
+            if self._frozen_size is None:
+                self._frozen_size = self.viewport().size()
+            return
+
+        if self._frozen_size is not None:
+            old_size, self._frozen_size = self._frozen_size, None
+            self.resizeEvent(QResizeEvent(self.viewport().size(), old_size))
+
+    @traced("TextArea.paintEvent", "paint")
+    def paintEvent(self, event):
+        '''
+        Отрисовка видимой части (замеряется при включенной трассировке)
+        '''
+        super().paintEvent(event)
+
+    def schedule_update(self):
+        '''
+        Курсор или прокрутка изменились: контроллер узнает об этом в конце кадра
+        '''
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+
+    def schedule_viewport_update(self):
+        self._is_viewport_changed = True
+        self.schedule_update()
+
+    def flush_updates(self):
+        '''
+        Передача контроллеру положения курсора и слайдера (только изменившихся) по одному снимку курсора
+        и обновление подсветки вхождений. Пустой документ (загрузка, большой файл, нет вкладок) не сообщает
+        положений: они относились бы не к нему
+        '''
+        self._update_timer.stop()
+        if self._document is not self._blank_document:
+            cursor_pos = self.textCursor().position()
+            if cursor_pos != self._reported_cursor_pos:
+                self._reported_cursor_pos = cursor_pos
+                self.controller.update_cursor_pos(cursor_pos)
+
+            slider_pos = self.get_vertical_slider_pos()
+            if slider_pos != self._reported_slider_pos:
+                self._reported_slider_pos = slider_pos
+                self.controller.update_slider_pos(slider_pos)
+
+        if self._is_viewport_changed:
+            self._is_viewport_changed = False
+            self.controller.update_match_highlights()
+
+    def get_visible_blocks(self):
+        '''
+        Первая и последняя видимые строки документа
+        '''
+        top = self.verticalScrollBar().value()
+        first = self.find_block_at(top, 0)
+        last = self.find_block_at(top + self.viewport().height() - 1, first.blockNumber())
+        return first, last
+
+    def find_block_at(self, y, start):
+        '''
+        Строка документа на высоте y (не выше строки номер start). Строки ищутся по их
+        прямоугольникам, а не через cursorForPosition: после смены документа тот раскладывает
+        весь текст (десятки секунд для 10 МБ), а здесь раскладывается только текст до высоты y
+        '''
+        document = self.document()
+        layout = document.documentLayout()
+
+        def top_of(number):
+            return layout.blockBoundingRect(document.findBlockByNumber(number)).top()
+
+        # Удвоение шага, пока строка не окажется ниже y, затем деление пополам
+        low, step = start, 1
+        high = document.blockCount()
+        while low + step < high and top_of(low + step) <= y:
+            low += step
+            step *= 2
+        high = min(low + step, high)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if top_of(middle) <= y:
+                low = middle
+            else:
+                high = middle
+        return document.findBlockByNumber(low)
+
+    def get_visible_range(self):
+        '''
+        Позиции начала первой и конца последней видимых строк
+        '''
+        first, last = self.get_visible_blocks()
+        return first.position(), last.position() + last.length()
+
+    def set_match_highlights(self, spans):
+        '''
+        Подсветка найденных вхождений: (начало, конец) в символах
+        '''
+        document = self.document()
+        end_of_text = document.characterCount() - 1
+        selections = []
+        for start, end in spans:
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = QTextCursor(document)
+            selection.cursor.setPosition(min(start, end_of_text))
+            selection.cursor.setPosition(min(end, end_of_text), QTextCursor.KeepAnchor)
+            selection.format.setBackground(QColor("#613214"))
+            selections.append(selection)
+        self.setExtraSelections(selections)
+
+    def clear_document(self):
+        '''
+        Показ пустого документа (например, когда все вкладки закрыты)
+        '''
+        self._silent = True
+        try:
+            self._blank_document.clear()
+        finally:
+            self._silent = False
+        self.set_document(self._blank_document)
+
+    def create_highlighter(self, document, filename, lazy=False):
+        '''
+        Создание подсветки для документа в зависимости от расширения файла.
+        Небольшой документ подсвечивается сразу целиком, пока у него нет раскладки:
+        иначе QTextEdit перекладывает документ после каждой строки. Большие документы
+        и уже показанные (lazy) подсвечиваются лениво, начиная с видимой части
+        '''
+        is_python = filename.split('.')[-1] == "py"
+
+        if lazy or document.blockCount() >= LAZY_HIGHLIGHT_THRESHOLD:
+            return LazyHighlighter(document, tokenize_python if is_python else tokenize_default, self)
+
+        highlighter = PythonHighlighter(document) if is_python else DefaultHighlighter(document)
+        with TRACER.span("rehighlight", "highlighter", lines=document.blockCount()):
+            highlighter.rehighlight()
+        return highlighter
 
     def scroll_to_index(self, index, length):
         '''
@@ -51,12 +266,25 @@ class TextArea(QTextEdit):
         '''
         self.verticalScrollBar().setSliderPosition(pos)
 
+    def on_contents_change(self, position, removed, added):
+        '''
+        Передача контроллеру только изменившегося куска текста
+        '''
+        if self._silent:
+            return
+
+        self.controller.update_text(position, removed, self.get_text_range(position, position + added))
+
     def set_text(self, text):
         '''
-        Установка текста
+        Установка текста (без оповещения контроллера)
         '''
         self._text = text
-        self.setPlainText(self._text)
+        self._silent = True
+        try:
+            self.setPlainText(self._text)
+        finally:
+            self._silent = False
 
     def get_text(self):
         '''
@@ -65,6 +293,41 @@ class TextArea(QTextEdit):
         self._text = self.toPlainText()
         return self._text
 
+    def get_text_range(self, start, end):
+        '''
+        Получение текста на символах от start до end
+        '''
+        # Qt учитывает в длине документа завершающий разделитель абзаца
+        end = min(end, self.document().characterCount() - 1)
+        if end <= start:
+            return ""
+
+        cursor = QTextCursor(self.document())
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        return cursor.selection().toPlainText()
+
+    def replace_spans(self, edits, is_first):
+        '''
+        Замена кусков текста (начало, конец, новый текст) одним блоком правок: отменяется
+        одним Ctrl+Z. Если is_first ложно, блок присоединяется к предыдущему.
+        Контроллер не оповещается: порцию он передает модели сам, не перечитывая текст из поля
+        '''
+        cursor = QTextCursor(self.document())
+        self._silent = True
+        try:
+            if is_first:
+                cursor.beginEditBlock()
+            else:
+                cursor.joinPreviousEditBlock()
+            for start, end, text in edits:
+                cursor.setPosition(start)
+                cursor.setPosition(end, QTextCursor.KeepAnchor)
+                cursor.insertText(text)
+            cursor.endEditBlock()
+        finally:
+            self._silent = False
+
     def select_text(self, start, end):
         '''
         Выбор текста на символах от start до end
@@ -82,133 +345,3 @@ class TextArea(QTextEdit):
         cursor = self.textCursor()
         cursor.setPosition(cursor_pos)
         self.setTextCursor(cursor)
-
-
-class DefaultHighlighter(QSyntaxHighlighter):
-    '''
-    Дефолтная подсветка
-    '''
-    def __init__(self, parent=None):
-        super().__init__(parent)
-
-    def highlightBlock(self, text):
-        '''
-        Подсветка одной строки
-        '''
-        block_text = self.currentBlock().text() + ' '
-
-        fmt = QTextCharFormat()
-        fmt.setBackground(QColor("#222"))
-        fmt.setForeground(QColor("#FFF"))
-        self.setFormat(0, len(block_text), fmt)
-
-        start = 0
-        word = ""
-        open_quotes = False
-        last_quote = ""
-
-        for index, char in enumerate(block_text):
-            if char in ("'", '"'):
-                if not open_quotes:
-                    start = index
-                    last_quote = char
-                    open_quotes = True
-
-                elif char == last_quote:
-                    fmt.setForeground(QColor("green").lighter(120))
-                    self.setFormat(start, index - start + 1, fmt)
-                    open_quotes = False
-
-            elif char.isalpha() or char.isdigit() or char == '_':
-                word += char
-            else:
-                if word.isdigit():
-                    fmt.setForeground(QColor("cyan"))
-                else:
-                    word = ''
-                    continue
-
-                self.setFormat(index - len(word), len(word), fmt)
-                word = ''
-        else:
-            if open_quotes:
-                fmt.setForeground(QColor("green").lighter(120))
-                self.setFormat(start, len(block_text) - start, fmt)
-
-
-class PythonHighlighter(QSyntaxHighlighter):
-    '''
-    Подсветка синтаксиса Python
-    (попытка реализации)
-    '''
-    def __init__(self, parent=None):
-        super(PythonHighlighter, self).__init__(parent)
-
-        self.keywords = PYTHON_KEYWORDS
-        self.functions = PYTHON_FUNCTIONS
-
-    def highlightBlock(self, text):
-        '''
-        Подсветка одной строки
-        Замечение: по-другому фреймворк сделать не позволяет
-        '''
-        block_text = self.currentBlock().text() + ' '
-
-        fmt = QTextCharFormat()
-        fmt.setBackground(QColor("#222"))
-        fmt.setForeground(QColor("#FFF"))
-        self.setFormat(0, len(block_text), fmt)
-
-        start = 0
-        word = ""
-        last_word = ""
-        open_quotes = False
-        last_quote = ""
-
-        for index, char in enumerate(block_text):
-            if open_quotes and char not in ("'", '"'):
-                continue
-
-            if char == '#' and not open_quotes:
-                fmt.setForeground(QColor("red").lighter(120))
-                self.setFormat(index, len(block_text) - index, fmt)
-                break
-
-            elif char in ("'", '"'):
-                if not open_quotes:
-                    start = index
-                    last_quote = char
-                    open_quotes = True
-
-                elif char == last_quote:
-                    fmt.setForeground(QColor("green").lighter(120))
-                    self.setFormat(start, index - start + 1, fmt)
-                    open_quotes = False
-
-            elif char.isalpha() or char.isdigit() or char == '_':
-                word += char
-            else:
-                if last_word == "def":
-                    if word.startswith("__") and word.endswith("__"):
-                        fmt.setForeground(QColor("purple").lighter(300))
-                    else:
-                        fmt.setForeground(QColor("cyan"))
-                elif word in self.keywords:
-                    fmt.setForeground(QColor("orange"))
-                elif word in self.functions or word in ('self', 'cls') or\
-                        (word.endswith("__") and word.startswith("__")):
-                    fmt.setForeground(QColor("purple").lighter(300))
-                elif word.isdigit():
-                    fmt.setForeground(QColor("cyan"))
-                else:
-                    word = ''
-                    last_word = word
-                    continue
-
-                self.setFormat(index - len(word), len(word), fmt)
-                word = ''
-                last_word = word
-        else:
-            if open_quotes:
-                fmt.setForeground(QColor("green").lighter(120))
-                self.setFormat(start, len(block_text) - start, fmt)
@@ -1,7 +1,9 @@
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QFrame, QHBoxLayout, QLabel, QPushButton
 
+from .constants import VIEW_UPDATE_INTERVAL_MS
+
 
 class TitleBar(QFrame):
     '''
@@ -125,6 +127,13 @@ class TitleLabel(QLabel):
         self.drag_y = None
         self.old_pos = None
 
+        # Если перемещать окно приходится самим, оно сдвигается не чаще раза за кадр
+        self.pending_pos = None
+        self.move_timer = QTimer(self)
+        self.move_timer.setSingleShot(True)
+        self.move_timer.setInterval(VIEW_UPDATE_INTERVAL_MS)
+        self.move_timer.timeout.connect(self.apply_pending_pos)
+
     def set_style(self, style):
         '''
         Установка данного стиля
@@ -133,8 +142,11 @@ class TitleLabel(QLabel):
 
     def mousePressEvent(self, event, mouse_event=None):
         '''
-        Обработка нажатия кнопки мыши
+        Обработка нажатия кнопки мыши: окно перемещает оконная система, если умеет
         '''
+        if self.window.windowHandle().startSystemMove():
+            return
+
         self.dragged = True
         self.drag_x = event.globalX()
         self.drag_y = event.globalY()
@@ -145,8 +157,27 @@ class TitleLabel(QLabel):
         Обработка перемещения мыши с зажатой кнопкой
         '''
         if self.dragged:
-            self.window.move(self.old_pos.x() + event.globalX() - self.drag_x,
-                             self.old_pos.y() + event.globalY() - self.drag_y)
+            self.pending_pos = event.globalPos()
+            if not self.move_timer.isActive():
+                self.move_timer.start()
+
+    def mouseReleaseEvent(self, event):
+        '''
+        Обработка отпускания кнопки мыши
+        '''
+        if self.dragged:
+            self.apply_pending_pos()
+            self.dragged = False
+
+    def apply_pending_pos(self):
+        '''
+        Перемещение окна по последнему положению мыши
+        '''
+        self.move_timer.stop()
+        if self.pending_pos is not None:
+            self.window.move(self.old_pos.x() + self.pending_pos.x() - self.drag_x,
+                             self.old_pos.y() + self.pending_pos.y() - self.drag_y)
+            self.pending_pos = None
 
 class TitleBarButton(QPushButton):
     '''
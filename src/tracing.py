@@ -0,0 +1,184 @@
+import functools
+import json
+import os
+import threading
+import time
+
+from .constants import TRACE_ENV_VAR, TRACE_EVENT_LIMIT
+
+# Флаг кода функции с *args (inspect.CO_VARARGS: модуль inspect долго импортируется)
+CO_VARARGS = 0x04
+
+
+class Span:
+    '''
+    Замер участка кода: with TRACER.span(...)
+    '''
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.add_span(self.name, self.category, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class NullSpan:
+    '''
+    Замер при выключенной трассировке: ничего не делает
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    '''
+    Трассировка работы редактора: длительность вызовов контроллера, порций подсветки, чтения и записи
+    файлов и отрисовки текста. Включается переменной окружения TRACE_ENV_VAR (трасса пишется в файл
+    при выходе) или из меню Help. Выключенная трассировка стоит одной проверки флага на вызов.
+    Трасса выгружается в формате Chrome trace event (открывается в Perfetto и chrome://tracing),
+    суммы по именам видны в панели отладки
+    '''
+    def __init__(self):
+        self.enabled = bool(os.environ.get(TRACE_ENV_VAR))
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        '''
+        Удаление записанного: трасса начинается заново
+        '''
+        with self.lock:
+            self.start = time.perf_counter()
+            # События трассы (не больше TRACE_EVENT_LIMIT) и число не поместившихся
+            self.events = []
+            self.dropped = 0
+            # Суммы по именам: (категория, имя) -> [число вызовов, общее время, наибольшее время] в секундах
+            self.totals = {}
+            self.counters = {}
+            # Потоки, в которых были замеры: номер -> имя
+            self.threads = {}
+
+    def get_enabled(self):
+        return self.enabled
+
+    def set_enabled(self, is_enabled):
+        self.enabled = is_enabled
+
+    def span(self, name, category, **args):
+        '''
+        Замер участка кода (args - подробности для просмотра трассы)
+        '''
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    def add_span(self, name, category, start, end, args=None):
+        '''
+        Запись законченного участка: начало и конец - по time.perf_counter
+        '''
+        thread = threading.current_thread()
+        duration = end - start
+        with self.lock:
+            if thread.ident not in self.threads:
+                self.threads[thread.ident] = "main" if thread is threading.main_thread() else thread.name
+
+            total = self.totals.get((category, name))
+            if total is None:
+                self.totals[(category, name)] = [1, duration, duration]
+            else:
+                total[0] += 1
+                total[1] += duration
+                total[2] = max(total[2], duration)
+
+            if len(self.events) < TRACE_EVENT_LIMIT:
+                self.events.append((name, category, start, duration, thread.ident, args))
+            else:
+                self.dropped += 1
+
+    def count(self, name, amount=1):
+        '''
+        Увеличение счетчика name
+        '''
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get_totals(self):
+        '''
+        Копия сумм по именам и счетчиков
+        '''
+        with self.lock:
+            return {key: tuple(total) for key, total in self.totals.items()}, dict(self.counters)
+
+    def export(self, path):
+        '''
+        Запись трассы в файл в формате Chrome trace event (JSON)
+        '''
+        pid = os.getpid()
+        with self.lock:
+            events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+                      for ident, name in self.threads.items()]
+            for name, category, start, duration, ident, args in self.events:
+                event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": ident,
+                         "ts": round((start - self.start) * 1e6, 1), "dur": round(duration * 1e6, 1)}
+                if args:
+                    event["args"] = args
+                events.append(event)
+            other = {"counters": dict(self.counters), "dropped_events": self.dropped}
+
+        with open(path, 'w') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": other}, file)
+
+
+TRACER = Tracer()
+
+
+def traced(name, category):
+    '''
+    Декоратор: замер каждого вызова функции при включенной трассировке
+    '''
+    def decorate(function):
+        # PyQt отбрасывает аргументы сигнала, которых слот не принимает, только если слот - сама
+        # функция, а не обертка: лишние позиционные аргументы отбрасываются здесь
+        code = function.__code__
+        limit = None if code.co_flags & CO_VARARGS else code.co_argcount
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if limit is not None and len(args) > limit:
+                args = args[:limit]
+            if not TRACER.enabled:
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                TRACER.add_span(name, category, start, time.perf_counter())
+        return wrapper
+    return decorate
+
+
+def trace_methods(category):
+    '''
+    Декоратор класса: замер вызовов всех его открытых методов (traced)
+    '''
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if not name.startswith('_') and callable(method) and hasattr(method, "__code__"):
+                setattr(cls, name, traced(f"{cls.__name__}.{name}", category)(method))
+        return cls
+    return decorate
@@ -0,0 +1,273 @@
+import logging
+import os
+import sys
+import time
+from bisect import bisect_right
+from collections import deque
+from itertools import accumulate
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from .buffer import Rope
+from .constants import TRIGRAM_INDEX_BLOCK_SIZE, TRIGRAM_INDEX_FILTER_BITS, TRIGRAM_INDEX_BATCH
+from .mapped_buffer import ENCODING
+
+LOGGER = logging.getLogger("sigma-text-editor.index")
+
+# Свертка регистра, согласованная с re.IGNORECASE: все символы, совпадающие без учета регистра
+# с латинской буквой, переходят в ее строчную форму (остальные символы не меняются)
+FOLD_TABLE = str.maketrans({**{chr(code): chr(code + 32) for code in range(ord('A'), ord('Z') + 1)},
+                            'İ': 'i', 'ı': 'i', 'K': 'k', 'ſ': 's'})
+
+# Фильтр блока, после которого блоков нет
+EMPTY_FILTER = bytes(TRIGRAM_INDEX_FILTER_BITS // 8)
+# Кодировка, в которой строка превращается в массив кодов символов (memoryview.cast("I"))
+CODES_ENCODING = "utf-32-le" if sys.byteorder == "little" else "utf-32-be"
+
+
+def fold(text):
+    '''
+    Текст (строка или байты) со свернутым регистром той же длины
+    '''
+    if isinstance(text, bytes) or text.isascii():
+        return text.lower()
+    return text.translate(FOLD_TABLE)
+
+
+def get_trigram_bits(text):
+    '''
+    Номера битов фильтра для всех троек подряд идущих символов текста. Тройки хешируются
+    как тройки кодов символов: хеши строк в каждом процессе свои, а хеши чисел одинаковы
+    '''
+    codes = text if isinstance(text, bytes) else memoryview(text.encode(CODES_ENCODING, "surrogatepass")).cast("I")
+    mask = TRIGRAM_INDEX_FILTER_BITS - 1
+    return {value & mask for value in set(map(hash, zip(codes, codes[1:], codes[2:])))}
+
+
+def get_filter(text):
+    '''
+    Фильтр Блума текста блока (с двумя символами следующего блока): по биту на каждую тройку символов
+    '''
+    bits = bytearray(TRIGRAM_INDEX_FILTER_BITS // 8)
+    for bit in get_trigram_bits(fold(text)):
+        bits[bit >> 3] |= 1 << (bit & 7)
+    return bytes(bits)
+
+
+def build_filters(text, count):
+    '''
+    Фильтры count блоков подряд, с которых начинается текст (выполняется в процессе пула)
+    '''
+    size = TRIGRAM_INDEX_BLOCK_SIZE
+    return [get_filter(text[index * size:(index + 1) * size + 2]) for index in range(count)]
+
+
+def get_query_bits(string, is_regex=False, is_case_sensitive=True, is_whole_word=False, is_bytes=False):
+    '''
+    Биты фильтра, которые должны быть у блоков с вхождениями запроса (аргументы как у compile_pattern),
+    или None, если индекс для запроса не применим: регулярные выражения, запросы короче трех символов
+    или длиннее половины блока, а без учета регистра - строки не из ASCII (их свертка сложнее)
+    '''
+    text = string.encode(ENCODING) if is_bytes else string
+    if is_regex or not 3 <= len(text) <= TRIGRAM_INDEX_BLOCK_SIZE // 2:
+        return None
+    if not is_case_sensitive and not is_bytes and not string.isascii():
+        return None
+
+    return [(bit >> 3, 1 << (bit & 7)) for bit in get_trigram_bits(fold(text))]
+
+
+def split_blocks(start, length):
+    '''
+    Деление отрезка текста на блоки длиной около TRIGRAM_INDEX_BLOCK_SIZE: (начало, длина)
+    '''
+    count = max(round(length / TRIGRAM_INDEX_BLOCK_SIZE), 1)
+    ends = [start + length * (i + 1) // count for i in range(count)]
+    return [(block_start, end - block_start) for block_start, end in zip([start] + ends, ends)]
+
+
+class TrigramIndex:
+    '''
+    Индекс троек символов текста для поиска. Текст делится на блоки длиной около
+    TRIGRAM_INDEX_BLOCK_SIZE, для каждого блока хранится фильтр Блума троек, начинающихся в нем.
+    Вхождение короче половины блока умещается в свой блок и следующий, поэтому искать нужно
+    только в блоках, где вместе со следующим есть все тройки запроса.
+    Правки сразу меняют длины блоков, а фильтры измененных блоков пересчитываются позже
+    (reindex); до этого такие блоки просматриваются всегда
+    '''
+    def __init__(self, lengths=None, filters=None):
+        # Длины блоков и их фильтры (None - блок изменен); None, пока индекс строится
+        self.lengths = lengths
+        self.filters = filters
+        # Правки, сделанные, пока индекс строился
+        self.pending_edits = []
+
+    def set_blocks(self, lengths, filters):
+        '''
+        Готовые блоки индекса (построенные в фоне): к ним применяются правки, сделанные за время построения
+        '''
+        self.lengths = lengths
+        self.filters = filters
+        for edit in self.pending_edits:
+            self.apply_edit(*edit)
+        self.pending_edits = []
+
+    def get_is_built(self):
+        return self.lengths is not None
+
+    def get_snapshot(self):
+        '''
+        Копия индекса для фонового поиска (правки ее не меняют) или None, если индекс еще строится
+        '''
+        if self.lengths is None:
+            return None
+        return TrigramIndex(list(self.lengths), list(self.filters))
+
+    def apply_edit(self, position, removed, inserted):
+        '''
+        Учет правки: блоки, которые она затронула, сливаются в один измененный блок
+        '''
+        if self.lengths is None:
+            self.pending_edits.append((position, removed, inserted))
+            return
+
+        lengths, filters = self.lengths, self.filters
+        starts = [0, *accumulate(lengths)]
+        first = min(bisect_right(starts, position) - 1, len(lengths) - 1)
+        last = max(min(bisect_right(starts, position + removed) - 1, len(lengths) - 1), first)
+        length = starts[last + 1] - starts[first] - removed + len(inserted)
+        lengths[first:last + 1] = [length]
+        filters[first:last + 1] = [None]
+        # Тройки из конца предыдущего блока заходят в измененный текст
+        if first and position - starts[first] < 2:
+            filters[first - 1] = None
+
+        # Короткий блок (кроме последнего) сливается со следующим, короткий последний - с предыдущим
+        if length < TRIGRAM_INDEX_BLOCK_SIZE // 2 and len(lengths) > 1:
+            neighbour = first if first + 1 < len(lengths) else first - 1
+            lengths[neighbour:neighbour + 2] = [lengths[neighbour] + lengths[neighbour + 1]]
+            filters[neighbour:neighbour + 2] = [None]
+
+    def reindex(self, get_text_range, budget):
+        '''
+        Пересчет фильтров измененных блоков (длинные делятся), пока не пройдет budget секунд.
+        get_text_range(начало, конец) - текст документа. Возвращает False, если пересчитывать больше нечего
+        '''
+        if self.lengths is None:
+            return False
+
+        deadline = time.perf_counter() + budget
+        lengths, filters = self.lengths, self.filters
+        while None in filters:
+            if time.perf_counter() > deadline:
+                return True
+            index = filters.index(None)
+            start = sum(lengths[:index])
+            blocks = split_blocks(start, lengths[index])
+            lengths[index:index + 1] = [length for _, length in blocks]
+            filters[index:index + 1] = [get_filter(get_text_range(block_start, block_start + length + 2))
+                                        for block_start, length in blocks]
+
+        return False
+
+    def get_regions(self, query_bits):
+        '''
+        Отрезки текста [начало, конец), в которых могут начинаться вхождения запроса (соседние склеены)
+        '''
+        lengths, filters = self.lengths, self.filters
+        regions = []
+        start = 0
+        for index, length in enumerate(lengths):
+            current = filters[index]
+            following = filters[index + 1] if index + 1 < len(filters) else EMPTY_FILTER
+            if current is None or following is None or all(current[byte] & bit or following[byte] & bit
+                                                            for byte, bit in query_bits):
+                if regions and regions[-1][1] == start:
+                    regions[-1][1] = start + length
+                else:
+                    regions.append([start, start + length])
+            start += length
+
+        return regions
+
+
+def build_blocks(text, process_pool, is_cancelled=lambda: False):
+    '''
+    Блоки индекса для всего текста (строки или отображенного файла): (длины, фильтры) или None после отмены.
+    Фильтры считаются в пуле процессов пачками по TRIGRAM_INDEX_BATCH блоков
+    '''
+    size = TRIGRAM_INDEX_BLOCK_SIZE
+    lengths = [min(size, len(text) - start) for start in range(0, max(len(text), 1), size)]
+    filters = []
+    # В очереди пула держится немного пачек: иначе в ней окажется копия всего текста
+    pending = deque()
+    for first in range(0, len(lengths), TRIGRAM_INDEX_BATCH):
+        if is_cancelled():
+            break
+        count = min(TRIGRAM_INDEX_BATCH, len(lengths) - first)
+        start = first * size
+        pending.append(process_pool.submit(build_filters, text[start:start + count * size + 2], count))
+        if len(pending) > os.cpu_count() * 2:
+            filters.extend(pending.popleft().result())
+
+    while pending and not is_cancelled():
+        filters.extend(pending.popleft().result())
+
+    if is_cancelled():
+        for future in pending:
+            future.cancel()
+        return None
+    return lengths, filters
+
+
+class IndexBuilderSignals(QObject):
+    '''
+    Сигналы построения индекса (у QRunnable собственных сигналов нет)
+    '''
+    # doc_id, блоки индекса: (длины, фильтры)
+    built = pyqtSignal(int, object)
+    # doc_id
+    failed = pyqtSignal(int)
+
+
+class IndexBuilder(QRunnable):
+    '''
+    Построение индекса троек по неизменяемому снимку текста (Rope) или отображенному файлу.
+    Фильтры блоков считаются в пуле процессов, поэтому построение не отнимает время у интерфейса.
+    Правки во время построения индекс запоминает сам
+    '''
+    def __init__(self, doc_id, text, process_pool):
+        super().__init__()
+
+        self.doc_id = doc_id
+        self.text = text
+        self.process_pool = process_pool
+        self.cancelled = False
+        self.signals = IndexBuilderSignals()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        '''
+        Построение индекса (выполняется в потоке пула)
+        '''
+        # Импорт здесь, а не при запуске приложения: к этому времени пул процессов его уже загрузил
+        from concurrent.futures import CancelledError
+
+        # Склейка снимка в строку тоже выполняется здесь, а не в потоке интерфейса
+        text = self.text.get_text() if isinstance(self.text, Rope) else self.text
+        try:
+            blocks = build_blocks(text, self.process_pool, lambda: self.cancelled)
+        except (ValueError, CancelledError):
+            # Большой файл закрыли или построение отменено
+            return
+        except Exception as error:
+            # Пул процессов остановлен, сломан или не смог запустить процесс: без индекса поиск просто
+            # просматривает весь текст, а ждать индекс вечно нельзя
+            if not self.cancelled:
+                LOGGER.error("Cannot build search index: %r", error)
+                self.signals.failed.emit(self.doc_id)
+            return
+        if blocks is not None:
+            self.signals.built.emit(self.doc_id, blocks)
@@ -1,26 +1,50 @@
 import sys
 
-from PyQt5.QtWidgets import QWidget, QMainWindow
-
-from .grip import *
-from .menu import *
-from .search import *
-from .status import *
-from .text_area import *
-from .title_bar import *
-from .tab_bar import *
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QFont, QIcon
+from PyQt5.QtWidgets import QApplication, QGridLayout, QLabel, QMainWindow, QWidget
+
+from .constants import MAX_EDITED_DOCUMENTS_OVER_LIMIT, MAX_RESIDENT_DOCUMENTS, WINDOW_RESIZE_SETTLE_MS, WATCHDOG_STALL_MS
+from .documents import DocumentPool
+from .grip import BottomGrip, BottomLeftGrip, BottomRightGrip, LeftGrip, RightGrip
+from .highlighter import LazyHighlighter
+from .large_text_area import LargeTextArea
+from .menu import MenuBar
+from .search import SearchEntry
+from .status import StatusBar
+from .text_area import TextArea
+from .title_bar import TitleBar
+from .tab_bar import TabBar
 
 
 class TextEditorView:
     '''
     Представление приложения - надкласс над окном
     '''
-    def __init__(self, controller):
+    def __init__(self, controller, profile=None):
         self.app = QApplication(sys.argv)
+        if profile is not None:
+            profile.mark("QApplication")
 
         self.controller = controller
+        self._documents = DocumentPool(MAX_RESIDENT_DOCUMENTS, MAX_EDITED_DOCUMENTS_OVER_LIMIT)
+        # Документы, текст которых еще загружается
+        self._loading = set()
+        self._current_doc_id = None
+
+        # Запись ввода пользователя (SessionRecorder) или None
+        self._recorder = None
+        # Панель отладки (создается при первом показе)
+        self._debug_panel = None
+        # Поиск зависаний интерфейса (StallWatchdog) или None
+        self._watchdog = None
+        # Подсветка, приостановленная на время замены всех вхождений
+        self._paused_highlighter = None
 
         self.initUI()
+        if profile is not None:
+            profile.mark("window build")
+            profile.watch_first_paint(self._window)
 
     def initUI(self):
         '''
@@ -28,19 +52,26 @@ class TextEditorView:
         '''
         self._window = self.create_window()
         self._window.setWindowIcon(QIcon("image/app icon.png"))
+        self._window.resize_started.connect(lambda: self._text_area.set_layout_frozen(True))
+        self._window.resize_finished.connect(lambda: self._text_area.set_layout_frozen(False))
 
         central_widget = QWidget()
         self._window.setCentralWidget(central_widget)
 
         layout = QGridLayout()
         self._window.centralWidget().setLayout(layout)
+        self._layout = layout
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
 
         self._text_area = self.create_text_area()
+        self._large_text_area = self.create_large_text_area()
+        self._is_mapped_shown = False
         self._empty_space_label = self.create_empty_space_label()
         self.show_empty_label()
-        self._search_entry = self.create_search_entry()
+        # Панели поиска и результатов поиска в файлах нужны не всегда: они создаются при первом обращении
+        self._search_entry = None
+        self._find_results = None
 
         self._left_grip = LeftGrip(self._window)
         self._right_grip = RightGrip(self._window)
@@ -53,45 +84,173 @@ class TextEditorView:
         self._tab_bar = self.create_tab_bar()
         self._status_bar = self.create_status_bar()
 
-        layout.addWidget(self._left_grip, 1, 0, 4, 1)
-        layout.addWidget(self._right_grip, 1, 2, 4, 1)
-        layout.addWidget(self._bottom_grip, 5, 1, 1, 1)
-        layout.addWidget(self._bottom_left_grip, 5, 0, 1, 1)
-        layout.addWidget(self._bottom_right_grip, 5, 2, 1, 1)
+        layout.addWidget(self._left_grip, 1, 0, 5, 1)
+        layout.addWidget(self._right_grip, 1, 2, 5, 1)
+        layout.addWidget(self._bottom_grip, 6, 1, 1, 1)
+        layout.addWidget(self._bottom_left_grip, 6, 0, 1, 1)
+        layout.addWidget(self._bottom_right_grip, 6, 2, 1, 1)
         layout.addWidget(self._title_bar, 0, 0, 1, 3)
         layout.addWidget(self._tab_bar, 1, 1, 1, 1)
-        layout.addWidget(self._status_bar, 4, 1, 1, 1)
-        layout.addWidget(self._search_entry, 2, 1, 1, 1)
+        layout.addWidget(self._status_bar, 5, 1, 1, 1)
         layout.addWidget(self._text_area, 3, 1, 1, 1)
+        layout.addWidget(self._large_text_area, 3, 1, 1, 1)
         layout.addWidget(self._empty_space_label, 3, 1, 1, 1, Qt.AlignCenter)
 
         self._window.show()
 
-    def run(self):
+    def run(self, stall_threshold_ms=WATCHDOG_STALL_MS):
         '''
-        Запуск окна
+        Запуск окна. Зависания цикла событий дольше stall_threshold_ms записываются в журнал
+        со стеками (0 - без наблюдения)
         '''
+        if stall_threshold_ms:
+            from .watchdog import StallWatchdog
+
+            self._watchdog = StallWatchdog(stall_threshold_ms)
+            self._watchdog.start()
         self.app.exec()
 
-    def add_tab(self, text, filename, slider_pos, cursor_pos):
+    def add_tab(self, doc_id, text, filename, slider_pos, cursor_pos):
         '''
         Добавление новой вкладки
         '''
-        self._tab_bar.addTab(filename)
-        self.switch_tab(self._tab_bar.count() - 1, text, slider_pos, cursor_pos)
+        self._tab_bar.addTab(filename.split('/')[-1])
+        self.switch_tab(self._tab_bar.count() - 1, doc_id, text, filename, slider_pos, cursor_pos)
+        self.hide_empty_label()
+
+    def add_placeholder_tab(self, filename):
+        '''
+        Добавление вкладки файла, который еще не загружен (документ создается при переключении)
+        '''
+        self._tab_bar.addTab(filename.split('/')[-1])
+        self.hide_empty_label()
+
+    def add_mapped_tab(self, buffer, filename, slider_pos, cursor_pos):
+        '''
+        Добавление вкладки большого файла
+        '''
+        self._tab_bar.addTab(filename.split('/')[-1])
+        self.switch_mapped_tab(self._tab_bar.count() - 1, buffer, slider_pos, cursor_pos)
         self.hide_empty_label()
 
-    def switch_tab(self, index, text, slider_pos, cursor_pos):
+    def has_document(self, doc_id):
+        '''
+        Проверка, хранится ли документ файла в памяти представления
+        '''
+        return doc_id in self._documents
+
+    def switch_tab(self, index, doc_id, text, filename, slider_pos, cursor_pos):
         '''
-        Смена активной вкладки
+        Смена активной вкладки. Текст нужен, только если документа нет в памяти (has_document)
         '''
         self._tab_bar.setCurrentIndex(index)
-        self._text_area.set_text(text)
+        self.set_mapped_shown(False)
+        is_loading = doc_id in self._loading
+
+        document = self._documents.get(doc_id)
+        if document is None:
+            document = self._text_area.create_document(text)
+            if is_loading:
+                # Подсветка появится после загрузки, а подгружаемые куски не должны попасть в историю правок
+                document.setUndoRedoEnabled(False)
+                self._documents.add(doc_id, document, None)
+            else:
+                self._documents.add(doc_id, document, self._text_area.create_highlighter(document, filename))
+
+        self._current_doc_id = doc_id
+        self._text_area.set_loading(is_loading)
+        if is_loading:
+            # Документ показывается только после загрузки: правка показанного документа
+            # заставляет QTextEdit синхронно раскладывать весь текст до места правки
+            self._text_area.clear_document()
+            return
+
+        self._text_area.set_document(document)
         self._text_area.set_cursor_pos(cursor_pos)
         self._text_area.set_vertical_slider_pos(slider_pos)
-        self._text_area.set_highlighter(self._tab_bar.tabText(index))
         self._text_area.setFocus()
 
+    def switch_mapped_tab(self, index, buffer, slider_pos, cursor_pos):
+        '''
+        Смена активной вкладки на вкладку большого файла
+        '''
+        self._tab_bar.setCurrentIndex(index)
+        self._current_doc_id = None
+        self._text_area.set_loading(False)
+        self._text_area.clear_document()
+        self.set_mapped_shown(True)
+
+        self._large_text_area.set_buffer(buffer)
+        self._large_text_area.set_cursor_pos(cursor_pos)
+        self._large_text_area.set_vertical_slider_pos(slider_pos)
+        self._large_text_area.setFocus()
+
+    def set_mapped_shown(self, is_mapped_shown):
+        '''
+        Выбор поля, в котором показан активный файл: обычного или для больших файлов
+        '''
+        self._is_mapped_shown = is_mapped_shown
+        if not is_mapped_shown:
+            self._large_text_area.clear_buffer()
+
+        if self._tab_bar.count():
+            self._text_area.setVisible(not is_mapped_shown)
+            self._large_text_area.setVisible(is_mapped_shown)
+
+    def flush_position_updates(self):
+        '''
+        Немедленная передача контроллеру отложенных положений курсора и слайдера
+        '''
+        self._text_area.flush_updates()
+        self._large_text_area.flush_updates()
+
+    def get_active_text_area(self):
+        '''
+        Поле, в котором показан активный файл
+        '''
+        return self._large_text_area if self._is_mapped_shown else self._text_area
+
+    def start_loading(self, doc_id):
+        '''
+        Пометка документа как загружаемого (до создания вкладки)
+        '''
+        self._loading.add(doc_id)
+
+    def append_text(self, doc_id, text):
+        '''
+        Добавление загруженного куска текста, если документ находится в памяти
+        '''
+        document = self._documents.get(doc_id)
+        if document is not None:
+            self._text_area.append_text(document, text)
+
+    def finish_loading(self, doc_id, filename, slider_pos, cursor_pos):
+        '''
+        Завершение загрузки: показ документа, включение правки, истории и подсветки
+        '''
+        self._loading.discard(doc_id)
+
+        document = self._documents.get(doc_id)
+        if document is None:
+            return
+
+        document.setUndoRedoEnabled(True)
+        self._documents.set_highlighter(doc_id, self._text_area.create_highlighter(document, filename))
+
+        if self._current_doc_id == doc_id:
+            self._text_area.set_loading(False)
+            self._text_area.set_document(document)
+            self._text_area.set_cursor_pos(cursor_pos)
+            self._text_area.set_vertical_slider_pos(slider_pos)
+
+    def set_highlighter(self, doc_id, filename):
+        '''
+        Смена подсветки документа (например, после переименования файла)
+        '''
+        document = self._documents.get(doc_id)
+        if document is not None:
+            self._documents.set_highlighter(doc_id, self._text_area.create_highlighter(document, filename, lazy=True))
+
     def get_tab_index(self):
         '''
         Получение номера открытой вкладки
@@ -104,53 +263,147 @@ class TextEditorView:
         '''
         self._tab_bar.setTabText(self.get_tab_index(), text)
 
-    def close_tab(self):
+    def close_tab(self, doc_id):
         '''
         Закрытие открытой вкладки
         '''
+        self._text_area.clear_document()
+        self._large_text_area.clear_buffer()
+        self._documents.remove(doc_id)
+        self._loading.discard(doc_id)
+        self._current_doc_id = None
         self._tab_bar.removeTab(self.get_tab_index())
         if not self._tab_bar.count():
             self.show_empty_label()
 
-    def add_tab_star(self):
+    def add_tab_star(self, index=None):
         '''
-        Пометка звездой открытой вкладки
+        Пометка звездой вкладки (по умолчанию - открытой)
         '''
-        self.edit_current_tab(self._tab_bar.tabText(self.get_tab_index()) + '*')
+        if index is None:
+            index = self.get_tab_index()
+        self._tab_bar.setTabText(index, self._tab_bar.tabText(index) + '*')
 
-    def remove_tab_star(self):
+    def remove_tab_star(self, index=None):
         '''
-        Снятие метки с открытой вкладки
+        Снятие метки с вкладки (по умолчанию - с открытой)
         '''
-        if self._tab_bar.tabText(self.get_tab_index()).endswith('*'):
-            self.edit_current_tab(self._tab_bar.tabText(self.get_tab_index())[:-1])
+        if index is None:
+            index = self.get_tab_index()
+        if self._tab_bar.tabText(index).endswith('*'):
+            self._tab_bar.setTabText(index, self._tab_bar.tabText(index)[:-1])
 
     def scroll_to_index(self, index, length):
         '''
         Промотка текстового поля до нужного текста
         '''
-        self._text_area.scroll_to_index(index, length)
+        self.get_active_text_area().scroll_to_index(index, length)
+
+    def get_search_entry(self):
+        '''
+        Панель поиска (создается скрытой при первом обращении)
+        '''
+        if self._search_entry is None:
+            self._search_entry = self.create_search_entry()
+            self._layout.addWidget(self._search_entry, 2, 1, 1, 1)
+        return self._search_entry
+
+    def get_find_results(self):
+        '''
+        Панель результатов поиска в файлах (создается скрытой при первом обращении)
+        '''
+        if self._find_results is None:
+            self._find_results = self.create_find_results()
+            self._layout.addWidget(self._find_results, 4, 1, 1, 1)
+        return self._find_results
+
+    def get_find_options(self):
+        return self.get_search_entry().get_options()
+
+    def get_text_selection_start(self):
+        '''
+        Получение позиции начала выделения (курсора, если выделения нет)
+        '''
+        if self._is_mapped_shown:
+            return self._large_text_area.get_selection_start()
+        return self._text_area.textCursor().selectionStart()
+
+    def get_find_input(self):
+        return self.get_search_entry().get_find_input()
+
+    def get_visible_range(self):
+        return self.get_active_text_area().get_visible_range()
+
+    def set_match_highlights(self, spans):
+        self.get_active_text_area().set_match_highlights(spans)
+
+    def clear_match_highlights(self):
+        self._text_area.set_match_highlights([])
+        self._large_text_area.set_match_highlights([])
+
+    def show_match_count(self, index, count):
+        self._status_bar.show_match_count(index, count)
+
+    def show_searching(self):
+        self._status_bar.show_searching()
+
+    def clear_match_count(self):
+        self._status_bar.clear_match_count()
+
+    def show_find_results(self):
+        '''
+        Очистка и показ панели результатов поиска в файлах
+        '''
+        find_results = self.get_find_results()
+        find_results.model.clear()
+        find_results.set_summary("Searching...")
+        find_results.show()
+
+    def hide_find_results(self):
+        if self._find_results is not None:
+            self._find_results.hide()
+
+    def add_find_results(self, doc_id, path, hits):
+        self.get_find_results().model.add_hits(doc_id, path, hits)
+
+    def set_find_results_summary(self, text):
+        self.get_find_results().set_summary(text)
+
+    def get_find_result(self, row):
+        return self.get_find_results().model.get_hit(row)
+
+    def get_find_result_files(self):
+        return self.get_find_results().model.get_files()
+
+    def get_find_result_count(self):
+        return self.get_find_results().model.get_hit_count()
+
+    def get_is_find_hidden(self):
+        return self._search_entry is None or self._search_entry.isHidden()
 
     def hide_find(self):
         '''
         Скрытие фрейма поиска
         '''
-        self._search_entry.hide()
+        if self._search_entry is not None:
+            self._search_entry.hide()
 
     def toggle_find(self):
         '''
         Переключение видимости фрейма поиска
         '''
-        if self._search_entry.isHidden():
-            self._search_entry.show()
+        search_entry = self.get_search_entry()
+        if search_entry.isHidden():
+            search_entry.show()
         else:
-            self._search_entry.hide()
+            search_entry.hide()
 
     def show_empty_label(self):
         '''
         Показ метки, заполняющей пустое место на экране
         '''
         self._text_area.hide()
+        self._large_text_area.hide()
         self._empty_space_label.resize(self._text_area.width(), self._text_area.height())
         self._empty_space_label.show()
 
@@ -159,8 +412,9 @@ class TextEditorView:
         Скрытие метки, показ текстового поля
         '''
         self._empty_space_label.hide()
-        self._text_area.resize(self._empty_space_label.width(), self._empty_space_label.height())
-        self._text_area.show()
+        text_area = self.get_active_text_area()
+        text_area.resize(self._empty_space_label.width(), self._empty_space_label.height())
+        text_area.show()
 
     # Дальше идет создание всех элементов интерфейса
 
@@ -176,6 +430,11 @@ class TextEditorView:
     def create_text_area(self):
         return TextArea(self.controller)
 
+    def create_large_text_area(self):
+        large_text_area = LargeTextArea(self.controller)
+        large_text_area.hide()
+        return large_text_area
+
     def create_menu_bar(self):
         submenu = self._window.menuBar()
         return MenuBar(submenu, self.controller, self._text_area)
@@ -192,12 +451,23 @@ class TextEditorView:
     def create_search_entry(self):
         return SearchEntry(self._window, self.controller)
 
+    def create_find_results(self):
+        from .find_results import FindResultsPanel
+
+        return FindResultsPanel(self._window, self.controller)
+
     def set_label_cursor_pos(self, row, column):
         '''
         Вывод текущего положения курсора в тексте
         '''
         self._status_bar.show_pos(row, column)
 
+    def show_message(self, text):
+        '''
+        Вывод сообщения в статус бар
+        '''
+        self._status_bar.show_message(text)
+
     def apply_settings(self, pos, size):
         '''
         Применение настроек от прошлого сеанса
@@ -213,25 +483,72 @@ class TextEditorView:
         size = self._window.width(), self._window.height()
         return pos, size
 
+    def start_recording(self, path, files):
+        '''
+        Запись ввода пользователя в файл для воспроизведения (files - открытые файлы, None - новый файл)
+        '''
+        from .session_recorder import SessionRecorder
+
+        self._recorder = SessionRecorder(path, self._window, files, self.get_tab_index())
+
+    def stop_recording(self):
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def set_tracing(self, is_tracing):
+        self._menu_bar.set_tracing(is_tracing)
+
+    def show_debug_panel(self):
+        '''
+        Показ окна с суммами трассировки
+        '''
+        if self._debug_panel is None:
+            from .debug_panel import DebugPanel
+
+            self._debug_panel = DebugPanel(self._window)
+        self._debug_panel.show()
+        self._debug_panel.raise_()
+
     def exit(self):
         '''
         Остановка приложения
         '''
+        if self._watchdog is not None:
+            self._watchdog.stop()
         self._window.destroy()
         sys.exit(0)
 
-    def set_text(self, text):
+    def replace_spans(self, edits, is_first):
         '''
-        Установка текста
+        Замена кусков текста: (начало, конец, новый текст) без оповещения контроллера. Порции
+        одной замены (кроме первой) присоединяются к блоку правок предыдущей
         '''
-        slider_pos = self._text_area.get_vertical_slider_pos()
-        self._text_area.set_text(text)
-        self._text_area.set_vertical_slider_pos(slider_pos)
+        self._text_area.replace_spans(edits, is_first)
+
+    def set_replacing(self, is_replacing):
+        '''
+        Пока идет замена, ввод в текстовое поле запрещен, чтобы правки не попали в ее блок,
+        а ленивая подсветка приостановлена: иначе каждая порция замены перекладывала бы текст
+        от видимых строк до места правки
+        '''
+        self._text_area.setReadOnly(is_replacing)
+
+        if self._paused_highlighter is not None:
+            self._paused_highlighter.set_paused(False)
+            self._paused_highlighter = None
+        if is_replacing:
+            highlighter = self._documents.get_highlighter(self._current_doc_id)
+            if isinstance(highlighter, LazyHighlighter):
+                highlighter.set_paused(True)
+                self._paused_highlighter = highlighter
 
     def get_text_cursor_position(self):
         '''
         Получение позиции курсора в тексте
         '''
+        if self._is_mapped_shown:
+            return self._large_text_area.get_cursor_pos()
         return self._text_area.textCursor().position()
 
 
@@ -239,6 +556,10 @@ class TextEditorWindow(QMainWindow):
     '''
     Главное окно приложения
     '''
+    # Пользователь начал и закончил растягивать окно
+    resize_started = pyqtSignal()
+    resize_finished = pyqtSignal()
+
     def __init__(self, controller):
         self.controller = controller
 
@@ -248,6 +569,34 @@ class TextEditorWindow(QMainWindow):
 
         self.setStyleSheet('background-color: #333;')
 
+        self._is_resizing = False
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(WINDOW_RESIZE_SETTLE_MS)
+        self._settle_timer.timeout.connect(self.finish_resize)
+
+    def begin_resize(self, is_system=False):
+        '''
+        Начало растягивания окна. Растягивание оконной системой заканчивается паузой
+        в изменениях размера, а свое - вызовом finish_resize
+        '''
+        if not self._is_resizing:
+            self._is_resizing = True
+            self.resize_started.emit()
+        if is_system:
+            self._settle_timer.start()
+
+    def finish_resize(self):
+        self._settle_timer.stop()
+        if self._is_resizing:
+            self._is_resizing = False
+            self.resize_finished.emit()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self._settle_timer.isActive():
+            self._settle_timer.start()
+
     def closeEvent(self, event):
         '''
         Перенаправление попыток закрытия окна
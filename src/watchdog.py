@@ -0,0 +1,106 @@
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+from PyQt5.QtCore import QObject, QTimer
+
+from .constants import WATCHDOG_HEARTBEAT_MS, WATCHDOG_SAMPLE_MS, WATCHDOG_LOG_FILENAME, WATCHDOG_LOG_SIZE, \
+    WATCHDOG_LOG_BACKUPS, WATCHDOG_MAX_STACKS
+from .paths import get_cache_dir
+
+
+def create_logger():
+    '''
+    Журнал зависаний в каталоге данных: при достижении WATCHDOG_LOG_SIZE начинается новый файл,
+    хранятся WATCHDOG_LOG_BACKUPS прежних
+    '''
+    logger = logging.getLogger("sigma-text-editor.watchdog")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = logging.handlers.RotatingFileHandler(os.path.join(get_cache_dir(), WATCHDOG_LOG_FILENAME),
+                                                       maxBytes=WATCHDOG_LOG_SIZE, backupCount=WATCHDOG_LOG_BACKUPS,
+                                                       encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+class StallWatchdog(QObject):
+    '''
+    Поиск зависаний интерфейса. Таймер в потоке интерфейса отмечается каждые WATCHDOG_HEARTBEAT_MS;
+    если отметки нет дольше порога, отдельный поток снимает стеки потока интерфейса раз
+    в WATCHDOG_SAMPLE_MS, пока цикл событий снова не заработает, и пишет в журнал длительность
+    зависания и самые частые стеки. Пока поток интерфейса выполняет код Qt, не отпуская GIL,
+    стек снимается сразу после возврата из него - в той же функции Python, которая его вызвала
+    '''
+    def __init__(self, threshold_ms):
+        super().__init__()
+
+        self.threshold = threshold_ms / 1000
+        self.main_thread_id = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.stopped = threading.Event()
+        self.logger = create_logger()
+
+        self.heartbeat = QTimer(self)
+        self.heartbeat.setInterval(WATCHDOG_HEARTBEAT_MS)
+        self.heartbeat.timeout.connect(self.beat)
+        self.thread = threading.Thread(target=self.watch, name="stall watchdog", daemon=True)
+
+    def start(self):
+        self.last_beat = time.perf_counter()
+        self.heartbeat.start()
+        self.thread.start()
+
+    def stop(self):
+        self.heartbeat.stop()
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def beat(self):
+        self.last_beat = time.perf_counter()
+
+    # Дальше идет то, что выполняется в потоке наблюдения
+
+    def watch(self):
+        '''
+        Ожидание зависания: до момента, когда отметка устареет, поток спит
+        '''
+        while not self.stopped.is_set():
+            wait = self.last_beat + self.threshold - time.perf_counter()
+            if wait > 0:
+                self.stopped.wait(max(wait, WATCHDOG_SAMPLE_MS / 1000))
+            else:
+                self.sample_stall()
+
+    def sample_stall(self):
+        '''
+        Снятие стеков, пока поток интерфейса не отметится снова, и запись зависания в журнал
+        '''
+        start = self.last_beat
+        samples = Counter()
+        while self.last_beat == start and not self.stopped.is_set():
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is None:
+                return
+            samples[tuple(traceback.format_stack(frame))] += 1
+            del frame
+            self.stopped.wait(WATCHDOG_SAMPLE_MS / 1000)
+
+        # Конец зависания - первая отметка после него (при выходе - текущий момент)
+        end = self.last_beat if self.last_beat != start else time.perf_counter()
+        self.write_stall(end - start, samples)
+
+    def write_stall(self, duration, samples):
+        lines = [f"GUI stalled for {duration * 1000:.0f} ms ({sum(samples.values())} samples)"]
+        for stack, count in samples.most_common(WATCHDOG_MAX_STACKS):
+            lines.append(f"  {count} sample(s):")
+            lines.extend("  " + line.rstrip("\n").replace("\n", "\n  ") for line in stack)
+        self.logger.info("\n".join(lines))